@@ -0,0 +1,205 @@
+"""This file contains the cached data access layer shared by the pages of the streamlit application.
+
+Streamlit reruns a page script on every widget interaction. Loaders are memoized across
+reruns, pages and sessions, keyed on the file path and its modification time, so files are
+only parsed again when they change.
+"""
+
+import collections
+import hashlib
+import os
+from typing import Counter, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from utils import analyzer_utils
+from utils import aspect_evaluation
+from utils import constants
+from utils import data_models
+from utils import run_metrics
+from utils import trend_cube
+
+
+@st.cache_resource
+def get_cache_stats() -> Counter[str]:
+    """Returns the process-wide counters of loader calls and cache misses."""
+    return collections.Counter()
+
+
+def get_mtime(file_path: str) -> int:
+    """Returns the modification time of a file (ns), part of the cache key of its contents."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(
+            f"Could not load file, invalid path : {file_path}")
+    return os.stat(file_path).st_mtime_ns
+
+
+@st.cache_data(max_entries=16)
+def _get_fingerprint(file_path: str, mtime: int) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_fingerprint(file_path: str) -> str:
+    """Returns the sha256 hex digest of a file's contents, computed once per modification."""
+    return _get_fingerprint(file_path, get_mtime(file_path))
+
+
+# cache_data returns a copy on every hit, pages can freely modify the DataFrame
+@st.cache_data(max_entries=4, show_spinner="Loading reviews...")
+def _load_csv(file_path: str, mtime: int, columns: Tuple[str, ...],
+              reviews_processed: int) -> pd.DataFrame:
+    get_cache_stats()["load_csv.misses"] += 1
+    return analyzer_utils.load_csv(file_path=file_path,
+                                   columns=list(columns),
+                                   reviews_processed=reviews_processed)
+
+
+# cache_resource shares a single instance, the report must be treated as read-only
+@st.cache_resource(max_entries=4, show_spinner="Loading analysis report...")
+def _load_report(file_path: str, mtime: int) -> data_models.AggregatedResults:
+    get_cache_stats()["load_report.misses"] += 1
+    return analyzer_utils.load_report(file_path)
+
+
+@st.cache_resource(max_entries=4, show_spinner="Loading sentiment trends...")
+def _load_trend_cube(report_path: str, report_mtime: int, data_path: str,
+                     data_mtime: int, columns: Tuple[str, ...],
+                     reviews_processed: int) -> trend_cube.TrendCube:
+    get_cache_stats()["load_trend_cube.misses"] += 1
+    return trend_cube.load_or_build(report_path=report_path,
+                                    data_path=data_path,
+                                    data=_load_csv(data_path, data_mtime,
+                                                   columns, reviews_processed),
+                                    report=_load_report(report_path,
+                                                        report_mtime))
+
+
+@st.cache_data(max_entries=4, show_spinner="Scoring gold aspects...")
+def _load_aspect_scores(report_path: str, report_mtime: int, data_path: str,
+                        data_mtime: int,
+                        reviews_processed: int) -> Optional[pd.DataFrame]:
+    get_cache_stats()["load_aspect_scores.misses"] += 1
+    if "Aspects" not in pd.read_csv(data_path, nrows=0).columns:
+        return None
+    return aspect_evaluation.evaluate_report(
+        report=_load_report(report_path, report_mtime),
+        gold=aspect_evaluation.load_gold_aspects(
+            file_path=data_path, reviews_processed=reviews_processed))
+
+
+@st.cache_data(max_entries=4, show_spinner="Loading run metrics...")
+def _load_metrics(file_path: str, mtime: int) -> pd.DataFrame:
+    get_cache_stats()["load_metrics.misses"] += 1
+    return run_metrics.load_metrics(file_path)
+
+
+def load_csv(file_path: str,
+             columns: List[str] = [],
+             reviews_processed: int = -1) -> pd.DataFrame:
+    """Cached `analyzer_utils.load_csv`.
+
+    Args:
+        file_path (str): path to csv file.
+        columns List[str]: List of names of particular columns that needs to be extracted. All will be used by default.
+        reviews_processed (int, optional): Number of reviews proccessed, -1 to load all.
+
+    Returns:
+        df (pd.DataFrame): Dataframe containing all processed reviews (a private copy).
+    """
+    get_cache_stats()["load_csv.calls"] += 1
+    return _load_csv(file_path, get_mtime(file_path), tuple(columns),
+                     reviews_processed)
+
+
+def load_report(file_path: str) -> data_models.AggregatedResults:
+    """Cached `analyzer_utils.load_report`.
+
+    Args:
+        file_path (str): path to the analysis report.
+
+    Returns:
+        report (AggregatedResults): the report, shared across reruns and sessions (read-only).
+    """
+    get_cache_stats()["load_report.calls"] += 1
+    return _load_report(file_path, get_mtime(file_path))
+
+
+def load_trend_cube(report_path: str,
+                    data_path: str,
+                    columns: List[str] = [],
+                    reviews_processed: int = -1) -> trend_cube.TrendCube:
+    """Cached `trend_cube.load_or_build`, the cube is persisted next to the report.
+
+    Args:
+        report_path (str): path to the analysis report.
+        data_path (str): path to csv file.
+        columns List[str]: List of names of particular columns that needs to be extracted. All will be used by default.
+        reviews_processed (int, optional): Number of reviews proccessed, -1 to load all.
+
+    Returns:
+        cube (TrendCube): the sentiment trend cube, shared across reruns and sessions (read-only).
+    """
+    get_cache_stats()["load_trend_cube.calls"] += 1
+    return _load_trend_cube(report_path, get_mtime(report_path), data_path,
+                            get_mtime(data_path), tuple(columns),
+                            reviews_processed)
+
+
+def load_aspect_scores(report_path: str,
+                       data_path: str,
+                       reviews_processed: int = -1) -> Optional[pd.DataFrame]:
+    """Cached `aspect_evaluation.evaluate_report` against the gold aspects of the reviews.
+
+    Args:
+        report_path (str): path to the analysis report.
+        data_path (str): path to csv file.
+        reviews_processed (int, optional): Number of reviews proccessed, -1 to load all.
+
+    Returns:
+        scores (pd.DataFrame): precision, recall and F1 by sentiment, None if the reviews have no
+            gold aspects (no "Aspects" column).
+    """
+    get_cache_stats()["load_aspect_scores.calls"] += 1
+    return _load_aspect_scores(report_path, get_mtime(report_path), data_path,
+                               get_mtime(data_path), reviews_processed)
+
+
+def load_metrics(file_path: str) -> pd.DataFrame:
+    """Cached `run_metrics.load_metrics`, reloaded whenever a running analysis appends to the file.
+
+    Args:
+        file_path (str): path to the metrics file of a report (see `run_metrics.get_metrics_path`).
+
+    Returns:
+        metrics (pd.DataFrame): one row per committed batch (a private copy).
+    """
+    get_cache_stats()["load_metrics.calls"] += 1
+    return _load_metrics(file_path, get_mtime(file_path))
+
+
+def show_cache_stats() -> None:
+    """Displays the cache hits and misses of the loaders in the sidebar (if `app_debug` is set)."""
+    if not constants.app_debug:
+        return
+    stats = get_cache_stats()
+    loaders = sorted({key.split(".")[0] for key in stats})
+    with st.sidebar.expander("🐞 Data cache", expanded=True):
+        st.dataframe(pd.DataFrame([{
+            "Loader": loader,
+            "Hits": stats[f"{loader}.calls"] - stats[f"{loader}.misses"],
+            "Misses": stats[f"{loader}.misses"],
+        } for loader in loaders]),
+                     hide_index=True,
+                     use_container_width=True)
+        if st.button("Clear data cache"):
+            # Every data loader, and every resource loader but the cache stats themselves
+            st.cache_data.clear()
+            _load_report.clear()  # type: ignore[attr-defined]
+            _load_trend_cube.clear()  # type: ignore[attr-defined]
+            stats.clear()
+            st.rerun()
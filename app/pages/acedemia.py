@@ -2,12 +2,14 @@
 
 import streamlit as st
 
-from utils import analyzer_utils
+from app import data_access
 from utils import constants
 
 # Page Title
 st.title("🔍 Understanding Our AI-Powered Review Analysis Solution")
 
+data_access.show_cache_stats()
+
 # Create Tabs
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "📌 High-Level Design", "📊 Data Preview", "💬 Prompting",
@@ -30,8 +32,8 @@ with tab2:
     st.write("A glance at the customer reviews dataset before processing.")
 
     # Load Sample CSV and Display Preview
-    data = analyzer_utils.load_csv(file_path=constants.data_csv_path,
-                                   columns=constants.features_to_use)
+    data = data_access.load_csv(file_path=constants.data_csv_path,
+                                columns=constants.features_to_use)
     data.index = range(1, len(data) + 1)
     st.dataframe(data.head(20))
 
@@ -1,14 +1,13 @@
 """This file represents the `evaluation` page of the streamlit application"""
 
-import json
-import os
 import time
 
 import streamlit as st
 
+from app import data_access
+from app import plot_cache
 from utils import analyzer_utils
 from utils import constants
-from utils import data_models
 from utils import plotting_utils
 
 # Page Title
@@ -20,21 +19,17 @@ tab1, tab2, tab3 = st.tabs([
     "🧑🏾‍💻 Manual Verification"
 ])
 
-plot_dir = constants.plot_dir
-os.makedirs(plot_dir, exist_ok=True)
-
 plot_files = {
     "Review Length vs. Number of Entities":
         "review_length_vs_entities_violin.png"
 }
 
 # Load Data and report
-results = analyzer_utils.read_json(constants.analysis_report_path)
-report = data_models.AggregatedResults.model_validate(results)
+report = data_access.load_report(constants.analysis_report_path)
 
-data = analyzer_utils.load_csv(file_path=constants.data_csv_path,
-                               columns=constants.features_to_use,
-                               reviews_processed=constants.reviews_processed)
+data = data_access.load_csv(file_path=constants.data_csv_path,
+                            columns=constants.features_to_use,
+                            reviews_processed=constants.reviews_processed)
 
 reviews = data["Review"].to_list()
 
@@ -92,6 +87,22 @@ with tab1:
     st.subheader("Reviews Without Assigned Entities")
     st.dataframe(reviews_without_entities)
 
+    # Only datasets with gold aspects (SemEval) can be scored
+    aspect_scores = data_access.load_aspect_scores(
+        report_path=constants.analysis_report_path,
+        data_path=constants.data_csv_path,
+        reviews_processed=constants.reviews_processed)
+    if aspect_scores is not None:
+        st.divider()
+        st.subheader("🎯 Aspect-Level Accuracy")
+        st.write(
+            "Extracted entities are matched to the gold aspects of each review by lexical similarity. "
+            "**Precision** is the share of extracted (entity, sentiment) pairs matching a gold aspect, "
+            "**recall** the share of gold aspects found. The *any* row ignores sentiments."
+        )
+        st.dataframe(aspect_scores.style.format(precision=3),
+                     use_container_width=True)
+
 # Tab 2: Review Length vs. Entities Extracted
 with tab2:
     st.header("📊 Review Length vs. Entities Extracted")
@@ -99,13 +110,19 @@ with tab2:
         "This analysis helps us understand if longer reviews contain more extracted entities, "
         "or if entity extraction is independent of review length.")
 
-    #  Display Selected Plot
-    plot_path = os.path.join(plot_dir, "review_length_vs_entities_violin.png")
-
-    # generate plot
-    plotting_utils.plot_review_length_vs_entities_violin(reviews=reviews,
-                                                         report=report,
-                                                         save_path=plot_path)
+    # generate plot (or serve it from the plot cache)
+    plot_path = plot_cache.render_plot(
+        plotting_utils.plot_review_length_vs_entities_violin,
+        plot_name="review_length_vs_entities_violin",
+        source_paths=[constants.analysis_report_path, constants.data_csv_path],
+        inputs={
+            "reviews": reviews,
+            "report": report
+        },
+        source_options={
+            "columns": constants.features_to_use,
+            "reviews_processed": constants.reviews_processed,
+        })
     st.image(plot_path, use_container_width=True)
 
     st.markdown("""
@@ -150,3 +167,17 @@ with tab3:
         entity_name=selected_entity,
         sentiment=selected_sentiment)
     st.dataframe(reviews)
+
+    st.subheader("🔎 Review Drill-Down")
+    st.write("Inspect the entities and sentiments assigned to a single review.")
+    selected_review_id = st.number_input("Review id:",
+                                         min_value=0,
+                                         max_value=max(len(data) - 1, 0),
+                                         value=0)
+    st.info(data["Review"].iloc[selected_review_id])
+    st.dataframe(analyzer_utils.get_entities_for_review(
+        report=report, review_id=selected_review_id),
+                 hide_index=True,
+                 use_container_width=True)
+
+data_access.show_cache_stats()
@@ -1,14 +1,11 @@
 """This file represents the `insights` page of the streamlit application"""
 
-import json
-import os
-
 import pandas as pd
 import streamlit as st
 
-from utils import analyzer_utils
+from app import data_access
+from app import plot_cache
 from utils import constants
-from utils import data_models
 from utils import plotting_utils
 
 # Set page title
@@ -17,38 +14,33 @@ st.write(
     "Explore entity trends, sentiment distributions, and key patterns in the review data."
 )
 
-plot_dir = constants.plot_dir
-os.makedirs(plot_dir, exist_ok=True)
-
 plots = {
     "Top Entities Mentioned": {
-        "file_path":
-            "entity_frequency.png",
+        "plot_name":
+            "entity_frequency",
         "description":
             "Identifies the most frequently mentioned entities in reviews."
     },
     "Sentiment Intensity Heatmap": {
-        "file_path":
-            "sentiment_heatmap.png",
+        "plot_name":
+            "sentiment_heatmap",
         "description":
             "Visualizes the intensity of sentiments are across all reviews."
     },
     "Trend over time": {
-        "file_path": "trend.png",
+        "plot_name": "trend",
         "description": "Shows the distribution of sentiments over time"
     }
 }
 
 # Load analysis report
-with open(constants.analysis_report_path, "r") as f:
-    raw = json.load(f)
-    report = data_models.AggregatedResults.model_validate(raw)
+report = data_access.load_report(constants.analysis_report_path)
 
-data = analyzer_utils.load_csv(file_path=constants.data_csv_path,
-                               columns=constants.features_to_use,
-                               reviews_processed=constants.reviews_processed)
+data = data_access.load_csv(file_path=constants.data_csv_path,
+                            columns=constants.features_to_use,
+                            reviews_processed=constants.reviews_processed)
 
-if "Time_Submitted" in data.columns:
+if constants.time_column in data.columns:
     tab1, tab2, tab3, tab4 = st.tabs([
         "Report", "Entity Frequency", "Sentiment Distrubution",
         "Trend over time"
@@ -76,12 +68,12 @@ with tab1:
 # Tab 2: Entity Frequency
 with tab2:
     selected_plot = "Top Entities Mentioned"
-    plot_path = os.path.join(plot_dir, plots[selected_plot]["file_path"])
-
-    plotting_utils.plot_entity_frequency(
-        report=report,
-        top_k=20,
-        save_path=plot_path,
+    plot_path = plot_cache.render_plot(
+        plotting_utils.plot_entity_frequency,
+        plot_name=plots[selected_plot]["plot_name"],
+        source_paths=[constants.analysis_report_path],
+        inputs={"report": report},
+        params={"top_k": 20},
     )
 
     st.image(plot_path,
@@ -91,13 +83,57 @@ with tab2:
 # Tab 3 : Sentiment Distrubution
 with tab3:
     selected_plot = "Sentiment Intensity Heatmap"
-    plot_path = os.path.join(plot_dir, plots[selected_plot]["file_path"])
 
-    plotting_utils.plot_sentiment_heatmap(report=report, save_path=plot_path)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        min_mentions = st.number_input("Minimum mentions", min_value=1, value=1)
+    with col2:
+        view_mode = st.radio("View",
+                             ["Top & bottom entities", "Browse all entities"],
+                             horizontal=True)
+    with col3:
+        if view_mode == "Top & bottom entities":
+            num_entities = st.number_input("Entities per side",
+                                           min_value=1,
+                                           max_value=100,
+                                           value=25)
+        else:
+            page_size = st.number_input("Entities per page",
+                                        min_value=10,
+                                        max_value=200,
+                                        value=50)
+
+    if view_mode == "Top & bottom entities":
+        plot_path = plot_cache.render_plot(
+            plotting_utils.plot_sentiment_heatmap,
+            plot_name=plots[selected_plot]["plot_name"],
+            source_paths=[constants.analysis_report_path],
+            inputs={"report": report},
+            params={
+                "top_n": num_entities,
+                "bottom_n": num_entities,
+                "min_mentions": min_mentions,
+            },
+        )
 
-    st.image(plot_path,
-             caption=plots[selected_plot]["description"],
-             use_container_width=True)
+        st.image(plot_path,
+                 caption=plots[selected_plot]["description"],
+                 use_container_width=True)
+    else:
+        # Interactive chart: only the aggregated scores of one page are sent to the browser
+        scores = plotting_utils.get_sentiment_scores(report,
+                                                     min_mentions=min_mentions)
+        num_pages = max(1, -(-len(scores) // page_size))
+        page = st.number_input(f"Page (of {num_pages})",
+                               min_value=1,
+                               max_value=num_pages,
+                               value=1)
+        page_scores = scores.iloc[(page - 1) * page_size:page * page_size]
+        st.altair_chart(plotting_utils.sentiment_heatmap_chart(page_scores),
+                        use_container_width=True)
+        st.caption(
+            f"Entities {(page - 1) * page_size + 1}-{(page - 1) * page_size + len(page_scores)} "
+            f"of {len(scores)}, sorted from most positive to most negative.")
 
     with st.container(border=True):
         st.markdown("**How is the sentiment score calulated?**")
@@ -111,31 +147,51 @@ with tab3:
             - Works well for imbalanced sentiment distributions (e.g., when positive or negative reviews dominate).
             """)
 
-if "Time_Submitted" in data.columns:
+if constants.time_column in data.columns:
     # Tab 4 : Trend over time
     with tab4:
         selected_plot = "Trend over time"
-        plot_path = os.path.join(plot_dir, plots[selected_plot]["file_path"])
 
         # Create two columns
         col1, col2 = st.columns([2, 1])  # Adjust width ratios if needed
         # Place widgets in respective columns
         with col1:
-            selected_entity = st.selectbox("🔍 Select an Entity:",
-                                           sorted(report.keys()))
+            selected_entity = st.selectbox(
+                "🔍 Select an Entity:", ["All entities"] + sorted(report.keys()))
         with col2:
             selected_interval = st.radio("⏳ Time Interval:",
                                          ["Daily", "Weekly"],
                                          horizontal=True)
 
+        # Trends of all entities are precomputed once (and persisted next to the report)
+        cube = data_access.load_trend_cube(
+            report_path=constants.analysis_report_path,
+            data_path=constants.data_csv_path,
+            columns=constants.features_to_use,
+            reviews_processed=constants.reviews_processed)
+
         # Generate plot
-        plotting_utils.plot_sentiment_trend(
-            entity_name=selected_entity,
-            data_df=data,
-            report=report,
-            save_path=plot_path,
-            time_interval="D" if selected_interval == "Daily" else "W")
+        plot_path = plot_cache.render_plot(
+            plotting_utils.plot_entity_trend,
+            plot_name=plots[selected_plot]["plot_name"],
+            source_paths=[
+                constants.analysis_report_path, constants.data_csv_path
+            ],
+            inputs={"cube": cube},
+            params={
+                "entity_name":
+                    None
+                    if selected_entity == "All entities" else selected_entity,
+                "time_interval":
+                    "D" if selected_interval == "Daily" else "W",
+            },
+            source_options={
+                "columns": constants.features_to_use,
+                "reviews_processed": constants.reviews_processed,
+            })
 
         st.image(plot_path,
                  caption=plots[selected_plot]["description"],
                  use_container_width=True)
+
+data_access.show_cache_stats()
@@ -0,0 +1,98 @@
+"""This file represents the `telemetry` page of the streamlit application"""
+
+import glob
+import os
+
+import streamlit as st
+
+from app import data_access
+from utils import constants
+from utils import plotting_utils
+from utils import run_metrics
+
+# Page Title
+st.title("⏱️ Run Telemetry")
+st.write(
+    "Per-batch metrics recorded by the analyzer, to see where the time of a run goes. "
+    "Every committed batch appends a record to the `*_metrics.jsonl` file next to its report."
+)
+
+# Metrics files of all runs under the result directory, the configured run first
+default_path = run_metrics.get_metrics_path(constants.aggregated_results_path)
+metrics_paths = sorted(
+    glob.glob(os.path.join(constants.result_dir, "**", "*_metrics.jsonl"),
+              recursive=True))
+if os.path.exists(default_path):
+    metrics_paths = [default_path] + [
+        path for path in metrics_paths
+        if os.path.abspath(path) != os.path.abspath(default_path)
+    ]
+if not metrics_paths:
+    st.info(
+        f"No run metrics found under `{constants.result_dir}`, run `python -m src.analyzer` first."
+    )
+    st.stop()
+
+metrics_path = st.selectbox("📁 Metrics file:", metrics_paths)
+all_metrics = data_access.load_metrics(metrics_path)
+if all_metrics.empty:
+    st.info("No batch has been committed yet.")
+    st.stop()
+
+# A resumed or retried report has one run per invocation of the analyzer, latest first
+run_id = st.selectbox("🏃 Run:", list(all_metrics["run_id"].unique())[::-1])
+metrics = all_metrics[all_metrics["run_id"] == run_id]
+stages = list(run_metrics.STAGES)
+
+# Summary
+wall_time = metrics["timestamp"].max() - metrics["timestamp"].min()
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("📦 Batches", len(metrics))
+col2.metric("📝 Reviews", int(metrics["num_reviews"].sum()))
+col3.metric("❌ Failed Batches", int((metrics["status"] != "ok").sum()))
+col4.metric("🔁 Retries", int(metrics["retries"].sum()))
+col5.metric(
+    "⚡ Reviews/s",
+    f"{metrics['num_reviews'].sum() / wall_time:.1f}" if wall_time > 0 else "-")
+
+st.divider()
+
+st.subheader("⏳ Time per Stage")
+st.write(
+    "Total time spent in each stage of the pipeline. Batches are processed concurrently, "
+    "so the waits and LLM calls of batches in flight overlap and add up to more than the wall time."
+)
+st.altair_chart(plotting_utils.stage_time_chart(metrics, stages),
+                use_container_width=True)
+
+st.subheader("📊 Stage Durations per Batch")
+selected_stages = st.multiselect("Stages:", stages, default=stages)
+if selected_stages:
+    st.altair_chart(plotting_utils.batch_stage_chart(metrics, selected_stages),
+                    use_container_width=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("🔤 Prompt Tokens")
+    st.line_chart(metrics,
+                  x="batch_num",
+                  y=["prompt_tokens", "output_tokens"],
+                  x_label="Batch",
+                  y_label="Estimated tokens")
+with col2:
+    st.subheader("🧠 Entity Memory")
+    st.line_chart(metrics,
+                  x="batch_num",
+                  y=["existing_entities", "memory_entities"],
+                  x_label="Batch",
+                  y_label="Entities")
+
+st.subheader("🐢 Slowest Batches")
+slowest = metrics.assign(
+    total_seconds=metrics[[f"{stage}_seconds" for stage in stages]].sum(
+        axis=1)).nlargest(10, "total_seconds")
+st.dataframe(slowest.drop(columns=["run_id", "timestamp"]),
+             hide_index=True,
+             use_container_width=True)
+
+data_access.show_cache_stats()
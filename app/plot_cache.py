@@ -0,0 +1,131 @@
+"""This file contains a content-addressed cache for the plots rendered by the streamlit application.
+
+A plot is identified by the fingerprints of its source files (report, reviews) and its
+parameters. It is rendered once in memory, then published atomically under its content
+address (see `report_journal.write_atomic`), later views of any session serve the published file.
+Only the `constants.plot_cache_max_versions` most recently viewed renders of a plot are kept.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+
+from app import data_access
+from utils import constants
+from utils import report_journal
+
+
+@st.cache_resource
+def get_render_lock() -> threading.Lock:
+    """Returns the process-wide lock serializing renders (pyplot is not thread-safe)."""
+    return threading.Lock()
+
+
+def touch(plot_path: str) -> None:
+    """Marks a cached plot as viewed, eviction removes the least recently viewed renders."""
+    try:
+        os.utime(plot_path)
+    except OSError:
+        # evicted in the meantime, or read-only cache
+        pass
+
+
+def make_plot_key(plot_name: str, source_paths: List[str],
+                  params: Dict[str, Any]) -> str:
+    """Builds the content address of a plot.
+
+    Args:
+        plot_name (str): name of the plot.
+        source_paths (List[str]): files the plot is computed from.
+        params (Dict[str, Any]): json serializable parameters of the plot and of the loading of its sources.
+
+    Returns:
+        key (str): sha256 hex digest identifying the plot.
+    """
+    digest = hashlib.sha256()
+    digest.update(plot_name.encode("utf-8"))
+    for source_path in source_paths:
+        digest.update(data_access.get_fingerprint(source_path).encode("utf-8"))
+    digest.update(
+        json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def evict_plots(cache_dir: str, plot_name: str, max_versions: int) -> None:
+    """Removes the least recently viewed renders of a plot beyond `max_versions`.
+
+    Args:
+        cache_dir (str): directory of the cached plots.
+        plot_name (str): name of the plot.
+        max_versions (int): number of renders of the plot kept.
+    """
+    pattern = re.compile(rf"{re.escape(plot_name)}-[0-9a-f]{{32}}\.png")
+    plot_paths = []
+    for entry in os.scandir(cache_dir):
+        if pattern.fullmatch(entry.name):
+            try:
+                plot_paths.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    for _, plot_path in sorted(plot_paths, reverse=True)[max_versions:]:
+        try:
+            os.remove(plot_path)
+        except FileNotFoundError:
+            # evicted by another process
+            pass
+
+
+def render_plot(plot_fn: Callable[..., None],
+                plot_name: str,
+                source_paths: List[str],
+                inputs: Dict[str, Any],
+                params: Optional[Dict[str, Any]] = None,
+                source_options: Optional[Dict[str, Any]] = None,
+                plot_dir: str = constants.plot_dir,
+                max_versions: int = constants.plot_cache_max_versions) -> str:
+    """Returns the path of a rendered plot, rendering it only if it is not cached yet.
+
+    Args:
+        plot_fn (Callable): plotting function from `plotting_utils`, taking a `save_path` argument.
+        plot_name (str): name of the plot, prefix of the image file.
+        source_paths (List[str]): files `inputs` are loaded from, their contents key the plot.
+        inputs (Dict[str, Any]): data arguments of `plot_fn` (e.g. report, reviews), not hashed.
+        params (Dict[str, Any], optional): remaining arguments of `plot_fn`, part of the key.
+        source_options (Dict[str, Any], optional): options `inputs` were loaded with (e.g. columns),
+            part of the key.
+        plot_dir (str): directory of the cached plots.
+        max_versions (int): renders of the plot kept in the cache, older renders are evicted
+            when a new one is published.
+
+    Returns:
+        plot_path (str): path to the rendered image.
+    """
+    params = params or {}
+    stats = data_access.get_cache_stats()
+    stats["render_plot.calls"] += 1
+
+    key = make_plot_key(plot_name, source_paths,
+                        params | {"source_options": source_options or {}})
+    cache_dir = os.path.join(plot_dir, "cache")
+    plot_path = os.path.join(cache_dir, f"{plot_name}-{key[:32]}.png")
+    if os.path.exists(plot_path):
+        touch(plot_path)
+        return plot_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with get_render_lock():
+        if os.path.exists(plot_path):
+            return plot_path
+        stats["render_plot.misses"] += 1
+        # matplotlib writes png (its default format) to a buffer
+        image = io.BytesIO()
+        plot_fn(**inputs, **params, save_path=image)
+        report_journal.write_atomic(plot_path, image.getvalue())
+        evict_plots(cache_dir, plot_name, max_versions)
+    return plot_path
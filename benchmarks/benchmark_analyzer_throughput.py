@@ -0,0 +1,154 @@
+"""Benchmarks the end-to-end throughput of the analyzer against the offline mock LLM backend.
+
+Every size is run in a fresh process, so that its peak RSS is measured independently.
+
+Usage:
+    python -m benchmarks.benchmark_analyzer_throughput --num_reviews 1000 100000 1000000
+"""
+
+import argparse
+from concurrent import futures
+import contextlib
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import constants
+from utils import llm_backends
+from utils import rate_limiter
+from utils import run_metrics
+
+STAGES = run_metrics.STAGES
+
+
+def make_synthetic_reviews(num_reviews: int,
+                           seed: int = 0) -> Iterator[Tuple[int, str]]:
+    """Yields (review id, review) pairs mentioning the aspects and sentiment words of the mock backend.
+
+    Args:
+        num_reviews (int): number of reviews.
+        seed (int): random seed.
+
+    Yields:
+        (int, str): review id and review.
+    """
+    rng = random.Random(seed)
+    aspects = sorted(llm_backends.MOCK_ASPECTS)
+    sentiment_words = sorted(llm_backends.MOCK_POSITIVE_WORDS |
+                             llm_backends.MOCK_NEGATIVE_WORDS)
+    filler = ("the", "it", "was", "really", "and", "but", "for", "this", "i",
+              "after", "a", "week", "of", "use", "overall")
+    for review_id in range(num_reviews):
+        words = rng.choices(filler, k=rng.randint(5, 40))
+        words += rng.choices(aspects, k=rng.randint(0, 3))
+        words += rng.choices(sentiment_words, k=rng.randint(0, 2))
+        rng.shuffle(words)
+        yield review_id, " ".join(words)
+
+
+def run_benchmark(num_reviews: int, batch_size: int,
+                  max_concurrent_batches: int,
+                  backend_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyzes synthetic reviews with the mock backend and measures the run.
+
+    Args:
+        num_reviews (int): number of reviews.
+        batch_size (int): maximum number of reviews per batch.
+        max_concurrent_batches (int): number of batches kept in flight.
+        backend_options (Dict[str, Any]): arguments of `llm_backends.MockBackend`.
+
+    Returns:
+        results (Dict[str, Any]): throughput, stage latencies (ms) and peak RSS (MB).
+    """
+    # Imported here, the analyzer configures logging on import
+    from src import analyzer
+
+    logging.getLogger("Review Analyzer").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp_dir, open(
+            os.devnull, "w") as devnull, contextlib.redirect_stdout(
+                devnull), contextlib.redirect_stderr(devnull):
+        review_analyzer = analyzer.ReviewAnalyzer(
+            report_path=os.path.join(tmp_dir, "analysis_report.json"),
+            # The benchmark measures the pipeline, not the quota
+            limiter=rate_limiter.RateLimiter(requests_per_minute=1e9),
+            debug_dir=os.path.join(tmp_dir, "logs"),
+            llm=llm_backends.MockBackend(**backend_options))
+        start = time.perf_counter()
+        report = review_analyzer.process_reviews_in_batches(
+            make_synthetic_reviews(num_reviews),
+            batch_size=batch_size,
+            max_concurrent_batches=max_concurrent_batches,
+            review_token_budget=constants.review_token_budget,
+            max_output_tokens=constants.max_output_tokens)
+        elapsed = time.perf_counter() - start
+
+    results: Dict[str, Any] = {
+        "reviews": num_reviews,
+        "batches": len(review_analyzer.stage_latencies["build_prompt"]),
+        "seconds": elapsed,
+        "reviews/s": num_reviews / elapsed,
+        "entities": len(report.existing_entities),
+        "failed_batches": len(report.failed_batches),
+    }
+    for stage in STAGES:
+        latencies = np.array(review_analyzer.stage_latencies[stage]) * 1000
+        results[f"{stage} mean/p95 (ms)"] = (
+            f"{latencies.mean():.2f}/{np.percentile(latencies, 95):.2f}"
+            if len(latencies) else "-")
+    # ru_maxrss is in kilobytes on Linux
+    results["peak RSS (MB)"] = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_reviews",
+                        type=int,
+                        nargs="+",
+                        default=[1000, 100_000, 1_000_000])
+    parser.add_argument("--batch_size", type=int, default=constants.batch_size)
+    parser.add_argument("--max_concurrent_batches",
+                        type=int,
+                        default=constants.max_concurrent_batches)
+    parser.add_argument("--latency",
+                        type=float,
+                        default=0.0,
+                        help="mean seconds per mock LLM call")
+    parser.add_argument("--latency_jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    backend_options = {
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+    }
+    rows = []
+    for num_reviews in args.num_reviews:
+        with futures.ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn")) as executor:
+            rows.append(
+                executor.submit(run_benchmark, num_reviews, args.batch_size,
+                                args.max_concurrent_batches,
+                                backend_options).result())
+        print(f"{num_reviews} reviews: {rows[-1]['reviews/s']:.0f} reviews/s")
+
+    print(
+        pd.DataFrame(rows).set_index("reviews").T.to_string(
+            float_format=lambda value: f"{value:.2f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmarks the SemEval data preparation on a synthetic ABSA-style dataset.
+
+Usage:
+    python -m benchmarks.benchmark_prepare_semeval_data --num_reviews 200000 --chunk_size 100000
+"""
+
+import argparse
+import collections
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_preparation import prepare_semeval_data
+
+
+def make_synthetic_data(num_reviews: int,
+                        aspects_per_review: float = 2.5,
+                        seed: int = 0) -> pd.DataFrame:
+    """Builds raw SemEval data, one row per (review, aspect, polarity).
+
+    Args:
+        num_reviews (int): number of reviews.
+        aspects_per_review (float): average number of aspects per review.
+        seed (int): random seed.
+
+    Returns:
+        data_df (pd.DataFrame): raw data with "id", "Review", "aspect" and "polarity" columns.
+    """
+    rng = np.random.default_rng(seed)
+    num_aspects = rng.poisson(aspects_per_review - 1, num_reviews) + 1
+    review_ids = np.repeat(np.arange(num_reviews), num_aspects)
+    aspects = np.array([f"aspect {i}" for i in range(500)])
+    polarities = np.array(["positive", "negative", "neutral", "conflict"])
+    return pd.DataFrame({
+        "id": review_ids + 1000,
+        "Review": [f"review text number {i}" for i in review_ids],
+        "aspect": aspects[rng.integers(0, len(aspects), len(review_ids))],
+        "polarity": polarities[rng.integers(0, 4, len(review_ids))],
+    })
+
+
+def prepare_data_iterrows(data_df: pd.DataFrame) -> pd.DataFrame:
+    """Row by row grouping, as done before vectorization."""
+    grouped = collections.defaultdict(list)
+    for _, row in data_df.iterrows():
+        grouped[(row["id"], row["Review"])].append({
+            "aspect": row["aspect"],
+            "polarity": row["polarity"]
+        })
+    return pd.DataFrame([{
+        "id": id,
+        "Review": review,
+        "Aspects": aspect_list
+    } for (id, review), aspect_list in grouped.items()])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_reviews", type=int, default=200_000)
+    parser.add_argument("--chunk_size", type=int, default=100_000)
+    parser.add_argument(
+        "--iterrows_sample",
+        type=int,
+        default=20_000,
+        help="rows timed with iterrows, extrapolated to all rows")
+    args = parser.parse_args()
+
+    data = make_synthetic_data(args.num_reviews)
+    print(f"synthetic data: {args.num_reviews} reviews, {len(data)} rows")
+
+    start = time.perf_counter()
+    prepared_data = prepare_semeval_data.prepare_data(data)
+    groupby_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = (data.iloc[i:i + args.chunk_size]
+              for i in range(0, len(data), args.chunk_size))
+    prepared_chunks = pd.concat(list(
+        prepare_semeval_data.prepare_data_chunked(chunks)),
+                                ignore_index=True)
+    chunked_time = time.perf_counter() - start
+
+    sample = data.iloc[:min(args.iterrows_sample, len(data))]
+    start = time.perf_counter()
+    prepared_sample = prepare_data_iterrows(sample)
+    iterrows_time = (time.perf_counter() - start) * len(data) / len(sample)
+
+    # Same csv file as the previous implementation
+    assert prepared_sample.to_csv() == prepare_semeval_data.prepare_data(
+        sample).to_csv()
+    assert prepared_chunks.to_csv() == prepared_data.to_csv()
+
+    print(f"iterrows (extrapolated): {iterrows_time:10.2f}s")
+    print(f"groupby/agg:             {groupby_time:10.2f}s")
+    print(f"groupby/agg, chunked:    {chunked_time:10.2f}s")
+    print(f"speed-up:                {iterrows_time / groupby_time:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmarks the review length vs entities violin plot on a synthetic report.
+
+Usage:
+    python -m benchmarks.benchmark_violin_plot --num_reviews 300000 --num_entities 4000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, Set
+
+import numpy as np
+
+from utils import analyzer_utils
+from utils import data_models
+from utils import plotting_utils
+
+
+def make_synthetic_report(num_reviews: int,
+                          num_entities: int,
+                          mentions_per_review: float = 2.0,
+                          seed: int = 0) -> data_models.AggregatedResults:
+    """Builds a report with Zipf distributed entity mentions.
+
+    Args:
+        num_reviews (int): number of reviews.
+        num_entities (int): number of entities.
+        mentions_per_review (float): average number of (entity, sentiment) mentions per review.
+        seed (int): random seed.
+
+    Returns:
+        report (AggregatedResults): the synthetic report.
+    """
+    rng = np.random.default_rng(seed)
+    num_mentions = int(num_reviews * mentions_per_review)
+    entity_ids = np.minimum(rng.zipf(1.3, num_mentions) - 1, num_entities - 1)
+    review_ids = rng.integers(0, num_reviews, num_mentions)
+    positive = rng.random(num_mentions) < 0.6
+
+    entity_sentiment_map = {}
+    for entity_id in range(num_entities):
+        mask = entity_ids == entity_id
+        entity_sentiment_map[f"entity-{entity_id}"] = {
+            "positive_review_ids":
+                data_models.ReviewIdSet(review_ids[mask & positive]),
+            "negative_review_ids":
+                data_models.ReviewIdSet(review_ids[mask & ~positive]),
+        }
+    return data_models.AggregatedResults(
+        entity_sentiment_map=entity_sentiment_map)
+
+
+# entity -> sentiment key -> review IDs, the report model before `ReviewIdSet`
+EntitySentimentSets = Dict[str, Dict[str, Set[int]]]
+
+
+def to_python_sets(
+        report: data_models.AggregatedResults) -> EntitySentimentSets:
+    """Converts the review IDs of a report to python sets."""
+    return {
+        entity: {
+            sentiment_key: set(review_ids)
+            for sentiment_key, review_ids in sentiment_map.items()
+        } for entity, sentiment_map in report.items()
+    }
+
+
+def count_entities_per_review_loop(entity_sentiment_map: EntitySentimentSets,
+                                   review_ids: range) -> list:
+    """Per-review scan over all entities (python sets), as done before vectorization."""
+    return [
+        sum(review_id in sentiment_map["positive_review_ids"] or
+            review_id in sentiment_map["negative_review_ids"]
+            for sentiment_map in entity_sentiment_map.values())
+        for review_id in review_ids
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_reviews", type=int, default=300_000)
+    parser.add_argument("--num_entities", type=int, default=4000)
+    parser.add_argument(
+        "--loop_sample",
+        type=int,
+        default=200,
+        help=
+        "reviews timed with the per-review loop, extrapolated to all reviews")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = make_synthetic_report(args.num_reviews, args.num_entities)
+    print(f"synthetic report: {args.num_reviews} reviews, "
+          f"{args.num_entities} entities ({time.perf_counter() - start:.2f}s)")
+
+    rng = np.random.default_rng(0)
+    reviews = [
+        " ".join(["word"] * length)
+        for length in rng.integers(3, 300, args.num_reviews)
+    ]
+
+    start = time.perf_counter()
+    entity_counts = analyzer_utils.count_entities_per_review(
+        report, args.num_reviews)
+    bincount_time = time.perf_counter() - start
+
+    # The loop runs on python sets, as before vectorization (a membership test on a
+    # `ReviewIdSet` is a binary search, much slower than a set lookup)
+    entity_sentiment_map = to_python_sets(report)
+    sample = range(min(args.loop_sample, args.num_reviews))
+    start = time.perf_counter()
+    loop_counts = count_entities_per_review_loop(entity_sentiment_map, sample)
+    loop_time = (time.perf_counter() - start) * args.num_reviews / len(sample)
+    assert loop_counts == entity_counts[:len(sample)].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        plotting_utils.plot_review_length_vs_entities_violin(
+            reviews=reviews,
+            report=report,
+            save_path=os.path.join(tmp_dir, "violin.png"))
+        plot_time = time.perf_counter() - start
+
+    print(f"entity counts, per-review loop (extrapolated): {loop_time:10.2f}s")
+    print(
+        f"entity counts, bincount:                       {bincount_time:10.2f}s"
+    )
+    print(
+        f"speed-up:                                      {loop_time / bincount_time:10.0f}x"
+    )
+    print(f"full violin plot:                              {plot_time:10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
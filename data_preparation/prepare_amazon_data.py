@@ -1,9 +1,15 @@
-"""This file processes Amazon reviews for a specific category by grouping reviews sharing the same parent_asin and saves the top 20 groups as individual datasets."""
+"""This file processes Amazon reviews for a specific category by grouping reviews sharing the same parent_asin and saves the top 20 groups as individual datasets.
+
+The review file is streamed twice: a first pass counts the reviews per parent_asin, a second pass
+extracts the reviews of the top groups, so whole categories can be prepared with bounded memory.
+"""
 
 import argparse
+import collections
+import heapq
 import json
 import os
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 import pandas as pd
 
@@ -12,77 +18,102 @@ from utils import analyzer_utils
 logger = analyzer_utils.Logger("Review Analyzer").get_logger()
 
 
-def jsonl_to_dataframe(file_path: str, chunk_size: int = 10000):
-    """Yields chunks from jsonl data.
+def iter_jsonl(file_path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields the records of a jsonl file one at a time.
 
     Args:
         file_path (str): path to jsonl file.
-        chunk_size (int): size of a single chunk.
-    
+
+    Yields:
+        (int, Dict[str, Any]): line number (from 0) and parsed record.
+
+    Raise:
+        FileNotFoundError: if provided file path is invalid
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(
+            f"Unable to load data, file not found at {file_path}")
+    with open(file_path, 'r') as f:
+        for i, line in enumerate(f):
+            yield i, json.loads(line)
+
+
+def count_reviews(file_path: str) -> collections.Counter:
+    """First pass: counts the reviews of every `parent_asin`.
+
+    Only the counts are kept in memory (one entry per product), not the reviews.
+
+    Args:
+        file_path (str): path to the jsonl review file.
+
     Returns:
-        (pd.DataFrame): dataframe consisting `chunk-size` of data.
-    
-    Note: FileNotFound is handled by the calling function
+        counts (collections.Counter): number of reviews per `parent_asin`.
     """
-    data_chunk = []
-    for i, line in enumerate(open(file_path, 'r')):
-        data_chunk.append(json.loads(line))
+    return collections.Counter(
+        record["parent_asin"] for _, record in iter_jsonl(file_path))
+
 
-        # Once chunk_size is hit, yield the chunk
-        if (i + 1) % chunk_size == 0:
-            yield pd.DataFrame(data_chunk)
-            data_chunk = []
+def get_top_groups(counts: collections.Counter,
+                   top_k: int) -> List[Tuple[str, int]]:
+    """Returns the `top_k` products with the most reviews, ties broken by `parent_asin`."""
+    return heapq.nsmallest(top_k,
+                           counts.items(),
+                           key=lambda item: (-item[1], item[0]))
 
-    # Yield any remaining lines
-    if data_chunk:
-        yield pd.DataFrame(data_chunk)
 
+def extract_groups(file_path: str, parent_asins: Iterable[str],
+                   features_to_use: List[str]) -> Dict[str, pd.DataFrame]:
+    """Second pass: extracts the reviews of the given products.
+
+    Only the reviews of `parent_asins` are kept in memory.
 
-def load_data(file_path: str,
-              features_to_use: List[str],
-              chunk_size: int = 10000) -> pd.DataFrame:
-    """Loads newline-delimited JSON file into a DataFrame by chunking the bulk data.
-    
     Args:
-        file_path (str): path to jsonl file.
+        file_path (str): path to the jsonl review file.
+        parent_asins (Iterable[str]): products to be extracted.
         features_to_use (List[str]): List of names of particular columns that needs to be extracted.
-        chunk_size (int): size of chunk.
-    
+
     Returns:
-        data_df (pd.DataFrame): Loaded data.
+        groups (Dict[str, pd.DataFrame]): reviews of every product, indexed by line number in the file.
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(
-            f"Unable to load data, file not found at {file_path}")
-    df_chunks = []
-    for chunk in jsonl_to_dataframe(file_path, chunk_size):
-        df_chunks.append(chunk)
-        if len(df_chunks) >= 50:
-            break
+    rows: Dict[str, List[Dict[str, Any]]] = {
+        parent_asin: [] for parent_asin in parent_asins
+    }
+    line_numbers: Dict[str,
+                       List[int]] = {parent_asin: [] for parent_asin in rows}
+    for i, record in iter_jsonl(file_path):
+        if record["parent_asin"] in rows:
+            rows[record["parent_asin"]].append(
+                {feature: record.get(feature) for feature in features_to_use})
+            line_numbers[record["parent_asin"]].append(i)
+    return {
+        parent_asin: pd.DataFrame(group_rows,
+                                  index=line_numbers[parent_asin],
+                                  columns=features_to_use)
+        for parent_asin, group_rows in rows.items()
+    }
 
-    # Combine all chunks
-    data_df = pd.concat(df_chunks, ignore_index=True)
-    return data_df[features_to_use]
 
+def load_product_titles(file_path: str,
+                        parent_asins: Iterable[str]) -> Dict[str, str]:
+    """Indexes the product titles of the metadata file by `parent_asin`, in a single pass.
 
-def load_meta_data(file_path: str, features_to_use: List[str]) -> pd.DataFrame:
-    """Load newline-delimited JSON file into a DataFrame
-    
     Args:
-        file_path (str): path to jsonl file.
-        features_to_use (List[str]): List of names of particular columns that needs to be extracted.
-        
+        file_path (str): path to the jsonl metadata file.
+        parent_asins (Iterable[str]): products to be indexed.
+
     Returns:
-        meta_df (pd.DataFrame): Loaded meta data.
-    
-    Raise:
-        FiFileNotFoundError: if provided file path is invalid
+        titles (Dict[str, str]): title of every product found in the metadata.
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(
-            f"Unable to load meta data, file not found at {file_path}")
-    meta_df = pd.read_json(file_path, lines=True)
-    return meta_df[features_to_use]
+    wanted_asins = set(parent_asins)
+    titles: Dict[str, str] = {}
+    for _, record in iter_jsonl(file_path):
+        parent_asin = record["parent_asin"]
+        if parent_asin in wanted_asins and parent_asin not in titles:
+            titles[parent_asin] = record["title"]
+            # the rest of the file is not needed
+            if len(titles) == len(wanted_asins):
+                break
+    return titles
 
 
 def main():
@@ -101,54 +132,53 @@ def main():
                         type=str,
                         required=True,
                         help="name of json file containing meta data")
+    parser.add_argument("--top_k",
+                        type=int,
+                        default=20,
+                        help="number of products (most reviewed) to be saved")
 
     args = parser.parse_args()
     data_dir = args.data_dir
-    data_filename = args.review_filename
-    metadata_filename = args.meta_filename
-
-    # load review data
-    logger.info("loading data")
-    data_df = load_data(
-        file_path=os.path.join(data_dir, data_filename),
+    data_file_path = os.path.join(data_dir, args.review_filename)
+    metadata_file_path = os.path.join(data_dir, args.meta_filename)
+
+    # count reviews by `parent_asin`
+    logger.info("counting reviews per parent asin")
+    counts = count_reviews(data_file_path)
+    top_groups = get_top_groups(counts, args.top_k)
+    logger.info(
+        f"counted {sum(counts.values())} reviews of {len(counts)} products.")
+
+    # extract the reviews of the top groups
+    logger.info(f"extracting reviews of the top {len(top_groups)} products")
+    groups = extract_groups(
+        file_path=data_file_path,
+        parent_asins=[parent_asin for parent_asin, _ in top_groups],
         features_to_use=['title', 'text', 'asin', 'parent_asin'])
-    logger.info("loaded data")
+    logger.info("grouping completed succefully.")
 
-    # load meta data
+    # index product titles
     logger.info("loading  metadata")
-    meta_df = load_meta_data(
-        file_path=os.path.join(data_dir, metadata_filename),
-        features_to_use=['main_category', 'title', 'parent_asin'])
+    product_names = load_product_titles(
+        file_path=metadata_file_path,
+        parent_asins=[parent_asin for parent_asin, _ in top_groups])
     logger.info("loaded metadata")
 
-    # group reviews by `parent_asin`
-    logger.info("grouping by parent asin")
-    asin_groups = {
-        asin: group for asin, group in data_df.groupby("parent_asin")
-    }
-    # sort the groups based on number of reviews
-    sorted_asin_groups = dict(
-        sorted(asin_groups.items(), key=lambda item: len(item[1]),
-               reverse=True))
-    logger.info("grouping completed succefully.")
-
-    # Save the reviews for top 20 groups as individual datasets.
+    # Save the reviews for top groups as individual datasets.
     logger.info(f"saving prepared data to {data_dir}")
-    file = open(os.path.join(data_dir, "product_name.txt"), 'w')
-    for idx, (parent_asin, group) in enumerate(sorted_asin_groups.items(),
-                                               start=1):
-        print(f"{'__'*30}\n")
-        if idx == 20:
-            break  # extracting reviews for top 20 products from a category
-        product_name = meta_df.loc[meta_df["parent_asin"] == parent_asin,
-                                   "title"].values[0]
-        logger.info(
-            f"\nPARENT ASIN = {parent_asin}\nproduct_name = {product_name}\nNumber of reviews = {len(group)}"
-        )
-        group = group.rename(columns={"text": "Review"})
-        group.to_csv(f"{data_dir}/{idx}_{parent_asin}.csv")
-        file.write(f"{idx}_{parent_asin} : {product_name} [{len(group)}]\n")
-    file.close()
+    with open(os.path.join(data_dir, "product_name.txt"), 'w') as file:
+        for idx, (parent_asin, _) in enumerate(top_groups, start=1):
+            print(f"{'__'*30}\n")
+            group = groups[parent_asin]
+            product_name = product_names.get(parent_asin)
+            if product_name is None:
+                logger.warning(f"No metadata found for {parent_asin}")
+            logger.info(
+                f"\nPARENT ASIN = {parent_asin}\nproduct_name = {product_name}\nNumber of reviews = {len(group)}"
+            )
+            group = group.rename(columns={"text": "Review"})
+            group.to_csv(f"{data_dir}/{idx}_{parent_asin}.csv")
+            file.write(f"{idx}_{parent_asin} : {product_name} [{len(group)}]\n")
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
 """This file processes the SemEval-2014(ABSA) dataset by merging multiple aspect-polarity pairs per review into single entries, consolidating all aspects and their sentiments into one record per review."""
 
 import argparse
-import collections
 import os
+from typing import Iterable, Iterator, Set
 
+import numpy as np
 import pandas as pd
 
 from utils import analyzer_utils
@@ -17,35 +18,75 @@ def prepare_data(data_df: pd.DataFrame) -> pd.DataFrame:
     In the original format, each aspect-polarity pair for a review appears as a separate row.
     This function groups all entries by review and creates a new column `Aspects` that contains 
     a list of dictionaries with aspect-polarity pairs.
+    Reviews keep the order of their first row, aspects the order of their rows.
     
     Args:
         data_df (pd.DataFrame) : Dataframe containing raw data.
     Returns:
         prepared_data_df (pd.DataFrame) : Transformed DataFrame with one row per review and an aggregated `Aspects` column.
     """
-    grouped = collections.defaultdict(list)
-
-    for _, row in data_df.iterrows():
-        id = row['id']
-        review = row['Review']
-        aspect = row['aspect']
-        polarity = row['polarity']
-
-        key = (id, review)
-        grouped[key].append({"aspect": aspect, "polarity": polarity})
-
-    grouped_data = []
-    for (id, review), aspect_list in grouped.items():
-        grouped_data.append({
-            'id': id,
-            'Review': review,
-            'Aspects': aspect_list
-        })
-
-    prepared_data_df = pd.DataFrame(grouped_data)
+    # Reviews are numbered in order of first appearance, a stable sort keeps the aspect order
+    review_codes = data_df.groupby(["id", "Review"], sort=False,
+                                   dropna=False).ngroup().to_numpy()
+    order = np.argsort(review_codes, kind="stable")
+    bounds = np.searchsorted(review_codes[order],
+                             np.arange(review_codes.max(initial=-1) + 2))
+    aspects = [{
+        "aspect": aspect,
+        "polarity": polarity
+    } for aspect, polarity in zip(data_df["aspect"].to_numpy()[order],
+                                  data_df["polarity"].to_numpy()[order])]
+
+    first_rows = order[bounds[:-1]]
+    prepared_data_df = pd.DataFrame({
+        "id":
+            data_df["id"].iloc[first_rows].to_numpy(),
+        "Review":
+            data_df["Review"].iloc[first_rows].to_numpy(),
+        "Aspects": [
+            aspects[start:end] for start, end in zip(bounds[:-1], bounds[1:])
+        ],
+    })
     return prepared_data_df
 
 
+def prepare_data_chunked(
+        chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Prepare SemEval dataset from chunks of raw data (e.g. `pd.read_csv(..., chunksize=...)`).
+
+    Yields the same rows as `prepare_data` on the concatenated chunks, with a bounded memory
+    footprint. The rows of a review must be contiguous (as in the SemEval files), the last review
+    of a chunk is held back until the next chunk shows whether it continues. Only the reviews of
+    the previous chunk are kept to check contiguity, a review whose rows are further apart is
+    not detected and yielded twice.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]) : chunks of raw data, in file order.
+    Yields:
+        prepared_data_df (pd.DataFrame) : prepared reviews, with the schema of `prepare_data`.
+    """
+    pending = None
+    # hashes of the reviews yielded for the previous chunk, to detect non-contiguous reviews
+    previous_keys: Set[int] = set()
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pd.concat([pending, chunk])
+        last = chunk["id"].iloc[-1], chunk["Review"].iloc[-1]
+        is_last = (chunk["id"] == last[0]) & (chunk["Review"] == last[1])
+        pending = chunk[is_last]
+        prepared_data_df = prepare_data(chunk[~is_last])
+        keys = set(
+            map(hash, zip(prepared_data_df["id"], prepared_data_df["Review"])))
+        if not previous_keys.isdisjoint(keys):
+            raise ValueError(
+                "Rows of a review are not contiguous, use `prepare_data` on the whole file."
+            )
+        previous_keys = keys
+        yield prepared_data_df
+    if pending is not None and len(pending):
+        yield prepare_data(pending)
+
+
 def main():
     """Parses command-line arguments, processes raw data, and saves the prepared output."""
 
@@ -59,6 +100,12 @@ def main():
                         type=str,
                         required=True,
                         help="path to save prepared data")
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=None,
+        help=
+        "rows read at a time, streams the file instead of loading it at once")
 
     args = parser.parse_args()
 
@@ -67,13 +114,26 @@ def main():
         raise FileNotFoundError(
             f"Unable to load data, file not found at {args.file_path}")
 
-    data = pd.read_csv(args.file_path, skiprows=1, names=features_to_use)
-
     logger.info("Preparing data..")
-    prepared_data = prepare_data(data)
+    if args.chunk_size is None:
+        data = pd.read_csv(args.file_path, skiprows=1, names=features_to_use)
+        prepared_data = prepare_data(data)
+        prepared_data.to_csv(args.save_path)
+    else:
+        chunks = pd.read_csv(args.file_path,
+                             skiprows=1,
+                             names=features_to_use,
+                             chunksize=args.chunk_size)
+        num_reviews = 0
+        for prepared_data in prepare_data_chunked(chunks):
+            # Continues the index of the previous chunks, same file as without chunks
+            prepared_data.index += num_reviews
+            prepared_data.to_csv(args.save_path,
+                                 mode="w" if num_reviews == 0 else "a",
+                                 header=num_reviews == 0)
+            num_reviews += len(prepared_data)
     logger.info("Data preparation comleted succefully.")
 
-    prepared_data.to_csv(args.save_path)
     logger.info(f"Prepared data saved to {args.save_path}")
 
 
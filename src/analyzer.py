@@ -1,20 +1,33 @@
 """This file contains a class for analyzing reviews."""
 
+import argparse
+import collections
+from concurrent import futures
+import functools
+import itertools
 import json
 import os
+import threading
 import time
-from typing import Dict, List, Set, Tuple
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
-from langchain import output_parsers
-import langchain_google_genai
 import pandas as pd
 import tqdm
 
 from src import prompts
 from utils import analyzer_utils
+from utils import batch_logs
+from utils import batching
 from utils import constants
 from utils import data_models
+from utils import entity_memory
+from utils import llm_backends
+from utils import rate_limiter
+from utils import report_journal
+from utils import response_cache
+from utils import review_manifest
+from utils import run_metrics
 
 #Initialize logger
 logger = analyzer_utils.Logger("Review Analyzer").get_logger()
@@ -23,35 +36,91 @@ logger = analyzer_utils.Logger("Review Analyzer").get_logger()
 load_dotenv()
 
 
+def iter_review_pairs(
+    data: Union[pd.DataFrame, Iterable[Tuple[int, str]]]
+) -> Iterator[Tuple[int, str]]:
+    """Returns an iterator of (review id, review) pairs over a DataFrame or a review stream."""
+    if isinstance(data, pd.DataFrame):
+        return data["Review"].items()
+    return iter(data)
+
+
 class ReviewAnalyzer:
     """Class to analyze user reviews using LLM."""
 
-    def __init__(self, report_path: str = "analysis_report.json"):
+    def __init__(self,
+                 report_path: str = "analysis_report.json",
+                 limiter: Optional[rate_limiter.RateLimiter] = None,
+                 cache: Optional[response_cache.ResponseCache] = None,
+                 debug_dir: str = constants.debug_dir,
+                 llm: Optional[llm_backends.LLMBackend] = None):
         """ReviewAnalyzer parameters initialization.
 
         Args:
             report_path (str) : path to save/load the aggregated results(json report).
+            limiter (RateLimiter, optional) : rate limiter for LLM calls. Created from the
+                quotas in `constants` if not provided.
+            cache (ResponseCache, optional) : on-disk cache of LLM responses. Responses are
+                not cached if not provided.
+            debug_dir (str) : directory of the batch logs (LLM inputs and outputs), kept
+                according to `constants.batch_log_retention`.
+            llm (LLMBackend, optional) : LLM the prompts are sent to. Created from
+                `constants.llm_backend` if not provided.
         """
 
-        # Initialize Gemini model
-        llm = langchain_google_genai.ChatGoogleGenerativeAI(
-            model=constants.model)
-        parser = output_parsers.PydanticOutputParser(
-            pydantic_object=data_models.AggregatedResults)
-        self.structured_llm = llm | parser
+        # Initialize the LLM backend (Gemini by default)
+        self.llm = llm or llm_backends.get_llm_backend(
+            constants.llm_backend,
+            **constants.llm_backend_options.get(constants.llm_backend, {}))
         self.result_path = report_path
-
-        # Load previously aggregated results
-        if os.path.exists(self.result_path):
-            previous_state = analyzer_utils.read_json(self.result_path)
-            self.aggregated_results = data_models.AggregatedResults.model_validate(
-                previous_state)
-        else:
-            logger.info(
-                f"Could not find previous state for aggregated results at provided path : {self.result_path}, creating new report."
-            )
-            self.aggregated_results = data_models.AggregatedResults(
-                entity_sentiment_map={})
+        self.debug_dir = debug_dir
+        self.rate_limiter = limiter or rate_limiter.RateLimiter(
+            requests_per_minute=constants.requests_per_minute,
+            tokens_per_minute=constants.tokens_per_minute)
+        self.max_retries = constants.max_retries
+        self.estimate_tokens = batching.get_token_estimator(
+            constants.token_estimator)
+        self.memory_selector = entity_memory.get_memory_selector(
+            constants.entity_memory_strategy,
+            estimate_tokens=self.estimate_tokens,
+            token_budget=constants.memory_token_budget,
+            max_entities=constants.memory_max_entities)
+        self.response_cache = cache
+        # LLM usage of the run (calls, estimated tokens) and durations of the pipeline stages
+        # (seconds per batch), updated by the worker threads
+        self.usage: collections.Counter = collections.Counter()
+        self.stage_latencies: Dict[str,
+                                   List[float]] = collections.defaultdict(list)
+        self.usage_lock = threading.Lock()
+        # Metrics of the batches in flight, written to the metrics file when they are committed
+        self.batch_metrics: Dict[int, Dict[str, float]] = {}
+        self.run_id = run_metrics.make_run_id()
+        self.metrics_writer = run_metrics.MetricsWriter(
+            metrics_path=run_metrics.get_metrics_path(self.result_path),
+            textfile_dir=constants.metrics_textfile_dir,
+            run_label=os.path.dirname(self.result_path))
+        self.output_schema = json.dumps(
+            data_models.AggregatedResults.model_json_schema(), sort_keys=True)
+
+        # Render the static part of the prompt once per run
+        t1 = time.perf_counter()
+        static_prompt = prompts.get_static_prompt()
+        t2 = time.perf_counter()
+        logger.info(
+            f"time taken to render the system prompt and few-shot examples: {(t2-t1)*1000:.2f} ms"
+        )
+        # Batch logs are written in the background, the static prompt only once
+        self.batch_logs = batch_logs.BatchLogWriter(
+            log_dir=self.debug_dir,
+            static_prompt=static_prompt,
+            retention=constants.batch_log_retention,
+            sample_rate=constants.batch_log_sample_rate)
+
+        # Load previously aggregated results (last snapshot and journal)
+        self.journal = report_journal.ReportJournal(
+            report_path=self.result_path,
+            snapshot_interval=constants.snapshot_interval)
+        self.aggregated_results = self.journal.load()
 
     def format_reviews(self, reviews: List[Tuple[int, str]]) -> str:
         """Formats the batch reviews in a single string.
@@ -68,154 +137,594 @@ class ReviewAnalyzer:
             [f"review-{id} : {review}" for id, review in reviews])
         return formatted_reviews
 
-    def process_reviews_in_batches(
-            self,
-            data: pd.DataFrame,
-            batch_size: int = 50) -> data_models.AggregatedResults:
-        """Processes user reviews in batches, extracting entities and sentiment from each batch.
+    def build_prompt(self,
+                     batch_reviews: List[Tuple[int, str]],
+                     batch_num: Optional[int] = None) -> str:
+        """Builds the chat prompt for a batch using the current entity memory.
 
         Args:
-            data (pd.DataFrame): Dataframe containing all processed reviews
-            batch_size (int, optional): The number of reviews to process in a single batch. Default is 50.
+            batch_reviews (List[Tuple[int, str]]) : List of reviews (current batch)
+            batch_num (int, optional) : 1-based number of the batch, its metrics are not recorded if None.
 
         Returns:
-            aggregated_results (AggregatedResults): A Pydantic object where each key is an entity, and the value is
-            a dictionary containing sets of review IDS corresponnding to each sentiment.
+            formatted_prompt (str) : Prompt containing system prompt, few-shot examples and the batch reviews.
+        """
+        t1 = time.perf_counter()
+        # Format batch reviews in a string
+        formatted_reviews = self.format_reviews(reviews=batch_reviews)
+
+        # Select the entity memory injected into the prompt
+        existing_entities = self.aggregated_results.existing_entities
+        selected_entities = self.memory_selector.select(self.aggregated_results,
+                                                        batch_reviews)
+
+        # splice the user prompt into the pre-rendered system prompt and few-shot examples
+        formatted_prompt = prompts.format_chat_prompt(
+            user_prompt=prompts.get_user_prompt(
+                existing_entities=selected_entities,
+                formatted_reviews=formatted_reviews))
+        t2 = time.perf_counter()
+        self.record_latency("build_prompt", t2 - t1, batch_num)
+        self.record_batch_metrics(batch_num,
+                                  num_reviews=len(batch_reviews),
+                                  memory_entities=len(selected_entities))
+        logger.info(f"time taken to build the prompt: {(t2-t1)*1000:.2f} ms")
+        if len(selected_entities) < len(existing_entities):
+            tokens_saved = self.estimate_tokens(
+                str(existing_entities)) - self.estimate_tokens(
+                    str(selected_entities))
+            logger.info(
+                f"[MEMORY] injected {len(selected_entities)}/{len(existing_entities)} entities, ~{tokens_saved} tokens saved"
+            )
+        return formatted_prompt
 
-        Functionality:
-            - skips processed batches using previous state.
-            - Splits the list of reviews into smaller batches of size `batch_size`.
-            - Generates structured prompts for the model using predefined templates.
-            - Calls the LLM model to extract entities and sentiments for each batch.
-            - Aggregates extracted entities.
-            - Save the checkpoint details and results after processing each batch.
+    def analyze_batch(self, batch_num: int,
+                      formatted_prompt: str) -> data_models.AggregatedResults:
+        """Invokes the LLM on a formatted batch prompt and validates the response.
+
+        Failed calls (LLM errors, malformed or invalid responses) are retried with
+        jittered exponential backoff, up to `self.max_retries` times.
+        This method is executed by the worker threads and must not touch the aggregated results.
+
+        Args:
+            batch_num (int) : 1-based number of the batch, used for logging.
+            formatted_prompt (str) : Prompt built by `build_prompt`.
+
+        Returns:
+            validated_response (AggregatedResults) : Entities extracted from the batch.
+
+        Raises:
+            Exception: the last error, if the batch still fails after all retries.
         """
-        os.makedirs(constants.result_subdir, exist_ok=True)
-        os.makedirs(constants.debug_dir, exist_ok=True)
-        if self.aggregated_results.batch_size is None:
-            self.aggregated_results.batch_size = batch_size
-        else:
-            assert self.aggregated_results.batch_size == batch_size, f"batch size Mismatch, Checkpoint: {self.aggregated_results.batch_size}, Current: {batch_size}"
-
-        reviews = list(data["Review"].items())
+
+        def log_retry(attempt: int, delay: float, error: Exception) -> None:
+            logger.warning(
+                f"Batch {batch_num} failed (attempt {attempt}/{self.max_retries + 1}): {error}. Retrying in {delay:.1f} s"
+            )
+
+        try:
+            validated_response, retries = rate_limiter.retry_with_backoff(
+                lambda: self.invoke_llm(batch_num, formatted_prompt),
+                max_retries=self.max_retries,
+                on_retry=log_retry)
+        except Exception:
+            self.record_batch_metrics(batch_num, retries=self.max_retries)
+            raise
+        self.record_batch_metrics(batch_num, retries=retries)
+        return validated_response
+
+    def invoke_llm(self, batch_num: int,
+                   formatted_prompt: str) -> data_models.AggregatedResults:
+        """Makes a single rate-limited LLM call for a batch and validates the response.
+
+        Args:
+            batch_num (int) : 1-based number of the batch, used for logging.
+            formatted_prompt (str) : Prompt built by `build_prompt`.
+
+        Returns:
+            validated_response (AggregatedResults) : Entities extracted from the batch.
+        """
+        input_tokens = self.estimate_tokens(formatted_prompt)
+        self.record_batch_metrics(batch_num, prompt_tokens=input_tokens)
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = response_cache.ResponseCache.make_key(
+                model=self.llm.model_name,
+                prompt=formatted_prompt,
+                schema=self.output_schema)
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
+                logger.info(f"Using cached LLM response for batch {batch_num}")
+                self.record_usage(cached_responses=1)
+                self.record_batch_metrics(batch_num, cached=True)
+                return data_models.AggregatedResults.model_validate_json(
+                    cached_response)
+
+        # Wait for request and token quota
+        self.record_latency("rate_limit_wait",
+                            self.rate_limiter.acquire(input_tokens), batch_num)
+
+        logger.info(f"Invoking LLM for batch {batch_num} ..")
+        t1 = time.perf_counter()
+        # LLM call
+        try:
+            raw_response = self.rate_limiter.invoke(
+                lambda: self.llm.invoke(formatted_prompt))
+        except Exception as e:
+            self.record_usage(llm_errors=1)
+            self.batch_logs.write(batch_num,
+                                  formatted_prompt,
+                                  error=f"{type(e).__name__}: {e}")
+            raise
+        t2 = time.perf_counter()
+        self.record_latency("invoke", t2 - t1, batch_num)
         logger.info(
-            f"Processing {len(reviews)} reviews in batches of {batch_size}...")
-        print("=" * 100)
+            f"time taken to process batch {batch_num}: {(t2-t1)*1000} ms")
+        try:
+            validated_response = prompts.parse_response(raw_response)
+        except Exception as e:
+            logger.error(f"Validation Error: {e}")
+            self.batch_logs.write(batch_num,
+                                  formatted_prompt,
+                                  llm_output=raw_response,
+                                  latency=t2 - t1,
+                                  error=f"{type(e).__name__}: {e}")
+            raise
+        self.record_latency("parse", time.perf_counter() - t2, batch_num)
+
+        llm_output = validated_response.model_dump_json()
+        output_tokens = self.estimate_tokens(llm_output)
+        self.record_usage(llm_calls=1,
+                          input_tokens=input_tokens,
+                          output_tokens=output_tokens)
+        self.record_batch_metrics(batch_num,
+                                  cached=False,
+                                  output_tokens=output_tokens)
+        self.batch_logs.write(batch_num,
+                              formatted_prompt,
+                              llm_output=llm_output,
+                              latency=t2 - t1)
+        if self.response_cache is not None and cache_key is not None:
+            self.response_cache.put(cache_key, llm_output)
+        return validated_response
+
+    def record_usage(self, **counts: int) -> None:
+        """Adds to the LLM usage counters of the run (thread-safe)."""
+        with self.usage_lock:
+            self.usage.update(counts)
+
+    def record_latency(self,
+                       stage: str,
+                       seconds: float,
+                       batch_num: Optional[int] = None) -> None:
+        """Records the duration of a pipeline stage for a batch (thread-safe).
+
+        Durations are also added to the metrics of the batch (`<stage>_seconds`), if given.
+        """
+        with self.usage_lock:
+            self.stage_latencies[stage].append(seconds)
+            if batch_num is not None:
+                metrics = self.batch_metrics.setdefault(batch_num, {})
+                metrics[f"{stage}_seconds"] = metrics.get(
+                    f"{stage}_seconds", 0.0) + seconds
+
+    def record_batch_metrics(self, batch_num: Optional[int],
+                             **values: float) -> None:
+        """Sets metrics of a batch, see `run_metrics.BatchMetrics` (thread-safe)."""
+        if batch_num is None:
+            return
+        with self.usage_lock:
+            self.batch_metrics.setdefault(batch_num, {}).update(values)
+
+    def write_batch_metrics(self, entry: data_models.JournalEntry) -> None:
+        """Writes the metrics of a committed batch to the metrics file of the run."""
+        with self.usage_lock:
+            values = self.batch_metrics.pop(entry.batch_num, {})
+        values["existing_entities"] = len(
+            self.aggregated_results.existing_entities)
+        self.metrics_writer.write(
+            run_metrics.BatchMetrics.model_validate(
+                values | {
+                    "run_id": self.run_id,
+                    "batch_num": entry.batch_num,
+                    "timestamp": time.time(),
+                    "status": "ok" if entry.failed_batch is None else "failed",
+                }))
+
+    def commit_batch(self, entry: data_models.JournalEntry) -> None:
+        """Applies the outcome of a batch to the aggregated results and records it in the journal.
 
-        # extract reviews and process batch
-        for batch_start_idx in tqdm.tqdm(range(0, len(reviews), batch_size)):
-            print("- -" * 60)
+        Args:
+            entry (JournalEntry) : change of the report caused by the batch.
 
-            # Skip already completed batches
-            if self.aggregated_results.last_batch_idx:
-                if batch_start_idx <= self.aggregated_results.last_batch_idx:
-                    logger.info(
-                        f"Skipping batch {batch_start_idx//batch_size}[reviews {batch_start_idx} - {batch_start_idx+batch_size}], already processed."
-                    )
-                    continue
+        Returns:
+            None
+        """
+        existing_entities = self.aggregated_results.existing_entities
+        if entry.response is not None:
+            logger.info(
+                f"ENTITIES EXTRACTED IN CURRENT BATCH : {list(entry.response.keys())}\n"
+            )
+            # Update memory and aggregate results
+            logger.info("Updating Memory and Aggregating Results")
+
+        t1 = time.perf_counter()
+        entry.apply(self.aggregated_results)
+        t2 = time.perf_counter()
+        self.journal.append(entry)
+        self.record_latency("merge", t2 - t1, entry.batch_num)
+        self.record_latency("journal",
+                            time.perf_counter() - t2, entry.batch_num)
+
+        if entry.response is not None:
+            if len(existing_entities) != len(
+                    self.aggregated_results.existing_entities):
+                new_entities = [
+                    entity_name
+                    for entity_name in self.aggregated_results.existing_entities
+                    if entity_name not in existing_entities
+                ]
+                logger.info(f"added new entities to memory : {new_entities}")
+            else:
+                logger.info(
+                    "Did not encounter any new entity, skipped memory update.")
 
-            # Load batch and format input
+            logger.info("Results aggregated successfully.\n")
             logger.info(
-                f"Loading batch {batch_start_idx // batch_size + 1}, Reviews {batch_start_idx}-{batch_start_idx+batch_size}\n"
+                f"[MEMORY | EXISTING ENTITIES]:\n{self.aggregated_results.existing_entities}\n"
             )
 
-            # Slice reviews for current batch
-            batch_reviews = reviews[batch_start_idx:batch_start_idx +
-                                    batch_size]
+        # Compact the journal into a new snapshot periodically
+        if self.journal.needs_snapshot:
+            self.save_checkpoint(entry.batch_num)
+        self.write_batch_metrics(entry)
 
-            # Format batch reviews in a string
-            formatted_reviews = self.format_reviews(reviews=batch_reviews)
+    def save_checkpoint(self, batch_num: Optional[int] = None) -> None:
+        """Atomically saves the aggregated results (including checkpoint details) to the report path and truncates the journal.
 
-            existing_entities = self.aggregated_results.existing_entities
-            # format the ChatPromptTemplate with system, user prompt
-            formatted_prompt = prompts.chat_prompt_template.format(
-                system_prompt=prompts.get_system_propmt(),
-                user_prompt=prompts.get_user_prompt(
-                    existing_entities=existing_entities,
-                    formatted_reviews=formatted_reviews))
+        Args:
+            batch_num (int, optional) : batch whose commit triggered the checkpoint, for its metrics.
+        """
+        t1 = time.perf_counter()
+        self.journal.snapshot(self.aggregated_results)
+        self.record_latency("checkpoint", time.perf_counter() - t1, batch_num)
+
+    def dispatch_batches(
+        self, batches: Iterator[batching.Batch], max_concurrent_batches: int
+    ) -> Iterator[Tuple[batching.Batch, futures.Future]]:
+        """Sends batches to the LLM concurrently and yields them back in order.
 
-            if batch_start_idx == 0:
-                print("=" * 100)
-                print(formatted_prompt)
-                print("=" * 100)
+        Prompts are built when a batch is dispatched, so batches in flight share the
+        entity memory merged so far. Batches may finish out of order, but are yielded
+        strictly in dispatch order so that the caller merges them deterministically.
 
+        Args:
+            batches (Iterator[batching.Batch]) : batches to be processed.
+            max_concurrent_batches (int) : The number of batches kept in flight at once.
+
+        Yields:
+            (Batch, Future) : the batch and the future holding its validated response.
+        """
+        in_flight: Deque[Tuple[batching.Batch,
+                               futures.Future]] = collections.deque()
+        with futures.ThreadPoolExecutor(
+                max_workers=max_concurrent_batches) as executor:
             try:
-                logger.info("Invoking LLM ..")
-                t1 = time.perf_counter()
-                # LLM call
-                response = self.structured_llm.invoke(formatted_prompt)
-                t2 = time.perf_counter()
-                logger.info(
-                    f"time taken to process the batch: {(t2-t1)*1000} ms")
-                try:
-                    validated_response = data_models.AggregatedResults.model_validate(
-                        response)
-                except Exception as e:
-                    logger.error(f"Validation Error: {e}")
-
-                batch_num = (batch_start_idx // batch_size) + 1
-                analyzer_utils.dump_batch_log(
-                    batch_log_path=os.path.join(constants.debug_dir,
-                                                f"batch_{batch_num}.json"),
-                    llm_input=formatted_prompt,
-                    llm_output=response.model_dump_json())
-                logger.info(
-                    f"ENTITIES EXTRACTED IN CURRENT BATCH : {list(validated_response.keys())}\n"
-                )
+                while True:
+                    # Keep `max_concurrent_batches` batches in flight
+                    while len(in_flight) < max_concurrent_batches:
+                        batch = next(batches, None)
+                        if batch is None:
+                            break
+                        print("- -" * 60)
+                        logger.info(
+                            f"Loading batch {batch.batch_num}, Reviews {batch.reviews[0][0]}-{batch.reviews[-1][0]}\n"
+                        )
+                        formatted_prompt = self.build_prompt(
+                            batch.reviews, batch.batch_num)
+
+                        if batch.start_idx == 0:
+                            print("=" * 100)
+                            print(formatted_prompt)
+                            print("=" * 100)
+
+                        in_flight.append(
+                            (batch,
+                             executor.submit(self.analyze_batch,
+                                             batch.batch_num,
+                                             formatted_prompt)))
+
+                    if not in_flight:
+                        return
+                    # Hand over the oldest batch first, later batches wait in their futures
+                    yield in_flight.popleft()
+            finally:
+                for _, pending_future in in_flight:
+                    pending_future.cancel()
 
-                # Update memory and aggregate results
-                logger.info("Updating Memory and Aggregating Results")
-                self.aggregated_results.update(validated_response,
-                                               batch_start_idx)
-
-                if len(existing_entities) != len(
-                        self.aggregated_results.existing_entities):
-                    new_entities = [
-                        entity_name for entity_name in
-                        self.aggregated_results.existing_entities
-                        if entity_name not in existing_entities
-                    ]
-                    logger.info(
-                        f"added new entities to memory : {new_entities}")
-                else:
-                    logger.info(
-                        "Did not encounter any new entity, skipped memory update."
-                    )
-
-                logger.info("Results aggregated successfully.\n")
-                logger.info(
-                    f"[MEMORY | EXISTING ENTITIES]:\n{self.aggregated_results.existing_entities}\n"
-                )
+    def process_reviews_in_batches(
+        self,
+        data: Union[pd.DataFrame, Iterable[Tuple[int, str]]],
+        batch_size: int = 50,
+        max_concurrent_batches: int = 1,
+        review_token_budget: int = 4000,
+        max_output_tokens: int = 8192,
+    ) -> data_models.AggregatedResults:
+        """Processes user reviews in batches, extracting entities and sentiment from each batch.
+
+        Args:
+            data (pd.DataFrame | Iterable[Tuple[int, str]]): Dataframe containing all processed reviews, or a
+                stream of (review id, review) pairs (see `analyzer_utils.iter_reviews`).
+            batch_size (int, optional): The maximum number of reviews to process in a single batch. Default is 50.
+            max_concurrent_batches (int, optional): The number of batches kept in flight at once. Default is 1 (sequential).
+            review_token_budget (int, optional): Target number of (estimated) review tokens in a batch. Default is 4000.
+            max_output_tokens (int, optional): Ceiling on the (estimated) output tokens of a batch. Default is 8192.
+
+        Returns:
+            aggregated_results (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+            a dictionary containing sets of review IDS corresponnding to each sentiment.
+
+        Functionality:
+            - skips processed reviews using previous state.
+            - Consumes the reviews lazily, only the batches in flight are held in memory.
+            - Packs the reviews into batches by their estimated number of tokens, with at most `batch_size` reviews.
+            - Generates structured prompts for the model using predefined templates.
+            - Calls the LLM model for up to `max_concurrent_batches` batches concurrently,
+              throttled by the adaptive rate limiter and retried on failure.
+            - Aggregates extracted entities in batch order, so entity memory stays deterministic.
+            - Moves batches that still fail after all retries to the dead-letter list
+              (`failed_batches`) of the report and continues with the next batch.
+            - Records each batch in the append-only journal and periodically compacts it into
+              an atomically written snapshot of the results (the report).
+
+        Note:
+            Batches are merged and checkpointed strictly in order, `next_review_idx` always marks
+            the end of a contiguous prefix of processed reviews, so a run can be resumed with
+            different batching parameters. Reviews with a lower ID are skipped, the reviews may
+            also start after `next_review_idx` (see `review_manifest.prepare_incremental_run`). The run stops after `constants.max_consecutive_failures`
+            consecutive failed batches (e.g. exhausted daily quota) and can be resumed later.
+        """
+        os.makedirs(os.path.dirname(self.result_path) or ".", exist_ok=True)
+        next_review_idx, last_batch_num = self.aggregated_results.resume_position(
+        )
+        self.aggregated_results.batch_size = batch_size
+
+        num_pending_reviews = None
+        if isinstance(data, pd.DataFrame):
+            num_pending_reviews = max(len(data) - next_review_idx, 0)
+        if next_review_idx:
+            logger.info(
+                f"Skipping reviews 0-{next_review_idx - 1} ({last_batch_num} batches), already processed."
+            )
+        pending_reviews = itertools.dropwhile(
+            lambda pair: pair[0] < next_review_idx, iter_review_pairs(data))
+        logger.info(
+            f"Processing {num_pending_reviews or 'all remaining'} reviews in batches of up to {batch_size} reviews (~{review_token_budget} tokens), {max_concurrent_batches} batch(es) in flight..."
+        )
+        print("=" * 100)
+
+        batches = batching.pack_batches(
+            pending_reviews,
+            estimate_tokens=self.estimate_tokens,
+            review_token_budget=review_token_budget,
+            max_output_tokens=max_output_tokens,
+            output_tokens_per_review=constants.output_tokens_per_review,
+            max_reviews=batch_size,
+            start_idx=next_review_idx,
+            start_batch_num=last_batch_num + 1)
+
+        completed = True
+        consecutive_failures = 0
+        progress_bar = tqdm.tqdm(total=num_pending_reviews, unit="review")
+        for batch, future in self.dispatch_batches(batches,
+                                                   max_concurrent_batches):
+            entry = data_models.JournalEntry(batch_num=batch.batch_num,
+                                             batch_idx=batch.start_idx,
+                                             next_review_idx=batch.end_idx)
+            try:
+                entry.response = future.result()
             except Exception as e:
+                logger.error(f"Error processing batch {batch.batch_num}: {e}")
+                entry.failed_batch = self.make_failed_batch(batch, e)
+                consecutive_failures += 1
+            else:
+                consecutive_failures = 0
+
+            # Record the batch in the journal after every batch
+            self.commit_batch(entry)
+            progress_bar.update(len(batch.reviews))
+
+            if consecutive_failures >= constants.max_consecutive_failures:
                 logger.error(
-                    f"Error processing batch {batch_start_idx // batch_size + 1}: {e}"
+                    f"{consecutive_failures} consecutive batches failed, stopping the run."
                 )
                 logger.info(
-                    f"{self.aggregated_results.last_batch_idx//batch_size +1 } batches,i.e,, {self.aggregated_results.last_batch_idx+batch_size} reviews proceced, saving details to {self.result_path}"
+                    f"{batch.batch_num} batches,i.e,, {batch.end_idx} reviews proceced, saving details to {self.result_path}"
                 )
+                completed = False
                 break
+        progress_bar.close()
+        self.save_checkpoint()
+        self.batch_logs.flush()
 
-            # Save aggregated results after every batch
-            with open(self.result_path, "w") as f:
-                f.write(self.aggregated_results.model_dump_json(indent=4))
-
-            time.sleep(2)  # To Prevent rate limit issues
-        else:
+        if completed:
             logger.info(
                 f"All batches proceced, results saved to {self.result_path}")
+        self.log_failed_batches()
         return self.aggregated_results
 
+    def make_failed_batch(self, batch: batching.Batch,
+                          error: Exception) -> data_models.FailedBatch:
+        """Creates the dead-letter entry of a batch.
+
+        Args:
+            batch (Batch) : batch that failed after all retries.
+            error (Exception) : last error raised while processing the batch.
+
+        Returns:
+            failed_batch (FailedBatch) : entry for the dead-letter list of the report.
+        """
+        return data_models.FailedBatch(
+            batch_num=batch.batch_num,
+            review_ids=[review_id for review_id, _ in batch.reviews],
+            error=f"{type(error).__name__}: {error}",
+            attempts=self.max_retries + 1)
+
+    def log_failed_batches(self) -> None:
+        """Logs a summary of the dead-lettered batches."""
+        failed_batches = self.aggregated_results.failed_batches
+        if failed_batches:
+            logger.warning(
+                f"{len(failed_batches)} batch(es) failed after all retries: {[failed_batch.batch_num for failed_batch in failed_batches]}. "
+                "Re-run them with `python -m src.analyzer --retry_failed`.")
+
+    def retry_failed_batches(
+            self,
+            data: Union[pd.DataFrame, Iterable[Tuple[int, str]]],
+            max_concurrent_batches: int = 1) -> data_models.AggregatedResults:
+        """Re-runs only the dead-lettered batches of the report.
+
+        Successfully processed batches are merged into the report and removed from the
+        dead-letter list, batches that fail again stay in it with updated error details.
+        Reviews that are no longer in the data (e.g. the csv changed) are skipped, batches
+        without any review left are not re-run.
 
-def main(csv_file):
+        Args:
+            data (pd.DataFrame | Iterable[Tuple[int, str]]): Dataframe containing all processed reviews, or a
+                stream of (review id, review) pairs. A stream is read once to collect the failed reviews.
+            max_concurrent_batches (int, optional): The number of batches kept in flight at once. Default is 1 (sequential).
 
-    data = analyzer_utils.load_csv(
-        file_path=csv_file,
+        Returns:
+            aggregated_results (AggregatedResults): The updated report.
+        """
+        failed_batches = list(self.aggregated_results.failed_batches)
+        logger.info(f"Re-running {len(failed_batches)} failed batch(es)...")
+        failed_review_ids = {
+            review_id for failed_batch in failed_batches
+            for review_id in failed_batch.review_ids
+        }
+        reviews = {
+            review_id: review
+            for review_id, review in iter_review_pairs(data)
+            if review_id in failed_review_ids
+        }
+        missing_review_ids = sorted(failed_review_ids - reviews.keys())
+        if missing_review_ids:
+            logger.warning(
+                f"{len(missing_review_ids)} review(s) of the failed batches are no longer in the data and are skipped: {missing_review_ids}"
+            )
+        # Batches none of whose reviews are left stay in the dead-letter list
+        retried_batches = []
+        for failed_batch in failed_batches:
+            batch_reviews = [(review_id, reviews[review_id])
+                             for review_id in failed_batch.review_ids
+                             if review_id in reviews]
+            if not batch_reviews:
+                logger.warning(
+                    f"Skipping failed batch {failed_batch.batch_num}, none of its reviews are left."
+                )
+                continue
+            retried_batches.append(
+                (failed_batch,
+                 batching.Batch(batch_num=failed_batch.batch_num,
+                                start_idx=None,
+                                reviews=batch_reviews)))
+        failed_batches = [failed_batch for failed_batch, _ in retried_batches]
+        batches = (batch for _, batch in retried_batches)
+
+        for failed_batch, (batch, future) in zip(
+                failed_batches,
+                tqdm.tqdm(self.dispatch_batches(batches,
+                                                max_concurrent_batches),
+                          total=len(failed_batches))):
+            entry = data_models.JournalEntry(batch_num=batch.batch_num)
+            try:
+                entry.response = future.result()
+            except Exception as e:
+                logger.error(f"Error processing batch {batch.batch_num}: {e}")
+                entry.failed_batch = failed_batch.model_copy(
+                    update={
+                        "error": f"{type(e).__name__}: {e}",
+                        "attempts": failed_batch.attempts + self.max_retries + 1
+                    })
+            else:
+                entry.resolved = True
+            self.commit_batch(entry)
+
+        self.save_checkpoint()
+        self.batch_logs.flush()
+        self.log_failed_batches()
+        return self.aggregated_results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extract entity-level sentiment from user reviews.")
+    parser.add_argument(
+        "--retry_failed",
+        action="store_true",
+        help="Re-run only the batches in the dead-letter list of the report.")
+    parser.add_argument("--no_cache",
+                        action="store_true",
+                        help="Bypass the on-disk LLM response cache.")
+    parser.add_argument("--purge_cache",
+                        action="store_true",
+                        help="Remove all cached LLM responses before running.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=
+        "Identify reviews by content hash and only analyze the reviews missing from the report."
+    )
+    args = parser.parse_args()
+
+    # The cache (sqlite file) is only opened when responses are cached
+    cache: Optional[response_cache.ResponseCache] = None
+    if not args.no_cache:
+        cache = response_cache.ResponseCache(
+            db_path=constants.response_cache_path,
+            max_size_mb=constants.response_cache_max_size_mb)
+        if args.purge_cache:
+            cache.purge()
+    elif args.purge_cache:
+        logger.warning(
+            "--purge_cache is ignored with --no_cache, the response cache is not opened."
+        )
+
+    # Stream the reviews, the dataset is never fully loaded in memory
+    make_reviews = functools.partial(
+        analyzer_utils.iter_reviews,
+        file_path=constants.data_csv_path,
         columns=constants.features_to_use,
-        reviews_processed=constants.reviews_processed)
-    analyzer = ReviewAnalyzer(report_path=constants.aggregated_results_path)
-    analysis_report = analyzer.process_reviews_in_batches(
-        data, batch_size=constants.batch_size)
+        reviews_processed=constants.reviews_processed,
+        chunk_size=constants.csv_chunk_size)
+    data: Iterable[Tuple[int, str]] = make_reviews()
+    analyzer = ReviewAnalyzer(report_path=constants.aggregated_results_path,
+                              cache=cache)
+    if args.incremental and args.retry_failed:
+        data = review_manifest.iter_registered_reviews(
+            data,
+            review_manifest.ReviewManifest.load(
+                review_manifest.get_manifest_path(analyzer.result_path)))
+    elif args.incremental:
+        data = review_manifest.prepare_incremental_run(
+            make_reviews,
+            report_path=analyzer.result_path,
+            next_review_idx=analyzer.aggregated_results.resume_position()[0])
+    if args.retry_failed:
+        analysis_report = analyzer.retry_failed_batches(
+            data, max_concurrent_batches=constants.max_concurrent_batches)
+    else:
+        analysis_report = analyzer.process_reviews_in_batches(
+            data,
+            batch_size=constants.batch_size,
+            max_concurrent_batches=constants.max_concurrent_batches,
+            review_token_budget=constants.review_token_budget,
+            max_output_tokens=constants.max_output_tokens)
+    if cache is not None:
+        logger.info(
+            f"[RESPONSE CACHE] {cache.hits} hit(s), {cache.misses} miss(es)")
 
 
 if __name__ == "__main__":
-    main(constants.data_csv_path)
+    main()
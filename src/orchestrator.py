@@ -0,0 +1,238 @@
+"""This file contains an orchestrator running the review analysis of several datasets concurrently.
+
+All runs share a single rate limiter (the LLM quota is global to the API key) and a single
+response cache. Every run writes its report and batch logs to its own result subdirectory
+(`results/<dataset_name>/<experiment_name>/`), like a single `src.analyzer` run.
+"""
+
+import argparse
+from concurrent import futures
+import functools
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from src import analyzer
+from utils import analyzer_utils
+from utils import constants
+from utils import rate_limiter
+from utils import response_cache
+from utils import review_manifest
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+
+class RunConfig(NamedTuple):
+    """Dataset and experiment of a run, the remaining settings default to `constants`."""
+    dataset_name: str
+    experiment_name: str = constants.experiment_name
+    # `constants.data[dataset_name]` if None
+    data_csv_path: Optional[str] = None
+    batch_size: int = constants.batch_size
+    max_concurrent_batches: int = constants.max_concurrent_batches
+    reviews_processed: int = constants.reviews_processed
+    # only analyze the reviews missing from the report (see `review_manifest`)
+    incremental: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.dataset_name}/{self.experiment_name}"
+
+    @property
+    def result_subdir(self) -> str:
+        return os.path.join(constants.result_dir, self.dataset_name,
+                            self.experiment_name)
+
+
+def parse_run(spec: str) -> RunConfig:
+    """Parses a `<dataset_name>[:<experiment_name>]` command-line run."""
+    dataset_name, _, experiment_name = spec.partition(":")
+    return RunConfig(dataset_name=dataset_name,
+                     experiment_name=experiment_name or
+                     constants.experiment_name)
+
+
+def load_run_configs(file_path: str) -> List[RunConfig]:
+    """Loads run configs from a json file holding a list of `RunConfig` fields.
+
+    Args:
+        file_path (str): path to the json file, e.g.
+            `[{"dataset_name": "laptop", "experiment_name": "exp2", "batch_size": 20}]`.
+
+    Returns:
+        configs (List[RunConfig]): the run configs.
+    """
+    with open(file_path, "r") as f:
+        return [RunConfig(**config) for config in json.load(f)]
+
+
+def run_analysis(
+        config: RunConfig, limiter: rate_limiter.RateLimiter,
+        cache: Optional[response_cache.ResponseCache]) -> Dict[str, Any]:
+    """Runs (or resumes) the analysis of a dataset and summarizes it.
+
+    Args:
+        config (RunConfig): dataset and experiment of the run.
+        limiter (RateLimiter): rate limiter shared by all runs.
+        cache (ResponseCache, optional): response cache shared by all runs.
+
+    Returns:
+        summary (Dict[str, Any]): throughput, LLM usage, cost and failures of the run.
+    """
+    start = time.perf_counter()
+    data_csv_path = config.data_csv_path or constants.data[config.dataset_name]
+    report_path = os.path.join(
+        config.result_subdir,
+        os.path.basename(constants.aggregated_results_path))
+    review_analyzer = analyzer.ReviewAnalyzer(report_path=report_path,
+                                              limiter=limiter,
+                                              cache=cache,
+                                              debug_dir=os.path.join(
+                                                  config.result_subdir, "logs"))
+    start_review_idx, _ = review_analyzer.aggregated_results.resume_position()
+    make_reviews = functools.partial(analyzer_utils.iter_reviews,
+                                     file_path=data_csv_path,
+                                     columns=constants.features_to_use,
+                                     reviews_processed=config.reviews_processed,
+                                     chunk_size=constants.csv_chunk_size)
+    reviews: Iterable[Tuple[int, str]] = make_reviews()
+    if config.incremental:
+        reviews = review_manifest.prepare_incremental_run(
+            make_reviews,
+            report_path=report_path,
+            next_review_idx=start_review_idx)
+
+    review_analyzer.process_reviews_in_batches(
+        reviews,
+        batch_size=config.batch_size,
+        max_concurrent_batches=config.max_concurrent_batches,
+        review_token_budget=constants.review_token_budget,
+        max_output_tokens=constants.max_output_tokens)
+
+    elapsed = time.perf_counter() - start
+    # Batches committed by this run only, the report also holds the earlier runs
+    metrics_writer = review_analyzer.metrics_writer
+    num_reviews = metrics_writer.totals["reviews"]
+    usage = review_analyzer.usage
+    cost = (usage["input_tokens"] * constants.input_token_price +
+            usage["output_tokens"] * constants.output_token_price) / 1e6
+    return {
+        "reviews": num_reviews,
+        "seconds": elapsed,
+        "reviews/s": num_reviews / elapsed,
+        "llm_calls": usage["llm_calls"],
+        "cached": usage["cached_responses"],
+        "llm_errors": usage["llm_errors"],
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "cost_usd": cost,
+        "failed_batches": metrics_writer.batches["failed"],
+    }
+
+
+def run_all(configs: List[RunConfig],
+            max_parallel_runs: int = constants.max_parallel_runs,
+            use_cache: bool = True) -> pd.DataFrame:
+    """Runs several analyses concurrently under a shared rate budget and response cache.
+
+    A run that raises does not stop the others, its error is logged and its type reported in the
+    summary.
+
+    Args:
+        configs (List[RunConfig]): runs to be executed, with distinct result subdirectories.
+        max_parallel_runs (int): number of runs executed at once.
+        use_cache (bool): whether LLM responses are cached.
+
+    Returns:
+        summary (pd.DataFrame): one row per run, see `run_analysis`.
+    """
+    result_subdirs = [config.result_subdir for config in configs]
+    if len(set(result_subdirs)) < len(result_subdirs):
+        raise ValueError(
+            f"Runs must write to distinct result subdirectories: {result_subdirs}"
+        )
+
+    limiter = rate_limiter.RateLimiter(
+        requests_per_minute=constants.requests_per_minute,
+        tokens_per_minute=constants.tokens_per_minute)
+    cache = response_cache.ResponseCache(
+        db_path=constants.response_cache_path,
+        max_size_mb=constants.response_cache_max_size_mb) if use_cache else None
+
+    rows = []
+    with futures.ThreadPoolExecutor(max_workers=max_parallel_runs) as executor:
+        runs = {
+            executor.submit(run_analysis, config, limiter, cache): config
+            for config in configs
+        }
+        for future in futures.as_completed(runs):
+            config = runs[future]
+            try:
+                row = {"run": config.name, "status": "ok"} | future.result()
+            except Exception as e:
+                logger.error(f"Run {config.name} failed: {e}")
+                row = {"run": config.name, "status": type(e).__name__}
+            logger.info(f"Run {config.name} finished: {row['status']}")
+            rows.append(row)
+
+    if cache is not None:
+        logger.info(
+            f"[RESPONSE CACHE] {cache.hits} hit(s), {cache.misses} miss(es)")
+        cache.close()
+    order = {config.name: i for i, config in enumerate(configs)}
+    return pd.DataFrame(sorted(rows, key=lambda row: order[row["run"]]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=
+        "Analyze several datasets concurrently under a shared LLM rate budget.")
+    parser.add_argument(
+        "--runs",
+        nargs="+",
+        default=None,
+        help=
+        "runs as <dataset_name>[:<experiment_name>], all datasets of `constants.data` by default"
+    )
+    parser.add_argument(
+        "--config",
+        type=str,
+        default=None,
+        help="json file with a list of run configs (see `RunConfig`)")
+    parser.add_argument("--max_parallel_runs",
+                        type=int,
+                        default=constants.max_parallel_runs)
+    parser.add_argument("--no_cache",
+                        action="store_true",
+                        help="Bypass the on-disk LLM response cache.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only analyze the reviews missing from the report of every run.")
+    args = parser.parse_args()
+
+    if args.config is not None:
+        configs = load_run_configs(args.config)
+    else:
+        configs = [
+            parse_run(spec) for spec in args.runs or list(constants.data)
+        ]
+    if args.incremental:
+        configs = [config._replace(incremental=True) for config in configs]
+
+    summary = run_all(configs,
+                      max_parallel_runs=args.max_parallel_runs,
+                      use_cache=not args.no_cache)
+    print("=" * 100)
+    print(
+        summary.to_string(index=False,
+                          float_format=lambda value: f"{value:.2f}"))
+    print(f"total cost: {summary.get('cost_usd', pd.Series()).sum():.4f} USD")
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main()
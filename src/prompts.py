@@ -1,5 +1,6 @@
 """This file contains prompt templates."""
 
+import functools
 from typing import List, Tuple, Union
 
 from langchain import output_parsers
@@ -8,6 +9,25 @@ from langchain import prompts
 from src import few_shot_examples
 from utils import data_models
 
+# Placeholder for the user turn while rendering the static part of the chat prompt
+USER_PROMPT_PLACEHOLDER = "<<<USER_PROMPT_PLACEHOLDER>>>"
+
+output_parser = output_parsers.PydanticOutputParser(
+    pydantic_object=data_models.AggregatedResults)
+
+
+def parse_response(raw_response: str) -> data_models.AggregatedResults:
+    """Parses the raw text of an LLM response (json, possibly in a markdown code block) and validates it.
+
+    Args:
+        raw_response (str): text returned by the LLM.
+
+    Returns:
+        response (AggregatedResults): the validated response.
+    """
+    return data_models.AggregatedResults.model_validate(
+        output_parser.parse(raw_response))
+
 
 def format_assistant_examples(
     example_reviews: List[List[Tuple[str, Union[prompts.PromptTemplate, str]]]]
@@ -37,6 +57,18 @@ def format_assistant_examples(
     return assistant_examples
 
 
+user_prompt_template = prompts.PromptTemplate(
+    input_variables=["task_description", "formatted_reviews"],
+    template=
+    """The following entities have been identified from previous reviews. 
+        Please refer to and reuse these entities wherever applicable to avoid creating duplicates:
+        {existing_entities} 
+
+        You are tasked with extracting entities/themes/topics and their corresponding sentiment from the new set of reviews:
+        {formatted_reviews}
+        """)
+
+
 def get_user_prompt(existing_entities: List[str],
                     formatted_reviews: str) -> str:
     """Generates a structured user prompt using PromptTemplate.
@@ -48,17 +80,6 @@ def get_user_prompt(existing_entities: List[str],
     Returns:
       user_prompt (str): A formatted user prompt.
     """
-    user_prompt_template = prompts.PromptTemplate(
-        input_variables=["task_description", "formatted_reviews"],
-        template=
-        """The following entities have been identified from previous reviews. 
-        Please refer to and reuse these entities wherever applicable to avoid creating duplicates:
-        {existing_entities} 
-
-        You are tasked with extracting entities/themes/topics and their corresponding sentiment from the new set of reviews:
-        {formatted_reviews}
-        """)
-
     return user_prompt_template.format(existing_entities=existing_entities,
                                        formatted_reviews=formatted_reviews)
 
@@ -72,10 +93,8 @@ def get_system_propmt(existing_entities: List[str] = []) -> str:
     Returns:
         system_prompt (str): A formatted system prompt.
     """
-    parser = output_parsers.PydanticOutputParser(
-        pydantic_object=data_models.AggregatedResults)
     system_prompt = prompts.PromptTemplate(partial_variables={
-        "format_instructions": parser.get_format_instructions()
+        "format_instructions": output_parser.get_format_instructions()
     },
                                            template="""
             You are an AI assistant specializing in **extracting structured insights from Spotify user reviews**.
@@ -100,3 +119,33 @@ chat_prompt_template = prompts.ChatPromptTemplate.from_messages([
                               ),  # Example input/output from assistant
     ("user", "{user_prompt}")  # User's actual input
 ])
+
+
+@functools.lru_cache(maxsize=None)
+def get_static_prompt() -> Tuple[str, str]:
+    """Renders the static part of the chat prompt (system prompt and few-shot examples) once.
+
+    Returns:
+        prefix (str): rendered chat prompt before the user turn.
+        suffix (str): rendered chat prompt after the user turn.
+    """
+    rendered_prompt = chat_prompt_template.format(
+        system_prompt=get_system_propmt(), user_prompt=USER_PROMPT_PLACEHOLDER)
+    prefix, suffix = rendered_prompt.split(USER_PROMPT_PLACEHOLDER)
+    return prefix, suffix
+
+
+def format_chat_prompt(user_prompt: str) -> str:
+    """Splices a user prompt into the pre-rendered chat prompt.
+
+    Equivalent to formatting `chat_prompt_template` with the system prompt and `user_prompt`,
+    without re-rendering the system prompt and few-shot examples.
+
+    Args:
+        user_prompt (str): A formatted user prompt.
+
+    Returns:
+        formatted_prompt (str): The complete chat prompt.
+    """
+    prefix, suffix = get_static_prompt()
+    return prefix + user_prompt + suffix
@@ -0,0 +1,66 @@
+"""Tests of the aspect evaluation of reports."""
+
+import pandas as pd
+
+from utils import aspect_evaluation
+from utils import data_models
+
+
+def make_report(entity_sentiment_map):
+    return data_models.AggregatedResults.model_validate(
+        {"entity_sentiment_map": entity_sentiment_map})
+
+
+def make_gold():
+    return pd.DataFrame({
+        "review_id": [0, 1, 2],
+        "aspect": ["battery life", "screen", "price"],
+        "polarity": ["positive", "negative", "neutral"],
+    })
+
+
+def test_get_predicted_entities():
+    report = make_report({
+        "Battery": {
+            "positive_review_ids": [0],
+            "negative_review_ids": [3]
+        },
+        "Screen": {
+            "negative_review_ids": [1]
+        },
+    })
+    predicted = aspect_evaluation.get_predicted_entities(report)
+    assert sorted(predicted.itertuples(index=False, name=None)) == [
+        (0, "Battery", "positive"), (1, "Screen", "negative"),
+        (3, "Battery", "negative")
+    ]
+
+
+def test_evaluate_report():
+    report = make_report({
+        "Battery": {
+            "positive_review_ids": [0]
+        },
+        "Screen": {
+            "positive_review_ids": [1]
+        },
+    })
+    scores = aspect_evaluation.evaluate_report(report, make_gold())
+    assert scores.loc["positive", "precision"] == 0.5
+    assert scores.loc["positive", "recall"] == 1.0
+    assert scores.loc["negative", "recall"] == 0.0
+    assert scores.loc["any", "f1"] == 1.0
+
+
+def test_evaluate_empty_report():
+    scores = aspect_evaluation.evaluate_report(make_report({}), make_gold())
+    assert (scores["precision"] == 0).all() and (scores["recall"] == 0).all()
+    assert scores.loc["micro avg", "gold"] == 2
+
+
+def test_evaluate_report_without_overlapping_reviews():
+    # Negative mentions only on reviews without negative gold aspects
+    report = make_report({"Battery": {"negative_review_ids": [0, 5]}})
+    scores = aspect_evaluation.evaluate_report(report, make_gold())
+    assert scores.loc["negative", "predicted"] == 2
+    assert scores.loc["negative", "precision"] == 0.0
@@ -0,0 +1,52 @@
+"""Tests of the report data models."""
+
+import pydantic
+import pytest
+
+from utils import data_models
+
+
+def test_review_index_skips_unknown_sentiment_keys():
+    report = data_models.AggregatedResults.model_validate({
+        "entity_sentiment_map": {
+            "Battery Life": {
+                "positive_review_ids": [1],
+                "neutral_review_ids": [2]
+            }
+        }
+    })
+    index = report.review_index
+    assert index.get_mentions(1) == [("Battery Life", "positive")]
+    assert index.get_mentions(2) == []
+
+    # Responses merged into an indexed report
+    report.update(
+        data_models.AggregatedResults.model_validate({
+            "entity_sentiment_map": {
+                "Screen": {
+                    "neutral_review_ids": [3],
+                    "negative_review_ids": [3]
+                }
+            }
+        }))
+    assert index.get_mentions(3) == [("Screen", "negative")]
+    assert index.mentioned_review_ids().tolist() == [1, 3]
+
+
+@pytest.mark.parametrize("review_ids", [[5.5], ["7"], [1, 2.0], [-1]])
+def test_invalid_review_ids_are_rejected(review_ids):
+    with pytest.raises(pydantic.ValidationError):
+        data_models.AggregatedResults.model_validate({
+            "entity_sentiment_map": {
+                "Battery Life": {
+                    "positive_review_ids": review_ids
+                }
+            }
+        })
+
+
+def test_review_ids_are_validated_from_json():
+    report = data_models.AggregatedResults.model_validate_json(
+        '{"entity_sentiment_map": {"Screen": {"negative_review_ids": [3, 1, 3]}}}'
+    )
+    assert report["Screen"]["negative_review_ids"] == [1, 3]
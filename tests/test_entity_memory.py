@@ -0,0 +1,43 @@
+"""Tests of the entity memory selectors."""
+
+from utils import batching
+from utils import data_models
+from utils import entity_memory
+
+
+def make_report():
+    """Report of responses leaving out a sentiment key, as the response schema allows."""
+    return data_models.AggregatedResults.model_validate({
+        "entity_sentiment_map": {
+            "Battery Life": {
+                "positive_review_ids": [1, 2]
+            },
+            "Screen": {
+                "negative_review_ids": [3]
+            },
+            "Price": {
+                "positive_review_ids": [4],
+                "negative_review_ids": [5, 6]
+            },
+        }
+    })
+
+
+def test_count_mentions_with_missing_sentiment_keys():
+    assert entity_memory.count_mentions(make_report()) == {
+        "Battery Life": 2,
+        "Screen": 1,
+        "Price": 3
+    }
+
+
+def test_selectors_over_budget_with_missing_sentiment_keys():
+    report = make_report()
+    batch_reviews = [(7, "the battery life is short")]
+    for name in entity_memory.memory_selectors:
+        selector = entity_memory.get_memory_selector(
+            name,
+            estimate_tokens=batching.estimate_tokens_from_words,
+            token_budget=4)
+        assert set(selector.select(report, batch_reviews)) <= set(
+            report.existing_entities)
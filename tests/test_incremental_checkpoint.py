@@ -0,0 +1,60 @@
+"""Tests of the checkpoint of runs over non-contiguous review IDs (incremental runs)."""
+
+import logging
+
+from src import analyzer
+from utils import batching
+from utils import llm_backends
+from utils import rate_limiter
+
+logging.getLogger("Review Analyzer").setLevel(logging.WARNING)
+
+
+def make_pending_reviews():
+    """Pending reviews of an incremental run, with gaps left by rows dropped from the dataset."""
+    return [(review_id, f"the battery was great #{review_id}")
+            for review_id in range(100, 220)
+            if review_id % 7 != 3]
+
+
+def test_batch_end_idx_follows_last_review_id():
+    batch = batching.Batch(batch_num=1,
+                           start_idx=95,
+                           reviews=[(95, "a"), (97, "b"), (104, "c")])
+    assert batch.end_idx == 105
+
+
+def test_pack_batches_end_idx_with_sparse_review_ids():
+    reviews = make_pending_reviews()
+    batches = list(
+        batching.pack_batches(iter(reviews),
+                              estimate_tokens=len,
+                              max_reviews=20,
+                              start_idx=100))
+    assert [batch.end_idx for batch in batches
+           ] == [batch.reviews[-1][0] + 1 for batch in batches]
+    assert batches[-1].end_idx == reviews[-1][0] + 1
+
+
+def test_incremental_run_checkpoints_last_sent_review(tmp_path):
+    reviews = make_pending_reviews()
+
+    def run():
+        llm = llm_backends.MockBackend()
+        review_analyzer = analyzer.ReviewAnalyzer(
+            report_path=str(tmp_path / "report.json"),
+            limiter=rate_limiter.RateLimiter(1e9, None),
+            debug_dir=str(tmp_path / "logs"),
+            llm=llm)
+        review_analyzer.process_reviews_in_batches(reviews,
+                                                   batch_size=20,
+                                                   max_concurrent_batches=2)
+        return review_analyzer, llm
+
+    review_analyzer, _ = run()
+    assert review_analyzer.aggregated_results.resume_position(
+    )[0] == reviews[-1][0] + 1
+
+    # A resumed run has nothing left to send
+    _, llm = run()
+    assert not llm.attempts
@@ -0,0 +1,46 @@
+"""Tests of the summary of orchestrated runs."""
+
+import logging
+
+import pandas as pd
+
+from src import orchestrator
+from utils import constants
+from utils import rate_limiter
+
+logging.getLogger("Review Analyzer").setLevel(logging.ERROR)
+
+
+def test_summary_counts_the_current_run_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "result_dir", str(tmp_path / "results"))
+    monkeypatch.setattr(constants, "llm_backend", "mock")
+    monkeypatch.setattr(constants, "max_retries", 0)
+    monkeypatch.setattr(constants, "metrics_textfile_dir", None)
+    data_csv_path = str(tmp_path / "data.csv")
+    pd.DataFrame({
+        "Review": [f"the battery of laptop {i} is great" for i in range(6)]
+    }).to_csv(data_csv_path, index=False)
+    config = orchestrator.RunConfig(dataset_name="laptop",
+                                    data_csv_path=data_csv_path,
+                                    batch_size=2,
+                                    max_concurrent_batches=1)
+    limiter = rate_limiter.RateLimiter(1e9, None)
+
+    # Every LLM call of the first run fails, its batches are dead-lettered
+    monkeypatch.setitem(constants.llm_backend_options, "mock", {
+        "latency": 0.0,
+        "error_rate": 1.0
+    })
+    summary = orchestrator.run_analysis(config, limiter, cache=None)
+    assert (summary["reviews"], summary["failed_batches"]) == (6, 3)
+
+    # The data grows, the next run only reports its own batch
+    pd.DataFrame({
+        "Review": [f"the battery of laptop {i} is great" for i in range(8)]
+    }).to_csv(data_csv_path, index=False)
+    monkeypatch.setitem(constants.llm_backend_options, "mock", {
+        "latency": 0.0,
+        "error_rate": 0.0
+    })
+    summary = orchestrator.run_analysis(config, limiter, cache=None)
+    assert (summary["reviews"], summary["failed_batches"]) == (2, 0)
@@ -0,0 +1,43 @@
+"""Tests of the adaptive rate limiter."""
+
+import logging
+
+import pytest
+
+from utils import rate_limiter
+
+logging.getLogger("Review Analyzer").setLevel(logging.ERROR)
+
+
+def test_rate_limit_errors_back_off_once_per_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    limiter = rate_limiter.RateLimiter(60,
+                                       backoff_factor=0.5,
+                                       backoff_cooldown=10.0)
+    # Several calls in flight hit the same throttling event
+    for _ in range(4):
+        limiter.record_rate_limit()
+    assert limiter.rate_factor == 0.5
+
+    now[0] += 10.0
+    limiter.record_rate_limit()
+    assert limiter.rate_factor == 0.25
+
+
+def test_retry_with_backoff_retries_until_success(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "sleep", lambda seconds: None)
+    attempts = []
+
+    def call():
+        attempts.append(len(attempts))
+        if len(attempts) < 3:
+            raise RuntimeError("429 Too Many Requests")
+        return "response"
+
+    assert rate_limiter.retry_with_backoff(call,
+                                           max_retries=3) == ("response", 2)
+    attempts.clear()
+    with pytest.raises(RuntimeError):
+        rate_limiter.retry_with_backoff(call, max_retries=1)
+    assert len(attempts) == 2
@@ -0,0 +1,18 @@
+"""Tests of the atomic writes of the report files."""
+
+from concurrent import futures
+
+from utils import report_journal
+
+
+def test_concurrent_atomic_writes_do_not_share_a_temporary_file(tmp_path):
+    file_path = str(tmp_path / "cube.bin")
+    contents = [bytes([i]) * 100_000 for i in range(8)]
+    with futures.ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda content: report_journal.write_atomic(file_path, content),
+                contents))
+    with open(file_path, "rb") as f:
+        assert f.read() in contents
+    assert [path.name for path in tmp_path.iterdir()] == ["cube.bin"]
@@ -0,0 +1,35 @@
+"""Tests of the re-run of dead-lettered batches."""
+
+import logging
+
+from src import analyzer
+from utils import data_models
+from utils import llm_backends
+from utils import rate_limiter
+
+logging.getLogger("Review Analyzer").setLevel(logging.ERROR)
+
+
+def test_retry_failed_batches_skips_missing_reviews(tmp_path):
+    review_analyzer = analyzer.ReviewAnalyzer(
+        report_path=str(tmp_path / "report.json"),
+        limiter=rate_limiter.RateLimiter(1e9, None),
+        debug_dir=str(tmp_path / "logs"),
+        llm=llm_backends.MockBackend())
+    review_analyzer.aggregated_results.failed_batches = [
+        data_models.FailedBatch(batch_num=1,
+                                review_ids=[0, 1, 2],
+                                error="error",
+                                attempts=4),
+        data_models.FailedBatch(batch_num=2,
+                                review_ids=[3, 4],
+                                error="error",
+                                attempts=4),
+    ]
+    # Reviews 1, 3 and 4 were removed from the data since the batches failed
+    data = [(0, "the battery is great"), (2, "the screen is terrible")]
+
+    report = review_analyzer.retry_failed_batches(data)
+    assert [failed_batch.batch_num for failed_batch in report.failed_batches
+           ] == [2]
+    assert report.review_index.mentioned_review_ids().tolist() == [0, 2]
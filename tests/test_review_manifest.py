@@ -0,0 +1,97 @@
+"""Tests of the review manifest of incremental runs."""
+
+import random
+
+from utils import review_manifest
+
+
+def as_rows(reviews):
+    return list(enumerate(reviews))
+
+
+def register(reviews, manifest, next_review_idx=0, bootstrap=False):
+    review_manifest.register_reviews(as_rows(reviews),
+                                     manifest,
+                                     next_review_idx,
+                                     bootstrap=bootstrap,
+                                     chunk_size=3)
+    return list(
+        review_manifest.get_pending_reviews(as_rows(reviews),
+                                            manifest,
+                                            next_review_idx,
+                                            chunk_size=3))
+
+
+def test_identical_reviews_get_row_positions():
+    reviews = ["good app", "love the playlists", "good app", "ads are annoying"]
+    manifest = review_manifest.ReviewManifest()
+    assert register(reviews, manifest) == as_rows(reviews)
+
+    # Appended rows, identical to earlier ones or not
+    reviews += ["good app", "too many ads", "love the playlists"]
+    assert register(reviews, manifest,
+                    next_review_idx=4) == as_rows(reviews)[4:]
+
+
+def test_reordered_rows_keep_their_ids():
+    reviews = ["good app", "bad app", "good app", "ok", "good app", "ok"]
+    manifest = review_manifest.ReviewManifest()
+    register(reviews, manifest)
+    shuffled = reviews[:]
+    random.Random(0).shuffle(shuffled)
+    assert register(shuffled, manifest, next_review_idx=len(reviews)) == []
+
+    registered = list(
+        review_manifest.iter_registered_reviews(as_rows(shuffled), manifest))
+    assert sorted(registered) == as_rows(reviews)
+
+
+def test_saved_manifest_with_identical_reviews(tmp_path):
+    manifest_path = str(tmp_path / "manifest.npz")
+    reviews = ["good app", "good app", "bad app"]
+    manifest = review_manifest.ReviewManifest()
+    register(reviews, manifest)
+    manifest.save(manifest_path)
+
+    manifest = review_manifest.ReviewManifest.load(manifest_path)
+    reviews += ["good app"]
+    assert register(reviews, manifest, next_review_idx=3) == [(3, "good app")]
+
+
+def test_bootstrap_keeps_row_positions():
+    reviews = ["good app", "good app", "bad app", "good app", "new review"]
+    manifest = review_manifest.ReviewManifest()
+    assert register(reviews, manifest, next_review_idx=3,
+                    bootstrap=True) == as_rows(reviews)[3:]
+    assert sorted(
+        review_manifest.iter_registered_reviews(as_rows(reviews),
+                                                manifest)) == as_rows(reviews)
+
+
+def test_unprocessed_reviews_are_registered_again_in_dataset_order():
+    reviews = ["a", "b", "c", "d", "e"]
+    manifest = review_manifest.ReviewManifest()
+    register(reviews, manifest)
+    # Only reviews 0-1 were processed before the run was interrupted, then rows were reordered
+    reordered = ["e", "a", "d", "f", "b", "c"]
+    assert register(reordered, manifest, next_review_idx=2) == [(2, "e"),
+                                                                (3, "d"),
+                                                                (4, "f"),
+                                                                (5, "c")]
+
+
+def test_prepare_incremental_run_streams_pending_reviews(tmp_path):
+    report_path = str(tmp_path / "report.json")
+    reviews = ["good app", "bad app", "good app"]
+    pending_reviews = review_manifest.prepare_incremental_run(
+        lambda: iter(as_rows(reviews)), report_path, next_review_idx=0)
+    assert not isinstance(pending_reviews, list)
+    assert list(pending_reviews) == as_rows(reviews)
+
+    reviews = ["new review"] + reviews
+    assert list(
+        review_manifest.prepare_incremental_run(lambda: iter(as_rows(reviews)),
+                                                report_path,
+                                                next_review_idx=3)) == [
+                                                    (3, "new review")
+                                                ]
@@ -3,10 +3,12 @@
 import json
 import logging
 import os
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import colorlog
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
 from utils import data_models
 
@@ -77,6 +79,42 @@ def load_csv(file_path: str,
     return df
 
 
+def iter_reviews(file_path: str,
+                 columns: List[str] = [],
+                 reviews_processed: int = -1,
+                 chunk_size: int = 10000) -> Iterator[Tuple[int, str]]:
+    """Streams (review id, review) pairs from a CSV file in chunks.
+
+    Rows are filtered exactly like `load_csv`, so review ids match the index of the
+    DataFrame returned by `load_csv` for the same arguments. Memory usage is bounded by `chunk_size`.
+
+    Args:
+        file_path (str): path to csv file.
+        columns List[str]: List of names of particular columns that needs to be extracted. All will be used by default.
+        reviews_processed (int, optional): Number of reviews proccessed. Loads all if no value is passed.
+        chunk_size (int, optional): number of csv rows read at once.
+
+    Yields:
+        (int, str): review id and review.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(
+            f"Could not load csv, invalid path : {file_path}")
+
+    kwargs: Dict[str, int | List[str]] = {}
+    if reviews_processed > 0:
+        kwargs['nrows'] = reviews_processed
+    if columns:
+        kwargs['usecols'] = columns
+
+    review_id = 0
+    with pd.read_csv(file_path, chunksize=chunk_size, **kwargs) as reader:
+        for chunk in reader:
+            for review in chunk.dropna()["Review"]:
+                yield review_id, review
+                review_id += 1
+
+
 def analyze_coverage(data: pd.DataFrame,
                      report: data_models.AggregatedResults) -> Dict:
     """Extract coverage information from Analysis Report.
@@ -91,27 +129,95 @@ def analyze_coverage(data: pd.DataFrame,
             total_reviews (int): number of reviews processed.
             unattended_reviews (pd.DataFrame): Dataframe containing reviews for which no entity was assigned.
     """
-    entity_mentions = set()
-    for entity, sentiment_map in report.items():
-        entity_mentions.update(sentiment_map["positive_review_ids"])
-        entity_mentions.update(sentiment_map["negative_review_ids"])
-
     reviews = pd.DataFrame(data["Review"])
 
-    all_review_ids = set([i for i in range(len(reviews))])
-    reviews_ids_with_no_entities = list(
-        all_review_ids.difference(entity_mentions))
+    mentioned_review_ids = report.review_index.mentioned_review_ids()
+    entity_mentions = np.zeros(len(reviews), dtype=bool)
+    entity_mentions[mentioned_review_ids[
+        mentioned_review_ids < len(reviews)].astype(np.int64)] = True
 
-    reviews_with_no_entities = reviews.iloc[reviews_ids_with_no_entities]
+    reviews_with_no_entities = reviews.iloc[np.flatnonzero(~entity_mentions)]
 
     coverage_report = {
-        "total_reviews": len(all_review_ids),
+        "total_reviews": len(reviews),
         "unattended_reviews": reviews_with_no_entities.sort_index()
     }
 
     return coverage_report
 
 
+def get_review_id_arrays(
+        report: data_models.AggregatedResults,
+        entities: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """Returns the sorted IDs of the reviews mentioning each entity, with any sentiment.
+
+    Args:
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+            a dictionary containing sets of review IDS corresponnding to each sentiment.
+        entities (List[str], optional): entities to be returned, all entities if None.
+
+    Returns:
+        review_id_arrays (Dict[str, np.ndarray]): review IDs mentioning each entity.
+    """
+    if entities is None:
+        entities = report.existing_entities
+    empty = data_models.ReviewIdSet()
+    return {
+        entity:
+        np.union1d(report[entity].get("positive_review_ids", empty).array,
+                   report[entity].get("negative_review_ids", empty).array)
+        for entity in entities
+    }
+
+
+def count_entities_per_review(report: data_models.AggregatedResults,
+                              num_reviews: int) -> np.ndarray:
+    """Counts the entities assigned to each review, with any sentiment.
+
+    Args:
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+            a dictionary containing sets of review IDS corresponnding to each sentiment.
+        num_reviews (int): number of processed reviews, IDs beyond it are ignored.
+
+    Returns:
+        entity_counts (np.ndarray): number of entities assigned to each review ID.
+    """
+    review_id_arrays = list(get_review_id_arrays(report).values())
+    if not review_id_arrays:
+        return np.zeros(num_reviews, dtype=np.int64)
+    review_ids = np.concatenate(review_id_arrays)
+    return np.bincount(review_ids[review_ids < num_reviews],
+                       minlength=num_reviews)
+
+
+def entity_cooccurrence(report: data_models.AggregatedResults,
+                        entities: Optional[List[str]] = None) -> pd.DataFrame:
+    """Counts the reviews mentioning each pair of entities.
+
+    Builds a sparse entity x review incidence matrix, the co-occurrence counts are its
+    product with its transpose.
+
+    Args:
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+            a dictionary containing sets of review IDS corresponnding to each sentiment.
+        entities (List[str], optional): entities to be compared, all entities if None.
+
+    Returns:
+        cooccurrence (pd.DataFrame): square matrix of the number of reviews mentioning both entities,
+            the diagonal holds the number of reviews mentioning each entity.
+    """
+    review_id_arrays = get_review_id_arrays(report, entities)
+    entities = list(review_id_arrays)
+    review_ids = list(review_id_arrays.values())
+    columns = np.concatenate(review_ids) if review_ids else np.empty(0, int)
+    rows = np.repeat(np.arange(len(entities)), [len(ids) for ids in review_ids])
+    incidence = sparse.csr_matrix(
+        (np.ones(len(columns), dtype=np.int32), (rows, columns)),
+        shape=(len(entities), int(columns.max()) + 1 if len(columns) else 0))
+    cooccurrence = (incidence @ incidence.T).toarray()
+    return pd.DataFrame(cooccurrence, index=entities, columns=entities)
+
+
 def get_reviews_for_entity(data: pd.DataFrame,
                            report: data_models.AggregatedResults,
                            entity_name: str,
@@ -133,35 +239,75 @@ def get_reviews_for_entity(data: pd.DataFrame,
     return selected_reviews.sort_index()
 
 
-def read_json(file_path: str) -> Dict:
-    """Loads json file to python dict.
+def get_entities_for_review(report: data_models.AggregatedResults,
+                            review_id: int) -> pd.DataFrame:
+    """Fetches the entities and sentiments assigned to a particular review.
 
     Args:
-        file_path (str): path to json file.
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+             a dictionary containing sets of review IDS corresponnding to each sentiment.
+        review_id (int): ID of the review to be queried.
 
-    Resturns:
-        data (Dict): python dict with loaded json data.
+    Returns:
+        mentions (pd.DataFrame): "Entity" and "Sentiment" of every mention in the review.
+    """
+    return pd.DataFrame(report.review_index.get_mentions(review_id),
+                        columns=["Entity", "Sentiment"])
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of LLM tokens in a text (roughly 4 characters per token).
+
+    Args:
+        text (str): Text to be sent to the LLM.
+
+    Returns:
+        (int): estimated number of tokens.
+    """
+    return len(text) // 4 + 1
+
+
+def load_report(file_path: str) -> data_models.AggregatedResults:
+    """Loads an analysis report, in the binary format if the path ends with `.npz`, json otherwise.
+
+    Args:
+        file_path (str): path to the report.
+
+    Returns:
+        report (AggregatedResults): the loaded report.
     """
+    if file_path.endswith(".npz"):
+        with open(file_path, "rb") as f:
+            return data_models.AggregatedResults.from_binary(f.read())
     with open(file_path, "r") as f:
-        data = json.load(f)
-    return data
+        return data_models.AggregatedResults.model_validate_json(f.read())
 
 
-def dump_batch_log(batch_log_path: str, llm_input: str,
-                   llm_output: str) -> None:
-    """Save the input and output of an LLM call for a specific batch to a JSON log file.
+def serialize_report(report: data_models.AggregatedResults,
+                     file_path: str) -> Union[str, bytes]:
+    """Serializes an analysis report in the format matching its path (see `load_report`).
 
     Args:
-        batch_log_path (str): Path to save the log file.
-        llm_input (str): The formatted input prompt provided to the LLM.
-        llm_output (str): The output generated by the LLM for the given input.
+        report (AggregatedResults): the report.
+        file_path (str): path the report will be written to.
 
     Returns:
-        None
+        (str | bytes): the binary archive for `.npz` paths, indented json otherwise.
     """
-    debug_data = {
-        "query": llm_input,
-        "response": llm_output,
-    }
-    with open(batch_log_path, "w") as f:
-        json.dump(debug_data, f, indent=4)
+    if file_path.endswith(".npz"):
+        return report.to_binary()
+    return report.model_dump_json(indent=4)
+
+
+def read_json(file_path: str) -> Dict:
+    """Loads json file to python dict.
+
+    Args:
+        file_path (str): path to json file.
+
+    Resturns:
+        data (Dict): python dict with loaded json data.
+    """
+    with open(file_path, "r") as f:
+        data = json.load(f)
+    return data
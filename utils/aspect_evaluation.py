@@ -0,0 +1,263 @@
+"""This file contains the evaluation of an analysis report against the gold aspects of a SemEval dataset.
+
+Predicted entities are aligned to gold aspects of the same review by lexical matching (no
+embeddings): an entity matches an aspect if the words of one are contained in the other, or if
+their character trigrams are similar enough. Precision, recall and F1 are computed per sentiment.
+"""
+
+import argparse
+import ast
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils import analyzer_utils
+from utils import constants
+from utils import data_models
+from utils import entity_memory
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+SENTIMENTS = ("positive", "negative")
+
+
+def load_gold_aspects(file_path: str,
+                      reviews_processed: int = -1) -> pd.DataFrame:
+    """Loads the gold aspects of a dataset prepared with `prepare_semeval_data`.
+
+    Args:
+        file_path (str): path to the prepared csv file, with "Review" and "Aspects" columns.
+        reviews_processed (int, optional): Number of reviews proccessed. Loads all if no value is passed.
+
+    Returns:
+        gold (pd.DataFrame): one row per gold aspect with "review_id", "aspect" and "polarity" columns,
+            review ids matching the ones assigned by the analyzer.
+    """
+    data = analyzer_utils.load_csv(file_path=file_path,
+                                   columns=["Review", "Aspects"],
+                                   reviews_processed=reviews_processed)
+    aspects = data["Aspects"].map(lambda aspects: ast.literal_eval(aspects)
+                                  if isinstance(aspects, str) else aspects)
+    gold = aspects.explode().dropna()
+    gold = pd.DataFrame({
+        "review_id": gold.index.to_numpy(),
+        "aspect": gold.str["aspect"].to_numpy(),
+        "polarity": gold.str["polarity"].to_numpy(),
+    })
+    return gold.dropna(subset=["aspect"]).reset_index(drop=True)
+
+
+def get_predicted_entities(
+        report: data_models.AggregatedResults) -> pd.DataFrame:
+    """Lists the (review, entity, sentiment) mentions of a report.
+
+    Args:
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+            a dictionary containing sets of review IDS corresponnding to each sentiment.
+
+    Returns:
+        predicted (pd.DataFrame): one row per mention with "review_id", "entity" and "polarity" columns.
+    """
+    index = report.review_index
+    review_ids, entity_codes, sentiment_codes = index.decode(index.keys)
+    return pd.DataFrame({
+        "review_id": review_ids,
+        "entity": np.array(index.entities, dtype=object)[entity_codes],
+        "polarity": np.array(SENTIMENTS)[sentiment_codes],
+    })
+
+
+def normalize(name: str) -> str:
+    return " ".join(entity_memory.tokenize(name))
+
+
+def _incidence(names: List[str],
+               features: List[List[str]]) -> Tuple[sparse.csr_matrix, Dict]:
+    vocabulary: Dict[str, int] = {}
+    rows, columns = [], []
+    for row, name_features in enumerate(features):
+        for feature in set(name_features):
+            rows.append(row)
+            columns.append(vocabulary.setdefault(feature, len(vocabulary)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+        shape=(len(names), len(vocabulary)))
+    return matrix, vocabulary
+
+
+def match_names(entities: List[str],
+                aspects: List[str],
+                similarity_threshold: float = 0.6) -> sparse.csr_matrix:
+    """Computes which entity names match which aspect names, using sparse matrix products.
+
+    Names are lowercased and tokenized (with naive plural folding). An entity matches an aspect
+    if all the words of one appear in the other (e.g. "Battery" and "battery life"), or if the
+    Dice similarity of their character trigrams is at least `similarity_threshold`.
+
+    Args:
+        entities (List[str]): predicted entity names.
+        aspects (List[str]): gold aspect names.
+        similarity_threshold (float): minimum trigram Dice similarity of fuzzy matches.
+
+    Returns:
+        matches (sparse.csr_matrix): boolean entity x aspect matrix.
+    """
+    names = [normalize(name) for name in entities + aspects]
+    tokens = [name.split() for name in names]
+    trigrams = [[padded[i:i + 3]
+                 for i in range(len(padded) - 2)]
+                for padded in (f"  {name} " for name in names)]
+    token_matrix, _ = _incidence(names, tokens)
+    trigram_matrix, _ = _incidence(names, trigrams)
+
+    def cross(matrix: sparse.csr_matrix) -> sparse.coo_matrix:
+        # intersection sizes of entity and aspect feature sets
+        return (matrix[:len(entities)] @ matrix[len(entities):].T).tocoo()
+
+    def sizes(matrix: sparse.csr_matrix) -> np.ndarray:
+        return np.asarray(matrix.sum(axis=1)).ravel()
+
+    shared_tokens = cross(token_matrix)
+    num_tokens = sizes(token_matrix)
+    contained = (shared_tokens.data == num_tokens[shared_tokens.row]) | (
+        shared_tokens.data == num_tokens[len(entities) + shared_tokens.col])
+
+    shared_trigrams = cross(trigram_matrix)
+    num_trigrams = sizes(trigram_matrix)
+    dice = 2 * shared_trigrams.data / (
+        num_trigrams[shared_trigrams.row] +
+        num_trigrams[len(entities) + shared_trigrams.col])
+    similar = dice >= similarity_threshold
+
+    rows = np.concatenate(
+        [shared_tokens.row[contained], shared_trigrams.row[similar]])
+    columns = np.concatenate(
+        [shared_tokens.col[contained], shared_trigrams.col[similar]])
+    matches = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, columns)),
+        shape=(len(entities), len(aspects)))
+    return matches
+
+
+def evaluate_report(report: data_models.AggregatedResults,
+                    gold: pd.DataFrame,
+                    similarity_threshold: float = 0.6) -> pd.DataFrame:
+    """Scores the entities of a report against gold aspects.
+
+    A predicted (review, entity, sentiment) is correct if the review has a matching gold aspect
+    with the same polarity, a gold (review, aspect, polarity) is found if the review has a matching
+    predicted entity with the same sentiment. The "any" row ignores sentiments. Gold aspects with
+    other polarities (neutral, conflict) are not counted. `gold` must be loaded with the number of
+    reviews processed by the analyzer.
+
+    Args:
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+            a dictionary containing sets of review IDS corresponnding to each sentiment.
+        gold (pd.DataFrame): gold aspects, see `load_gold_aspects`.
+        similarity_threshold (float): minimum trigram Dice similarity of fuzzy matches.
+
+    Returns:
+        scores (pd.DataFrame): "precision", "recall", "f1", "predicted" and "gold" counts indexed by
+            sentiment ("positive", "negative", "micro avg" and "any").
+    """
+    predicted = get_predicted_entities(report)
+
+    entities, entity_codes = np.unique(predicted["entity"].to_numpy(dtype=str),
+                                       return_inverse=True)
+    aspects, aspect_codes = np.unique(gold["aspect"].to_numpy(dtype=str),
+                                      return_inverse=True)
+    predicted = predicted.assign(entity_code=entity_codes)
+    gold = gold.assign(aspect_code=aspect_codes)
+    matches = match_names(list(entities), list(aspects), similarity_threshold)
+
+    def count_correct(left: pd.DataFrame, right: pd.DataFrame,
+                      on: List[str]) -> int:
+        # candidate (entity, aspect) pairs of the same review (and sentiment)
+        pairs = left.reset_index(names="row").merge(right, on=on)
+        if pairs.empty:
+            return 0
+        is_match = np.asarray(matches[pairs["entity_code"].to_numpy(),
+                                      pairs["aspect_code"].to_numpy()]).ravel()
+        return pairs.loc[is_match, "row"].nunique()
+
+    rows = {}
+    for sentiment in (*SENTIMENTS, "any"):
+        if sentiment == "any":
+            sentiment_predicted = predicted.drop_duplicates(
+                ["review_id", "entity_code"])
+            sentiment_gold = gold[gold["polarity"].isin(
+                SENTIMENTS)].drop_duplicates(["review_id", "aspect_code"])
+            on = ["review_id"]
+        else:
+            sentiment_predicted = predicted[predicted["polarity"] == sentiment]
+            sentiment_gold = gold[gold["polarity"] == sentiment]
+            on = ["review_id", "polarity"]
+        sentiment_predicted = sentiment_predicted.reset_index(drop=True)
+        sentiment_gold = sentiment_gold.reset_index(drop=True)
+        rows[sentiment] = {
+            "true_positives_predicted":
+                count_correct(sentiment_predicted,
+                              sentiment_gold[on + ["aspect_code"]], on),
+            "true_positives_gold":
+                count_correct(sentiment_gold,
+                              sentiment_predicted[on + ["entity_code"]], on),
+            "predicted":
+                len(sentiment_predicted),
+            "gold":
+                len(sentiment_gold),
+        }
+    counts = pd.DataFrame.from_dict(rows, orient="index")
+    counts.loc["micro avg"] = counts.loc[list(SENTIMENTS)].sum()
+    counts = counts.loc[[*SENTIMENTS, "micro avg", "any"]]
+
+    precision = counts["true_positives_predicted"] / counts["predicted"].clip(
+        lower=1)
+    recall = counts["true_positives_gold"] / counts["gold"].clip(lower=1)
+    f1 = (2 * precision * recall / (precision + recall)).fillna(0.0)
+    return pd.DataFrame({
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "predicted": counts["predicted"],
+        "gold": counts["gold"],
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=
+        "Evaluates analysis reports against the gold aspects of SemEval datasets."
+    )
+    parser.add_argument("--datasets",
+                        nargs="+",
+                        default=[constants.dataset_name],
+                        help="dataset names, keys of `constants.data`")
+    parser.add_argument("--experiment_name",
+                        type=str,
+                        default=constants.experiment_name)
+    parser.add_argument("--similarity_threshold",
+                        type=float,
+                        default=0.6,
+                        help="minimum trigram similarity of fuzzy matches")
+    parser.add_argument("--reviews_processed",
+                        type=int,
+                        default=constants.reviews_processed,
+                        help="number of reviews processed, -1 for all")
+    args = parser.parse_args()
+
+    for dataset_name in args.datasets:
+        report_path = os.path.join(constants.result_dir, dataset_name,
+                                   args.experiment_name, "analysis_report.json")
+        report = analyzer_utils.load_report(report_path)
+        gold = load_gold_aspects(constants.data[dataset_name],
+                                 args.reviews_processed)
+        scores = evaluate_report(report, gold, args.similarity_threshold)
+        logger.info(f"Aspect evaluation of {report_path}:\n"
+                    f"{scores.round(3).to_string()}")
+
+
+if __name__ == "__main__":
+    main()
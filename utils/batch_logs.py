@@ -0,0 +1,180 @@
+"""This file contains a writer of compressed, deduplicated batch logs (LLM inputs and outputs).
+
+The system prompt and few-shot examples are the same in every prompt of a run. They are
+written once, to `prompt_<hash>.txt.gz`, and every batch log only stores their hash and the
+user prompt (entity memory and reviews). Batch logs are gzip-compressed json files,
+`batch_<num>.json.gz`, written by a background thread off the hot path of the analyzer.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+from typing import Any, Dict, Optional, Tuple
+import zlib
+
+from utils import analyzer_utils
+from utils import report_journal
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+# all: every LLM call, sampled: a sample of the batches and every failure,
+# failures: failed calls only (LLM errors, malformed or invalid responses), none: no log
+BATCH_LOG_RETENTIONS = ("all", "sampled", "failures", "none")
+
+
+def get_prompt_hash(text: str) -> str:
+    """Returns the hash referencing a static part of the prompt in the batch logs."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def get_prompt_path(log_dir: str, prompt_hash: str) -> str:
+    return os.path.join(log_dir, f"prompt_{prompt_hash}.txt.gz")
+
+
+def is_sampled(batch_num: int, sample_rate: float) -> bool:
+    """Deterministically samples a batch, so that all attempts of a batch are logged or none."""
+    return zlib.crc32(str(batch_num).encode("utf-8")) < sample_rate * 2**32
+
+
+class BatchLogWriter:
+    """Writes batch logs from a background thread, referencing the static prompt by hash."""
+
+    def __init__(self,
+                 log_dir: str,
+                 static_prompt: Tuple[str, str] = ("", ""),
+                 retention: str = "all",
+                 sample_rate: float = 0.1,
+                 max_pending_logs: int = 64):
+        """BatchLogWriter parameters initialization.
+
+        Args:
+            log_dir (str): directory of the batch logs.
+            static_prompt (Tuple[str, str]): rendered prompt before and after the user prompt
+                (see `prompts.get_static_prompt`), written once.
+            retention (str): batch logs kept, one of `BATCH_LOG_RETENTIONS`.
+            sample_rate (float): fraction of the batches logged with the "sampled" retention.
+            max_pending_logs (int): logs queued before `write` blocks, bounds the memory held.
+        """
+        if retention not in BATCH_LOG_RETENTIONS:
+            raise ValueError(
+                f"Unknown batch log retention : {retention}, available retentions: {list(BATCH_LOG_RETENTIONS)}"
+            )
+        self.log_dir = log_dir
+        self.static_prompt = static_prompt
+        self.retention = retention
+        self.sample_rate = sample_rate
+        self.written_prompts: set = set()
+        self.queue: queue.Queue = queue.Queue(maxsize=max_pending_logs)
+        self.thread = threading.Thread(target=self.run,
+                                       name="batch-log-writer",
+                                       daemon=True)
+        self.thread.start()
+
+    def should_log(self, batch_num: int, failed: bool) -> bool:
+        """Whether the retention keeps a log of the batch."""
+        if self.retention == "all":
+            return True
+        if self.retention == "sampled":
+            return failed or is_sampled(batch_num, self.sample_rate)
+        return self.retention == "failures" and failed
+
+    def write(self,
+              batch_num: int,
+              llm_input: str,
+              llm_output: Optional[str] = None,
+              latency: Optional[float] = None,
+              error: Optional[str] = None) -> None:
+        """Queues the log of an LLM call, written in the background if the retention keeps it.
+
+        Args:
+            batch_num (int): 1-based number of the batch, the log of a retried batch is replaced.
+            llm_input (str): The formatted input prompt provided to the LLM.
+            llm_output (str, optional): The output generated by the LLM, raw if it could not be parsed.
+            latency (float, optional): Duration of the LLM call in seconds.
+            error (str, optional): Error of a failed call.
+        """
+        if self.should_log(batch_num, failed=error is not None):
+            self.queue.put((batch_num, llm_input, llm_output, latency, error))
+
+    def flush(self) -> None:
+        """Blocks until all queued logs are written."""
+        self.queue.join()
+
+    def run(self) -> None:
+        while True:
+            batch_num, llm_input, llm_output, latency, error = self.queue.get()
+            try:
+                self.write_log(batch_num, llm_input, llm_output, latency, error)
+            except Exception as e:
+                logger.error(
+                    f"Could not write the log of batch {batch_num}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def write_log(self, batch_num: int, llm_input: str,
+                  llm_output: Optional[str], latency: Optional[float],
+                  error: Optional[str]) -> None:
+        """Compresses and writes a batch log, and the static prompt it references if new."""
+        os.makedirs(self.log_dir, exist_ok=True)
+        prefix, suffix = self.static_prompt
+        debug_data: Dict[str, Any] = {"batch_num": batch_num}
+        if prefix and llm_input.startswith(prefix) and llm_input.endswith(
+                suffix):
+            debug_data["prompt_prefix"] = self.write_prompt(prefix)
+            debug_data["prompt_suffix"] = self.write_prompt(suffix)
+            llm_input = llm_input[len(prefix):len(llm_input) - len(suffix)]
+        debug_data.update({
+            "query": llm_input,
+            "response": llm_output,
+            "latency_seconds": latency,
+            "error": error,
+        })
+        report_journal.write_atomic(
+            os.path.join(self.log_dir, f"batch_{batch_num}.json.gz"),
+            gzip.compress(json.dumps(debug_data).encode("utf-8")))
+
+    def write_prompt(self, text: str) -> str:
+        """Writes a static part of the prompt once and returns its hash."""
+        prompt_hash = get_prompt_hash(text)
+        if prompt_hash not in self.written_prompts:
+            prompt_path = get_prompt_path(self.log_dir, prompt_hash)
+            if not os.path.exists(prompt_path):
+                report_journal.write_atomic(prompt_path,
+                                            gzip.compress(text.encode("utf-8")))
+            self.written_prompts.add(prompt_hash)
+        return prompt_hash
+
+
+def load_batch_log(file_path: str) -> Dict[str, Any]:
+    """Loads a batch log, with the full prompt rebuilt from the static prompt it references.
+
+    Args:
+        file_path (str): path to a batch log, `batch_<num>.json.gz` (or an uncompressed
+            `batch_<num>.json` of earlier runs).
+
+    Returns:
+        debug_data (Dict[str, Any]): the log, with the prompt in "query" and the LLM output
+            in "response".
+    """
+    if file_path.endswith(".gz"):
+        with gzip.open(file_path, "rt", encoding="utf-8") as f:
+            debug_data = json.load(f)
+    else:
+        debug_data = analyzer_utils.read_json(file_path)
+
+    log_dir = os.path.dirname(file_path)
+    parts = []
+    for key in ("prompt_prefix", "prompt_suffix"):
+        prompt_hash = debug_data.get(key)
+        if prompt_hash is None:
+            parts.append("")
+            continue
+        with gzip.open(get_prompt_path(log_dir, prompt_hash),
+                       "rt",
+                       encoding="utf-8") as f:
+            parts.append(f.read())
+    debug_data["query"] = parts[0] + debug_data["query"] + parts[1]
+    return debug_data
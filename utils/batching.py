@@ -0,0 +1,125 @@
+"""This file contains token-budget aware batching of reviews."""
+
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils import analyzer_utils
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+# A token estimator maps a text to its (estimated) number of LLM tokens
+TokenEstimator = Callable[[str], int]
+
+
+def estimate_tokens_from_words(text: str) -> int:
+    """Estimates the number of LLM tokens in a text (roughly 4 tokens per 3 words).
+
+    Args:
+        text (str): Text to be sent to the LLM.
+
+    Returns:
+        (int): estimated number of tokens.
+    """
+    return (len(text.split()) * 4) // 3 + 1
+
+
+token_estimators = {
+    "chars": analyzer_utils.estimate_tokens,
+    "words": estimate_tokens_from_words,
+}
+
+
+def get_token_estimator(name: str) -> TokenEstimator:
+    """Returns a registered token estimator.
+
+    Custom (e.g. tokenizer based) estimators can be added to `token_estimators`.
+
+    Args:
+        name (str): name of the estimator.
+
+    Returns:
+        (TokenEstimator): function mapping a text to its estimated number of tokens.
+    """
+    if name not in token_estimators:
+        raise ValueError(
+            f"Unknown token estimator : {name}, available estimators: {list(token_estimators)}"
+        )
+    return token_estimators[name]
+
+
+class Batch(NamedTuple):
+    """A batch of reviews sent to the LLM in a single call.
+
+    Attributes:
+        batch_num (int): 1-based number of the batch.
+        start_idx (int, optional): position of the first review, None when re-running a failed batch.
+        reviews (List[Tuple[int, str]]): (review id, review) pairs.
+    """
+    batch_num: int
+    start_idx: Optional[int]
+    reviews: List[Tuple[int, str]]
+
+    @property
+    def end_idx(self) -> Optional[int]:
+        """Review ID following the last review of the batch, where processing resumes.
+
+        Derived from the review IDs rather than the number of reviews, as the IDs of the
+        reviews pending in an incremental run are not contiguous.
+        """
+        if self.start_idx is None:
+            return None
+        return self.reviews[-1][0] + 1
+
+
+def pack_batches(reviews: Iterator[Tuple[int, str]],
+                 estimate_tokens: TokenEstimator,
+                 review_token_budget: int = 4000,
+                 max_output_tokens: int = 8192,
+                 output_tokens_per_review: int = 40,
+                 max_reviews: int = 50,
+                 start_idx: int = 0,
+                 start_batch_num: int = 1) -> Iterator[Batch]:
+    """Packs consecutive reviews into batches by their estimated number of tokens.
+
+    A batch is closed before adding a review that would exceed the input token budget,
+    the output token ceiling or the maximum number of reviews. A single review larger than
+    the budget is sent in a batch of its own. Reviews are consumed lazily.
+
+    Args:
+        reviews (Iterator[Tuple[int, str]]): (review id, review) pairs, in processing order.
+        estimate_tokens (TokenEstimator): function estimating the number of tokens in a text.
+        review_token_budget (int): target number of input tokens of the reviews in a batch.
+        max_output_tokens (int): ceiling on the number of output tokens of a batch.
+        output_tokens_per_review (int): estimated number of output tokens per review.
+        max_reviews (int): maximum number of reviews in a batch.
+        start_idx (int): position of the first review in `reviews`.
+        start_batch_num (int): number of the first batch.
+
+    Yields:
+        batch (Batch): the next packed batch.
+    """
+    max_reviews = max(
+        1, min(max_reviews, max_output_tokens // output_tokens_per_review))
+    batch_num = start_batch_num
+    batch_reviews: List[Tuple[int, str]] = []
+    batch_tokens = 0
+    for review_id, review in reviews:
+        review_tokens = estimate_tokens(f"review-{review_id} : {review}\n")
+        if batch_reviews and (batch_tokens + review_tokens > review_token_budget
+                              or len(batch_reviews) == max_reviews):
+            yield Batch(batch_num=batch_num,
+                        start_idx=start_idx,
+                        reviews=batch_reviews)
+            batch_num += 1
+            start_idx += len(batch_reviews)
+            batch_reviews, batch_tokens = [], 0
+        if review_tokens > review_token_budget:
+            logger.warning(
+                f"review-{review_id} (~{review_tokens} tokens) exceeds the token budget of a batch ({review_token_budget})"
+            )
+        batch_reviews.append((review_id, review))
+        batch_tokens += review_tokens
+
+    if batch_reviews:
+        yield Batch(batch_num=batch_num,
+                    start_idx=start_idx,
+                    reviews=batch_reviews)
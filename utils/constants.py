@@ -1,7 +1,7 @@
 """This file contains constant variables."""
 
 import os
-from typing import List
+from typing import Any, Dict, List, Optional
 
 data = {
     "spotify": "data/spotify_reviews.csv",
@@ -12,7 +12,10 @@ data = {
 # data_config
 dataset_name: str = "laptop"
 data_csv_path: str = data[dataset_name]
-features_to_use: List[str] = ["Review"]
+features_to_use: List[str] = ["Review"
+                             ]  # add `time_column` for sentiment trends
+time_column: str = "Time_submitted"  # optional review timestamps
+csv_chunk_size: int = 10000  # rows read at once when streaming the dataset
 result_dir: str = "results/"
 experiment_name: str = "exp1"
 result_subdir: str = os.path.join(result_dir,
@@ -21,14 +24,53 @@ debug_dir: str = os.path.join(result_subdir, "logs")
 
 # analyzer_config
 model: str = "gemini-2.0-flash"
-batch_size: int = 50
+llm_backend: str = "gemini"  # see `llm_backends.llm_backends`, "mock" runs offline
+llm_backend_options: Dict[str, Dict[str, Any]] = {
+    "gemini": {
+        "model": model
+    },
+    "mock": {
+        "latency": 1.0,  # seconds per call
+        "latency_jitter": 0.5,
+        "error_rate": 0.0,
+        "rate_limit_rate": 0.0,
+    },
+}
+batch_size: int = 50  # maximum number of reviews per batch
+review_token_budget: int = 4000  # estimated tokens of the reviews in a batch
+max_output_tokens: int = 8192  # ceiling on the estimated output tokens of a batch
+output_tokens_per_review: int = 40  # estimated output tokens per review
+token_estimator: str = "chars"  # see `batching.token_estimators`
+entity_memory_strategy: str = "similarity"  # see `entity_memory.memory_selectors`
+memory_token_budget: int = 1500  # estimated tokens of entity memory per prompt
+memory_max_entities: Optional[
+    int] = None  # maximum entities in memory per prompt
+max_concurrent_batches: int = 4  # number of batches kept in flight
+requests_per_minute: int = 15  # LLM request quota
+tokens_per_minute: int = 1_000_000  # LLM input token quota
+max_retries: int = 3  # retries per batch before moving it to the dead-letter list
+retry_base_delay: float = 2.0  # seconds, doubled on every retry
+retry_max_delay: float = 60.0  # seconds
+max_consecutive_failures: int = 5  # stop the run after these many failed batches in a row
 aggregated_results_path: str = os.path.join(result_subdir,
                                             f"analysis_report.json")
+snapshot_interval: int = 50  # batches journaled between two snapshots of the report
+batch_log_retention: str = "all"  # batch logs kept: "all", "sampled", "failures" or "none"
+batch_log_sample_rate: float = 0.1  # fraction of the batches logged with "sampled"
+response_cache_path: str = os.path.join(result_dir, "llm_response_cache.sqlite")
+response_cache_max_size_mb: float = 512
+input_token_price: float = 0.10  # USD per million input tokens of `model`
+output_token_price: float = 0.40  # USD per million output tokens of `model`
+max_parallel_runs: int = 4  # runs executed concurrently by `src.orchestrator`
+metrics_textfile_dir: Optional[
+    str] = None  # directory of the Prometheus textfile of a run, not exported if None
 
 # app_config
 reviews_processed: int = -1  # set to -1 if all are processed
 analysis_report_path: str = "app/static/analysis_report.json"
 plot_dir: str = "app/static/plots"
+plot_cache_max_versions: int = 8  # cached renders kept per plot, least recently viewed evicted first
 review_level_analysis_img_path: str = "app/static/review-level-sentiment.jpg"
 entity_level_analysis_img_path: str = "app/static/entity-level-sentiment.png"
 hld_img_path: str = "app/static/high_level_design.png"
+app_debug: bool = False  # show data cache hits and misses in the sidebar
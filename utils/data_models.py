@@ -1,9 +1,225 @@
 """This file contains pydantic data models."""
 
-from typing import Dict, Iterator, List, Optional, Set, Tuple
+import io
+import json
+from typing import Any, cast, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import numpy as np
 from pydantic import BaseModel
 from pydantic import Field
+from pydantic import GetCoreSchemaHandler
+from pydantic import PrivateAttr
+from pydantic.json_schema import SkipJsonSchema
+from pydantic_core import core_schema
+
+SENTIMENT_KEYS = ("positive_review_ids", "negative_review_ids")
+
+
+class ReviewIdSet:
+    """Compact set of review IDs backed by a sorted numpy uint32 array.
+
+    Supports the set operations used on review IDs (`len`, `in`, iteration in increasing
+    order, `update`, `|`, `&`, `-`). Additions are buffered and merged into the sorted
+    array on the next read, so that merging many small batches stays cheap.
+    Validated from / serialized to a JSON array of integers, like `Set[int]`.
+    """
+
+    dtype = np.uint32
+
+    def __init__(self, review_ids: Iterable[int] = ()):
+        self._ids = self._to_array(review_ids)
+        self._pending: List[np.ndarray] = []
+
+    @classmethod
+    def _to_array(cls, review_ids: Any) -> np.ndarray:
+        if isinstance(review_ids, ReviewIdSet):
+            return review_ids.array
+        if not isinstance(review_ids, np.ndarray):
+            review_ids = np.asarray(review_ids if isinstance(
+                review_ids, (list, tuple)) else list(review_ids))
+        if not review_ids.size:
+            return np.empty(0, dtype=cls.dtype)
+        # Non-integral IDs (e.g. 5.5 or "7" from the LLM) are rejected, not truncated
+        if not np.issubdtype(review_ids.dtype, np.integer):
+            raise ValueError(
+                f"review IDs must be integers, got {review_ids.dtype} values")
+        if review_ids.min() < 0 or review_ids.max() > np.iinfo(cls.dtype).max:
+            raise ValueError(
+                f"review IDs must be in [0, {np.iinfo(cls.dtype).max}]")
+        return np.unique(review_ids.astype(cls.dtype, copy=False))
+
+    @classmethod
+    def from_sorted_array(cls, review_ids: np.ndarray) -> "ReviewIdSet":
+        """Wraps an array of sorted unique review IDs without copying it."""
+        review_id_set = cls()
+        review_id_set._ids = review_ids.astype(cls.dtype, copy=False)
+        return review_id_set
+
+    @property
+    def array(self) -> np.ndarray:
+        """Sorted unique review IDs (read-only view)."""
+        if self._pending:
+            self._ids = np.unique(np.concatenate([self._ids, *self._pending]))
+            self._pending = []
+        view = self._ids.view()
+        view.flags.writeable = False
+        return view
+
+    def update(self, review_ids: Iterable[int]) -> None:
+        review_ids = self._to_array(review_ids)
+        if review_ids.size:
+            self._pending.append(review_ids)
+
+    def add(self, review_id: int) -> None:
+        self.update((review_id,))
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __bool__(self) -> bool:
+        return len(self._ids) > 0 or any(len(ids) for ids in self._pending)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(cast(List[int], self.array.tolist()))
+
+    def __contains__(self, review_id: object) -> bool:
+        if not isinstance(review_id, (int, np.integer)) or review_id < 0:
+            return False
+        ids = self.array
+        position = np.searchsorted(ids, review_id)
+        return bool(position < len(ids) and ids[position] == review_id)
+
+    def __or__(self, other: Iterable[int]) -> "ReviewIdSet":
+        return self.from_sorted_array(
+            np.union1d(self.array, self._to_array(other)))
+
+    def __and__(self, other: Iterable[int]) -> "ReviewIdSet":
+        return self.from_sorted_array(
+            np.intersect1d(self.array,
+                           self._to_array(other),
+                           assume_unique=True))
+
+    def __sub__(self, other: Iterable[int]) -> "ReviewIdSet":
+        return self.from_sorted_array(
+            np.setdiff1d(self.array, self._to_array(other), assume_unique=True))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (ReviewIdSet, set, frozenset, list, tuple)):
+            return np.array_equal(self.array, self._to_array(other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ReviewIdSet({self.array.tolist()})"
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+            cls, source_type: Any,
+            handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls,
+            json_schema_input_schema=core_schema.set_schema(
+                core_schema.int_schema()),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda review_ids: review_ids.array.tolist()))
+
+
+class ReviewEntityIndex:
+    """Inverted index mapping review IDs to the (entity, sentiment) pairs assigned to them.
+
+    Every mention is packed into a single uint64 key (review id, entity code, sentiment), kept
+    sorted, so the mentions of a review are a contiguous range found by binary search.
+    Mentions are appended incrementally and deduplicated when the index is next queried.
+    """
+
+    def __init__(self) -> None:
+        self.entities: List[str] = []
+        self.entity_codes: Dict[str, int] = {}
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._pending: List[np.ndarray] = []
+
+    @classmethod
+    def build(cls, report: "AggregatedResults") -> "ReviewEntityIndex":
+        """Indexes all the mentions of a report."""
+        index = cls()
+        for entity, sentiment_map in report.items():
+            for sentiment_key, review_ids in sentiment_map.items():
+                index.add(entity, sentiment_key, review_ids)
+        return index
+
+    def add(self, entity: str, sentiment_key: str,
+            review_ids: Iterable[int]) -> None:
+        """Adds mentions of an entity, with one of `SENTIMENT_KEYS`.
+
+        The response schema allows other sentiment keys (e.g. "neutral_review_ids"), their
+        mentions are not indexed.
+        """
+        if sentiment_key not in SENTIMENT_KEYS:
+            return
+        if entity not in self.entity_codes:
+            self.entity_codes[entity] = len(self.entities)
+            self.entities.append(entity)
+        review_ids = ReviewIdSet._to_array(review_ids).astype(np.uint64)
+        if review_ids.size:
+            self._pending.append((review_ids << np.uint64(32)) |
+                                 np.uint64(self.entity_codes[entity] << 1 |
+                                           SENTIMENT_KEYS.index(sentiment_key)))
+
+    @property
+    def keys(self) -> np.ndarray:
+        """Sorted unique mention keys."""
+        if self._pending:
+            self._keys = np.unique(np.concatenate([self._keys, *self._pending]))
+            self._pending = []
+        return self._keys
+
+    @staticmethod
+    def decode(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Unpacks mention keys.
+
+        Args:
+            keys (np.ndarray): uint64 mention keys, e.g. `keys`.
+
+        Returns:
+            review_ids (np.ndarray): review ID of every mention.
+            entity_codes (np.ndarray): index of the entity of every mention in `entities`.
+            sentiment_codes (np.ndarray): index of the sentiment of every mention in `SENTIMENT_KEYS`.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        return ((keys >> np.uint64(32)).astype(np.int64),
+                ((keys >> np.uint64(1)) & np.uint64(0x7FFFFFFF)).astype(
+                    np.int64), (keys & np.uint64(1)).astype(np.int64))
+
+    def get_mentions(self, review_id: int) -> List[Tuple[str, str]]:
+        """Returns the (entity, sentiment) pairs of a review, sentiment being "positive" or "negative"."""
+        keys = self.keys
+        start, end = np.searchsorted(
+            keys,
+            np.array([review_id, review_id + 1], dtype=np.uint64) <<
+            np.uint64(32))
+        _, entity_codes, sentiment_codes = self.decode(keys[start:end])
+        return [(self.entities[int(entity_code)],
+                 SENTIMENT_KEYS[int(sentiment_code)].split("_")[0])
+                for entity_code, sentiment_code in zip(entity_codes,
+                                                       sentiment_codes)]
+
+    def mentioned_review_ids(self) -> np.ndarray:
+        """Returns the sorted IDs of the reviews with at least one entity."""
+        return np.unique(self.keys >> np.uint64(32))
+
+
+class FailedBatch(BaseModel):
+    """Details of a batch that could not be processed after all retries (dead-letter entry).
+
+    Attributes:
+        batch_num (int): 1-based number of the batch in the original run.
+        review_ids (List[int]): IDs of the reviews contained in the batch.
+        error (str): Last error raised while processing the batch.
+        attempts (int): Total number of LLM calls made for the batch.
+    """
+    batch_num: int
+    review_ids: List[int]
+    error: str
+    attempts: int
 
 
 class AggregatedResults(BaseModel):
@@ -17,52 +233,147 @@ class AggregatedResults(BaseModel):
             - "negative_review_ids": a set of review IDs expressing negative sentiment.
     """
     entity_sentiment_map: Dict[str, Dict[str,
-                                         Set[int]]] = Field(description=("""
+                                         ReviewIdSet]] = Field(description=("""
             Structured output format mapping each entity name (string) to its sentiment-based review IDs.
             Each entity maps to a dictionary with two keys: 'positive_review_ids' and 'negative_review_ids',
             each containing a set of integers representing associated review IDs.
             """))
     batch_size: Optional[int] = None
     last_batch_idx: Optional[int] = None
+    # checkpoint of token-budget batching, not part of the schema requested from the LLM
+    next_review_idx: SkipJsonSchema[Optional[int]] = None
+    last_batch_num: SkipJsonSchema[Optional[int]] = None
+    # dead-letter list, not part of the schema requested from the LLM
+    failed_batches: SkipJsonSchema[List[FailedBatch]] = Field(
+        default_factory=list)
+
+    # inverted index, built on first use and then updated incrementally
+    _review_index: Optional[ReviewEntityIndex] = PrivateAttr(default=None)
+
+    @property
+    def review_index(self) -> ReviewEntityIndex:
+        """Inverted review id -> (entity, sentiment) index of the report."""
+        if self._review_index is None:
+            self._review_index = ReviewEntityIndex.build(self)
+        return self._review_index
 
     @property
     def existing_entities(self) -> List[str]:
         return list(self.entity_sentiment_map.keys())
 
-    def update(self, model_response: "AggregatedResults",
-               batch_idx: int) -> None:
+    def resume_position(self) -> Tuple[int, int]:
+        """Returns where to resume processing from the checkpoint.
+
+        Reports saved before token-budget batching only have `last_batch_idx` (start index
+        of the last batch of `batch_size` reviews), the position is derived from it.
+
+        Returns:
+            next_review_idx (int): position of the first review not processed yet.
+            last_batch_num (int): number of the last processed batch (0 if none).
+        """
+        if self.next_review_idx is not None:
+            return self.next_review_idx, self.last_batch_num or 0
+        if self.last_batch_idx is not None and self.batch_size:
+            return (self.last_batch_idx + self.batch_size,
+                    self.last_batch_idx // self.batch_size + 1)
+        return 0, 0
+
+    def update(self,
+               model_response: "AggregatedResults",
+               batch_idx: Optional[int] = None) -> None:
         """Merges the contents of a validated model response into the current AggregatedResults instance.
 
         Args:
             model_response (AggregatedResults): The validated model output.
-            batch_idx (int): index of the processed batch.
+            batch_idx (int, optional): index of the processed batch. The checkpoint is left
+                untouched if None (e.g. when re-running a failed batch).
 
         Returns:
             None
         """
-        self.last_batch_idx = batch_idx
+        if batch_idx is not None:
+            self.last_batch_idx = batch_idx
         for entity_name, sentiment_map in model_response.items():
+            if self._review_index is not None:
+                for sentiment_key, review_ids in sentiment_map.items():
+                    self._review_index.add(entity_name, sentiment_key,
+                                           review_ids)
             if entity_name not in self.entity_sentiment_map:
                 self.entity_sentiment_map[entity_name] = sentiment_map
             else:
-                if "positive_review_ids" in sentiment_map:
-                    self.entity_sentiment_map[entity_name][
-                        "positive_review_ids"].update(
-                            sentiment_map["positive_review_ids"])
-                if "negative_review_ids" in sentiment_map:
-                    self.entity_sentiment_map[entity_name][
-                        "negative_review_ids"].update(
-                            sentiment_map["negative_review_ids"])
+                for sentiment_key in SENTIMENT_KEYS:
+                    if sentiment_key in sentiment_map:
+                        self.entity_sentiment_map[entity_name].setdefault(
+                            sentiment_key,
+                            ReviewIdSet()).update(sentiment_map[sentiment_key])
         return
 
-    def __getitem__(self, key: str) -> Dict[str, Set[int]]:
+    def to_binary(self) -> bytes:
+        """Serializes the report to a compressed numpy archive (`.npz`).
+
+        Review IDs of all entities are stored as one concatenated uint32 array per sentiment
+        with offsets, the remaining fields as a JSON header. Loading it skips the parsing
+        and validation of millions of JSON integers.
+
+        Returns:
+            (bytes): content of the archive.
+        """
+        entities = self.existing_entities
+        arrays: Dict[str, Any] = {}
+        for sentiment_key in SENTIMENT_KEYS:
+            review_ids = [
+                self.entity_sentiment_map[entity].get(sentiment_key,
+                                                      ReviewIdSet()).array
+                for entity in entities
+            ]
+            arrays[sentiment_key] = np.concatenate(
+                review_ids) if review_ids else np.empty(0, ReviewIdSet.dtype)
+            arrays[f"{sentiment_key}_offsets"] = np.cumsum(
+                [0] + [len(ids) for ids in review_ids], dtype=np.int64)
+        header = self.model_dump(mode="json", exclude={"entity_sentiment_map"})
+        header["entities"] = entities
+        arrays["header"] = np.array(json.dumps(header))
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_binary(cls, content: bytes) -> "AggregatedResults":
+        """Loads a report serialized with `to_binary`.
+
+        Args:
+            content (bytes): content of the archive.
+
+        Returns:
+            report (AggregatedResults): the loaded report.
+        """
+        with np.load(io.BytesIO(content)) as archive:
+            header = json.loads(archive["header"].item())
+            entities = header.pop("entities")
+            entity_sentiment_map: Dict[str, Dict[str, ReviewIdSet]] = {
+                entity: {} for entity in entities
+            }
+            for sentiment_key in SENTIMENT_KEYS:
+                review_ids = archive[sentiment_key]
+                offsets = archive[f"{sentiment_key}_offsets"]
+                for i, entity in enumerate(entities):
+                    entity_sentiment_map[entity][
+                        sentiment_key] = ReviewIdSet.from_sorted_array(
+                            review_ids[offsets[i]:offsets[i + 1]])
+        report = cls.model_validate(header | {"entity_sentiment_map": {}})
+        report.entity_sentiment_map = entity_sentiment_map
+        return report
+
+    def __getitem__(self, key: str) -> Dict[str, ReviewIdSet]:
         return self.entity_sentiment_map[key]
 
-    def __setitem__(self, key: str, value: Dict[str, Set[int]]) -> None:
+    def __setitem__(self, key: str, value: Dict[str, ReviewIdSet]) -> None:
         self.entity_sentiment_map[key] = value
+        self._review_index = None
 
     def __delitem__(self, key: str) -> None:
         del self.entity_sentiment_map[key]
+        self._review_index = None
 
     def __iter__(self) -> Iterator[str]:
         return iter(self.entity_sentiment_map)
@@ -73,8 +384,54 @@ class AggregatedResults(BaseModel):
     def keys(self) -> Iterator[str]:
         return iter(self.entity_sentiment_map.keys())
 
-    def values(self) -> Iterator[Dict[str, Set[int]]]:
+    def values(self) -> Iterator[Dict[str, ReviewIdSet]]:
         return iter(self.entity_sentiment_map.values())
 
-    def items(self) -> Iterator[Tuple[str, Dict[str, Set[int]]]]:
+    def items(self) -> Iterator[Tuple[str, Dict[str, ReviewIdSet]]]:
         return iter(self.entity_sentiment_map.items())
+
+
+class JournalEntry(BaseModel):
+    """Change of the aggregated results caused by one processed batch.
+
+    Entries are appended to the report journal and replayed on top of the last snapshot,
+    applying an entry more than once leaves the report unchanged.
+
+    Attributes:
+        batch_num (int): 1-based number of the batch.
+        response (AggregatedResults, optional): validated model output merged into the report.
+        batch_idx (int, optional): start index of the batch, the new `last_batch_idx`.
+        next_review_idx (int, optional): position of the first review after the batch.
+        failed_batch (FailedBatch, optional): dead-letter entry added (or updated) for the batch.
+        resolved (bool): whether the batch was removed from the dead-letter list.
+    """
+    batch_num: int
+    response: Optional[AggregatedResults] = None
+    batch_idx: Optional[int] = None
+    next_review_idx: Optional[int] = None
+    failed_batch: Optional[FailedBatch] = None
+    resolved: bool = False
+
+    def apply(self, report: AggregatedResults) -> None:
+        """Applies the change to a report.
+
+        Args:
+            report (AggregatedResults): report to be updated in place.
+
+        Returns:
+            None
+        """
+        if self.response is not None:
+            report.update(self.response, self.batch_idx)
+        elif self.batch_idx is not None:
+            report.last_batch_idx = self.batch_idx
+        if self.next_review_idx is not None:
+            report.next_review_idx = self.next_review_idx
+            report.last_batch_num = self.batch_num
+        if self.failed_batch is not None or self.resolved:
+            report.failed_batches = [
+                failed_batch for failed_batch in report.failed_batches
+                if failed_batch.batch_num != self.batch_num
+            ]
+        if self.failed_batch is not None:
+            report.failed_batches.append(self.failed_batch)
@@ -1,15 +1,32 @@
-"""This file contains code to debug a particular batch output."""
+"""This file contains code to debug batch outputs by replaying saved batch logs.
+
+A single batch log can be replayed and inspected, or a whole set of batch logs (e.g. after a
+prompt or model change) can be replayed concurrently under the rate limit. The replayed
+outputs are then compared with the saved ones in a diff report.
+"""
 
 import argparse
+import collections
+from concurrent import futures
+import glob
 import json
 import os
 import pprint
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from dotenv import load_dotenv
-import langchain_google_genai
+import pandas as pd
 
+from src import prompts
 from utils import analyzer_utils
+from utils import batch_logs
+from utils import batching
 from utils import constants
+from utils import data_models
+from utils import llm_backends
+from utils import rate_limiter
 
 load_dotenv()
 
@@ -17,34 +34,34 @@ load_dotenv()
 logger = analyzer_utils.Logger("Review Analyzer").get_logger()
 
 
-def debug_batch(file_path: str,
-                llm: langchain_google_genai.ChatGoogleGenerativeAI) -> None:
+def debug_batch(file_path: str, llm: llm_backends.LLMBackend) -> None:
     """Debug a batch by loading input from saved log and the regenerating output.
 
     Args:
         file_path (str): path to saved batch log (json file)
+        llm (LLMBackend): LLM the saved input is sent to.
     Returns:
         None
     """
-    with open(file_path, "r") as f:
-        debug_data = json.load(f)
+    debug_data = batch_logs.load_batch_log(file_path)
 
     logger.info(f"\nFetching saved input and output from {file_path}...")
     input_prompt = debug_data["query"]
-    saved_output = debug_data.get("response")
-
-    saved_output = json.loads(saved_output)
-    logger.info("\n📄 Saved Output:")
-    pprint.pprint(saved_output['entity_sentiment_map'])
-    logger.info(
-        f"Entities in Saved output: {list(saved_output['entity_sentiment_map'].keys())}"
-    )
+    if debug_data.get("error") is not None:
+        logger.info(f"\n❌ Saved Error: {debug_data['error']}")
+        logger.info(f"Saved raw output: {debug_data['response']}")
+    else:
+        saved_output = json.loads(debug_data["response"])
+        logger.info("\n📄 Saved Output:")
+        pprint.pprint(saved_output['entity_sentiment_map'])
+        logger.info(
+            f"Entities in Saved output: {list(saved_output['entity_sentiment_map'].keys())}"
+        )
 
     logger.info("\nRunning LLM on saved input...")
-    regenerated_output = llm.invoke(input_prompt)
     try:
         regenerated_output = json.loads(
-            regenerated_output.content.strip("```json"))
+            prompts.parse_response(llm.invoke(input_prompt)).model_dump_json())
     except Exception as e:
         logger.error(f"Error parsing generated output : {e}")
         raise
@@ -55,24 +72,283 @@ def debug_batch(file_path: str,
     )
 
 
+def get_mentions(
+        response: data_models.AggregatedResults) -> Set[Tuple[str, str, int]]:
+    """Returns the (entity, sentiment key, review id) mentions of a batch output."""
+    return {(entity, sentiment_key, review_id)
+            for entity, sentiment_map in response.items()
+            for sentiment_key, review_ids in sentiment_map.items()
+            for review_id in review_ids}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    """Jaccard similarity of two sets, 1 if both are empty."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def diff_outputs(saved: data_models.AggregatedResults,
+                 replayed: data_models.AggregatedResults) -> Dict[str, Any]:
+    """Compares the saved and replayed outputs of a batch.
+
+    Args:
+        saved (AggregatedResults): output saved in the batch log.
+        replayed (AggregatedResults): output of the replayed LLM call.
+
+    Returns:
+        diff (Dict[str, Any]): entity counts, added and removed entities, and the Jaccard
+            similarity of the entity sets and of the (entity, sentiment, review) mentions.
+    """
+    saved_entities, replayed_entities = set(saved.keys()), set(replayed.keys())
+    return {
+        "saved_entities": len(saved_entities),
+        "replayed_entities": len(replayed_entities),
+        "added_entities": sorted(replayed_entities - saved_entities),
+        "removed_entities": sorted(saved_entities - replayed_entities),
+        "entity_jaccard": jaccard(saved_entities, replayed_entities),
+        "mention_jaccard": jaccard(get_mentions(saved), get_mentions(replayed)),
+    }
+
+
+def invoke_with_retries(llm: llm_backends.LLMBackend, prompt: str,
+                        limiter: rate_limiter.RateLimiter,
+                        num_tokens: int) -> Tuple[str, float]:
+    """Makes a rate-limited LLM call, retried like the analyzer (see `rate_limiter.retry_with_backoff`).
+
+    Args:
+        llm (LLMBackend): LLM the prompt is sent to.
+        prompt (str): formatted prompt.
+        limiter (RateLimiter): rate limiter shared by the replayed batches.
+        num_tokens (int): estimated tokens of the prompt.
+
+    Returns:
+        raw_response (str): text returned by the LLM.
+        latency (float): duration of the successful call in seconds.
+    """
+
+    def invoke() -> Tuple[str, float]:
+        limiter.acquire(num_tokens)
+        t1 = time.perf_counter()
+        raw_response = limiter.invoke(lambda: llm.invoke(prompt))
+        return raw_response, time.perf_counter() - t1
+
+    return rate_limiter.retry_with_backoff(invoke)[0]
+
+
+def replay_batch(file_path: str, llm: llm_backends.LLMBackend,
+                 limiter: rate_limiter.RateLimiter,
+                 estimate_tokens: Callable[[str], int]) -> Dict[str, Any]:
+    """Replays a saved batch log and compares the new output with the saved one.
+
+    Args:
+        file_path (str): path to saved batch log (json file).
+        llm (LLMBackend): LLM the saved input is sent to.
+        limiter (RateLimiter): rate limiter shared by the replayed batches.
+        estimate_tokens (Callable[[str], int]): token estimator of the rate limited prompts.
+
+    Returns:
+        row (Dict[str, Any]): diff of the outputs (see `diff_outputs`) and latencies (seconds),
+            or the error if the batch could not be replayed or parsed. Logs of failed calls
+            have no saved output to compare with, only their saved error is reported.
+    """
+    row: Dict[str, Any] = {"batch": os.path.basename(file_path)}
+    try:
+        debug_data = batch_logs.load_batch_log(file_path)
+        row["saved_latency"] = debug_data.get("latency_seconds")
+        row["saved_error"] = debug_data.get("error")
+        raw_response, row["replay_latency"] = invoke_with_retries(
+            llm,
+            debug_data["query"],
+            limiter,
+            num_tokens=estimate_tokens(debug_data["query"]))
+        replayed = prompts.parse_response(raw_response)
+        if row["saved_error"] is None:
+            row.update(
+                diff_outputs(prompts.parse_response(debug_data["response"]),
+                             replayed))
+        else:
+            row["replayed_entities"] = len(replayed)
+    except Exception as e:
+        logger.error(f"Error replaying {file_path}: {e}")
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def get_batch_num(file_path: str) -> Tuple[int, str]:
+    """Sort key of batch logs, `batch_<num>.json.gz` (or `.json`) in batch order."""
+    match = re.search(r"(\d+)", os.path.basename(file_path))
+    return (int(match.group(1)) if match else -1, file_path)
+
+
+def replay_batches(file_paths: List[str],
+                   llm: llm_backends.LLMBackend,
+                   limiter: rate_limiter.RateLimiter,
+                   max_concurrent_batches: int = 1) -> pd.DataFrame:
+    """Replays saved batch logs concurrently.
+
+    Args:
+        file_paths (List[str]): paths to saved batch logs.
+        llm (LLMBackend): LLM the saved inputs are sent to.
+        limiter (RateLimiter): rate limiter of the LLM calls.
+        max_concurrent_batches (int): number of LLM calls in flight at once.
+
+    Returns:
+        diffs (pd.DataFrame): one row per batch log (see `replay_batch`), in batch order.
+    """
+    estimate_tokens = batching.get_token_estimator(constants.token_estimator)
+    with futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_batches) as executor:
+        rows = list(
+            executor.map(
+                lambda file_path: replay_batch(file_path, llm, limiter,
+                                               estimate_tokens),
+                sorted(file_paths, key=get_batch_num)))
+    diffs = pd.DataFrame(rows)
+    for column in ("error", "saved_error", "saved_latency", "replay_latency"):
+        if column not in diffs:
+            diffs[column] = None
+    for column in ("saved_entities", "replayed_entities"):
+        if column in diffs:
+            diffs[column] = diffs[column].astype("Int64")
+    diffs["latency_delta"] = (diffs["replay_latency"].astype(float) -
+                              diffs["saved_latency"].astype(float))
+    return diffs
+
+
+def summarize_replays(diffs: pd.DataFrame, top_k: int = 10) -> Dict[str, Any]:
+    """Summarizes the diffs of a replayed corpus of batches.
+
+    Args:
+        diffs (pd.DataFrame): output of `replay_batches`.
+        top_k (int): number of most frequently added / removed entities reported.
+
+    Returns:
+        summary (Dict[str, Any]): error counts (replay and saved), distribution of the Jaccard similarities and
+            latencies (seconds), and the entities most often added or removed by the replay.
+    """
+    replayed = diffs[diffs["error"].isna()]
+
+    def describe(column: str) -> Dict[str, Optional[float]]:
+        values = replayed.get(column,
+                              pd.Series(dtype=float)).astype(float).dropna()
+        if values.empty:
+            return {}
+        return {
+            "mean": float(values.mean()),
+            "median": float(values.median()),
+            "p95": float(values.quantile(0.95)),
+            "min": float(values.min()),
+            "max": float(values.max()),
+        }
+
+    added: collections.Counter = collections.Counter()
+    removed: collections.Counter = collections.Counter()
+    for entities in replayed.get("added_entities", pd.Series()).dropna():
+        added.update(entities)
+    for entities in replayed.get("removed_entities", pd.Series()).dropna():
+        removed.update(entities)
+    entity_jaccard = replayed.get("entity_jaccard", pd.Series(dtype=float))
+    return {
+        "batches": len(diffs),
+        "errors": int(diffs["error"].notna().sum()),
+        "saved_errors": int(diffs["saved_error"].notna().sum()),
+        "identical_entity_sets": int((entity_jaccard == 1).sum()),
+        "entity_jaccard": describe("entity_jaccard"),
+        "mention_jaccard": describe("mention_jaccard"),
+        "saved_latency": describe("saved_latency"),
+        "replay_latency": describe("replay_latency"),
+        "latency_delta": describe("latency_delta"),
+        "most_added_entities": added.most_common(top_k),
+        "most_removed_entities": removed.most_common(top_k),
+    }
+
+
+def write_replay_report(report_path: str, diffs: pd.DataFrame,
+                        summary: Dict[str, Any]) -> None:
+    """Saves the summary and the per-batch diffs of a replay to a JSON file.
+
+    Args:
+        report_path (str): path to the diff report.
+        diffs (pd.DataFrame): output of `replay_batches`.
+        summary (Dict[str, Any]): output of `summarize_replays`.
+
+    Returns:
+        None
+    """
+    # NaN is not valid json
+    batches = json.loads(diffs.to_json(orient="records"))
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({"summary": summary, "batches": batches}, f, indent=4)
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Debug LLM output using a saved batch JSON file.")
-    parser.add_argument(
+        description="Debug LLM output using saved batch JSON files.")
+    log_group = parser.add_mutually_exclusive_group(required=True)
+    log_group.add_argument(
         "--log_path",
         type=str,
-        required=True,
         help=
         "Path to the JSON file containing logged data for a particular batch.")
+    log_group.add_argument(
+        "--log_glob",
+        type=str,
+        help=
+        "Glob of batch logs replayed concurrently, e.g. 'results/laptop/exp1/logs/batch_*.json*'."
+    )
+    parser.add_argument("--max_concurrent_batches",
+                        type=int,
+                        default=constants.max_concurrent_batches)
+    parser.add_argument(
+        "--report_path",
+        type=str,
+        default=None,
+        help=
+        "Path to the diff report, `replay_report.json` next to the logs directory by default."
+    )
+    parser.add_argument("--llm_backend",
+                        type=str,
+                        default=constants.llm_backend,
+                        help="see `llm_backends.llm_backends`")
     args = parser.parse_args()
 
-    file_path = args.log_path
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
+    llm = llm_backends.get_llm_backend(
+        args.llm_backend,
+        **constants.llm_backend_options.get(args.llm_backend, {}))
+
+    if args.log_path is not None:
+        if not os.path.exists(args.log_path):
+            raise FileNotFoundError(f"File not found: {args.log_path}")
+        debug_batch(args.log_path, llm)
+        return
 
-    llm = langchain_google_genai.ChatGoogleGenerativeAI(model=constants.model)
+    file_paths = glob.glob(args.log_glob, recursive=True)
+    if not file_paths:
+        raise FileNotFoundError(f"No batch log matches: {args.log_glob}")
+    logger.info(f"Replaying {len(file_paths)} batch log(s)...")
+    limiter = rate_limiter.RateLimiter(
+        requests_per_minute=constants.requests_per_minute,
+        tokens_per_minute=constants.tokens_per_minute)
+    diffs = replay_batches(file_paths,
+                           llm,
+                           limiter,
+                           max_concurrent_batches=args.max_concurrent_batches)
+    summary = summarize_replays(diffs)
+    report_path = args.report_path or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(file_paths[0]))),
+        "replay_report.json")
+    write_replay_report(report_path, diffs, summary)
 
-    debug_batch(file_path, llm)
+    print("=" * 100)
+    pprint.pprint(summary, sort_dicts=False)
+    print(
+        diffs.nsmallest(10, "entity_jaccard").to_string(
+            index=False) if "entity_jaccard" in
+        diffs else "No batch could be replayed.")
+    print("=" * 100)
+    logger.info(f"Diff report saved to {report_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+"""This file contains strategies selecting the entity memory injected into the user prompt."""
+
+import collections
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils import batching
+from utils import data_models
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a text into lowercase word tokens, with naive plural folding."""
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return [
+        token[:-1] if len(token) > 3 and token.endswith("s") else token
+        for token in tokens
+    ]
+
+
+def count_mentions(report: data_models.AggregatedResults) -> Dict[str, int]:
+    """Returns the number of reviews assigned to each entity.
+
+    The response schema lets the LLM leave out a sentiment key, missing keys count as empty.
+    """
+    return {
+        entity: sum(
+            len(sentiment_map.get(sentiment_key, ()))
+            for sentiment_key in data_models.SENTIMENT_KEYS)
+        for entity, sentiment_map in report.items()
+    }
+
+
+class MemorySelector:
+    """Selects a budgeted subset of the existing entities for the user prompt.
+
+    Subclasses rank the entities, the selector then keeps the best ranked entities that fit
+    in `token_budget` tokens (and `max_entities`), in their original order.
+    """
+
+    def __init__(self,
+                 estimate_tokens: batching.TokenEstimator,
+                 token_budget: int = 1500,
+                 max_entities: Optional[int] = None):
+        """MemorySelector parameters initialization.
+
+        Args:
+            estimate_tokens (TokenEstimator): function estimating the number of tokens in a text.
+            token_budget (int): maximum number of (estimated) tokens of the injected entities.
+            max_entities (int, optional): maximum number of injected entities.
+        """
+        self.estimate_tokens = estimate_tokens
+        self.token_budget = token_budget
+        self.max_entities = max_entities
+
+    def rank(self, report: data_models.AggregatedResults,
+             batch_reviews: List[Tuple[int, str]]) -> List[str]:
+        """Returns the existing entities, most relevant first."""
+        raise NotImplementedError
+
+    def select(self, report: data_models.AggregatedResults,
+               batch_reviews: List[Tuple[int, str]]) -> List[str]:
+        """Selects the entities injected into the user prompt of a batch.
+
+        Args:
+            report (AggregatedResults): aggregated results so far.
+            batch_reviews (List[Tuple[int, str]]): reviews of the current batch.
+
+        Returns:
+            selected_entities (List[str]): selected entities, in the order of `report.existing_entities`.
+        """
+        existing_entities = report.existing_entities
+        if self.estimate_tokens(
+                str(existing_entities)) <= self.token_budget and (
+                    self.max_entities is None or
+                    len(existing_entities) <= self.max_entities):
+            return existing_entities
+
+        selected: Set[str] = set()
+        used_tokens = 0
+        for entity in self.rank(report, batch_reviews):
+            if self.max_entities is not None and len(
+                    selected) >= self.max_entities:
+                break
+            # quotes, comma and space around each entity in the list
+            entity_tokens = self.estimate_tokens(f"'{entity}', ")
+            if used_tokens + entity_tokens > self.token_budget:
+                break
+            selected.add(entity)
+            used_tokens += entity_tokens
+        return [entity for entity in existing_entities if entity in selected]
+
+
+class AllEntitiesSelector(MemorySelector):
+    """Injects every existing entity (unbounded memory)."""
+
+    def select(self, report: data_models.AggregatedResults,
+               batch_reviews: List[Tuple[int, str]]) -> List[str]:
+        return report.existing_entities
+
+
+class TopKMentionSelector(MemorySelector):
+    """Ranks entities by their number of mentions."""
+
+    def rank(self, report: data_models.AggregatedResults,
+             batch_reviews: List[Tuple[int, str]]) -> List[str]:
+        mentions = count_mentions(report)
+        return sorted(mentions, key=lambda entity: -mentions[entity])
+
+
+class RecencySelector(MemorySelector):
+    """Ranks entities by their most recent mention.
+
+    Reviews are processed in order of their IDs, so the highest review ID assigned to an
+    entity marks its latest mention.
+    """
+
+    def rank(self, report: data_models.AggregatedResults,
+             batch_reviews: List[Tuple[int, str]]) -> List[str]:
+        last_mention = {
+            entity: max((int(review_ids.array[-1])
+                         for review_ids in sentiment_map.values()
+                         if review_ids),
+                        default=-1) for entity, sentiment_map in report.items()
+        }
+        return sorted(last_mention, key=lambda entity: -last_mention[entity])
+
+
+class LexicalSimilaritySelector(MemorySelector):
+    """Ranks entities by BM25 similarity of their names to the reviews of the batch.
+
+    The BM25 index over entity names is built incrementally as new entities appear. Entities
+    without any lexical overlap with the batch are ranked by their number of mentions.
+    """
+
+    def __init__(self, *args, k1: float = 1.2, b: float = 0.75, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.k1 = k1
+        self.b = b
+        self.entity_tokens: Dict[str, collections.Counter] = {}
+        self.postings: Dict[str, List[str]] = collections.defaultdict(list)
+        self.total_length = 0
+
+    def index_entities(self, entities: List[str]) -> None:
+        """Adds entities that are not indexed yet to the BM25 index."""
+        for entity in entities:
+            if entity in self.entity_tokens:
+                continue
+            term_counts = collections.Counter(tokenize(entity))
+            self.entity_tokens[entity] = term_counts
+            self.total_length += sum(term_counts.values())
+            for term in term_counts:
+                self.postings[term].append(entity)
+
+    def scores(self, query_terms: collections.Counter) -> Dict[str, float]:
+        """Returns BM25 scores of the indexed entities matching at least one query term."""
+        num_entities = len(self.entity_tokens)
+        average_length = self.total_length / max(num_entities, 1)
+        scores: Dict[str, float] = collections.defaultdict(float)
+        for term, query_count in query_terms.items():
+            matching_entities = self.postings.get(term)
+            if not matching_entities:
+                continue
+            idf = math.log(1 + (num_entities - len(matching_entities) + 0.5) /
+                           (len(matching_entities) + 0.5))
+            for entity in matching_entities:
+                term_counts = self.entity_tokens[entity]
+                term_frequency = term_counts[term]
+                length_norm = 1 - self.b + self.b * sum(
+                    term_counts.values()) / average_length
+                saturation = term_frequency * (self.k1 + 1) / (
+                    term_frequency + self.k1 * length_norm)
+                scores[entity] += query_count * idf * saturation
+        return scores
+
+    def rank(self, report: data_models.AggregatedResults,
+             batch_reviews: List[Tuple[int, str]]) -> List[str]:
+        self.index_entities(report.existing_entities)
+        query_terms = collections.Counter(
+            term for _, review in batch_reviews for term in tokenize(review))
+        scores = self.scores(query_terms)
+        mentions = count_mentions(report)
+        return sorted(mentions,
+                      key=lambda entity:
+                      (-scores.get(entity, 0.0), -mentions[entity]))
+
+
+memory_selectors = {
+    "all": AllEntitiesSelector,
+    "top_k": TopKMentionSelector,
+    "recency": RecencySelector,
+    "similarity": LexicalSimilaritySelector,
+}
+
+
+def get_memory_selector(name: str,
+                        estimate_tokens: batching.TokenEstimator,
+                        token_budget: int = 1500,
+                        max_entities: Optional[int] = None) -> MemorySelector:
+    """Creates a registered entity memory selector.
+
+    Args:
+        name (str): name of the selection strategy, one of `memory_selectors`.
+        estimate_tokens (TokenEstimator): function estimating the number of tokens in a text.
+        token_budget (int): maximum number of (estimated) tokens of the injected entities.
+        max_entities (int, optional): maximum number of injected entities.
+
+    Returns:
+        (MemorySelector): the selector.
+    """
+    if name not in memory_selectors:
+        raise ValueError(
+            f"Unknown entity memory strategy : {name}, available strategies: {list(memory_selectors)}"
+        )
+    return memory_selectors[name](estimate_tokens=estimate_tokens,
+                                  token_budget=token_budget,
+                                  max_entities=max_entities)
@@ -0,0 +1,195 @@
+"""This file contains the LLM backends the analyzer sends its prompts to.
+
+A backend takes a formatted prompt and returns the raw text of the response, parsing and
+validation are left to the analyzer. Besides Gemini, a deterministic offline backend answers
+from a keyword heuristic, so that the pipeline can be run and benchmarked without an API key.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Tuple, Type
+
+from dotenv import load_dotenv
+import langchain_google_genai
+
+from utils import data_models
+from utils import entity_memory
+
+# load env variables
+load_dotenv()
+
+# Aspect keywords (tokenized, see `entity_memory.tokenize`) and the entity they are mapped to
+MOCK_ASPECTS = {
+    "battery": "Battery Life",
+    "screen": "Display",
+    "display": "Display",
+    "keyboard": "Keyboard",
+    "price": "Price",
+    "cost": "Price",
+    "performance": "Performance",
+    "speed": "Performance",
+    "service": "Service",
+    "staff": "Service",
+    "waiter": "Service",
+    "food": "Food Quality",
+    "dish": "Food Quality",
+    "menu": "Menu",
+    "ambience": "Ambience",
+    "app": "App Stability",
+    "crash": "App Stability",
+    "ads": "Advertisements",
+    "playlist": "Playlists",
+    "music": "Music Library",
+    "song": "Music Library",
+    "delivery": "Delivery",
+    "shipping": "Delivery",
+    "size": "Fit",
+    "fit": "Fit",
+    "strap": "Strap",
+    "quality": "Build Quality",
+}
+MOCK_POSITIVE_WORDS = frozenset({
+    "good", "great", "excellent", "love", "amazing", "fast", "perfect", "nice",
+    "best", "awesome", "friendly", "delicious", "comfortable", "recommend"
+})
+MOCK_NEGATIVE_WORDS = frozenset({
+    "bad", "poor", "terrible", "hate", "slow", "awful", "worst", "broken",
+    "expensive", "rude", "bland", "annoying", "crash", "disappointed"
+})
+# Reviews formatted by `ReviewAnalyzer.format_reviews`, after the few-shot examples
+MOCK_REVIEW_PATTERN = re.compile(r"^\s*review-(\d+) : (.*)$", re.MULTILINE)
+MOCK_USER_PROMPT_MARKER = "from the new set of reviews:"
+
+
+class MockLLMError(RuntimeError):
+    """Error injected by the mock backend."""
+
+
+class LLMBackend:
+    """Sends a prompt to an LLM and returns the raw text of the response."""
+
+    # identifies the responses of the backend in the response cache
+    model_name: str = ""
+
+    def invoke(self, prompt: str) -> str:
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini chat model."""
+
+    def __init__(self, model: str = "gemini-2.0-flash"):
+        self.model_name = model
+        self.llm = langchain_google_genai.ChatGoogleGenerativeAI(model=model)
+
+    def invoke(self, prompt: str) -> str:
+        return str(self.llm.invoke(prompt).content)
+
+
+class MockBackend(LLMBackend):
+    """Offline stand-in for an LLM, answering schema-valid `AggregatedResults` json.
+
+    Every review of the batch is assigned the entities of the aspect keywords it contains, with
+    the sentiment given by its counts of positive and negative words (reviews without aspect
+    keywords or with a neutral score get no entity). Responses depend only on the prompt, the
+    seed and the number of previous calls with the same prompt, so runs are reproducible
+    whatever the concurrency, and retried calls may succeed.
+    """
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 seed: int = 0):
+        """MockBackend parameters initialization.
+
+        Args:
+            latency (float): mean duration of a call in seconds.
+            latency_jitter (float): relative variation of the duration, uniform in
+                `latency * (1 +/- latency_jitter)`.
+            error_rate (float): probability that a call raises a `MockLLMError`.
+            rate_limit_rate (float): probability that a call raises a 429 quota error.
+            seed (int): random seed.
+        """
+        self.model_name = "mock"
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.attempts: Dict[str, int] = {}
+
+    def make_rng(self, prompt: str) -> random.Random:
+        """Returns the random generator of a call, seeded by the prompt and its attempt number."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self.lock:
+            attempt = self.attempts.get(digest, 0)
+            self.attempts[digest] = attempt + 1
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def extract(self, prompt: str) -> data_models.AggregatedResults:
+        """Extracts entities from the reviews of the prompt with the keyword heuristic."""
+        user_prompt = prompt.rsplit(MOCK_USER_PROMPT_MARKER, 1)[-1]
+        mentions: List[Tuple[str, str, int]] = []
+        for review_id, review in MOCK_REVIEW_PATTERN.findall(user_prompt):
+            tokens = entity_memory.tokenize(review)
+            score = sum(token in MOCK_POSITIVE_WORDS for token in tokens) - sum(
+                token in MOCK_NEGATIVE_WORDS for token in tokens)
+            if score == 0:
+                continue
+            sentiment_key = data_models.SENTIMENT_KEYS[0 if score > 0 else 1]
+            for entity in {
+                    MOCK_ASPECTS[token]
+                    for token in tokens
+                    if token in MOCK_ASPECTS
+            }:
+                mentions.append((entity, sentiment_key, int(review_id)))
+
+        entity_sentiment_map: Dict[str, Dict[str, List[int]]] = {}
+        for entity, sentiment_key, review_id in mentions:
+            sentiment_map = entity_sentiment_map.setdefault(
+                entity, {key: [] for key in data_models.SENTIMENT_KEYS})
+            sentiment_map[sentiment_key].append(review_id)
+        return data_models.AggregatedResults.model_validate(
+            {"entity_sentiment_map": entity_sentiment_map})
+
+    def invoke(self, prompt: str) -> str:
+        rng = self.make_rng(prompt)
+        if self.latency > 0:
+            time.sleep(self.latency *
+                       (1 + rng.uniform(-1, 1) * self.latency_jitter))
+        draw = rng.random()
+        if draw < self.rate_limit_rate:
+            raise MockLLMError(
+                "429 Resource has been exhausted (e.g. check quota).")
+        if draw < self.rate_limit_rate + self.error_rate:
+            raise MockLLMError("Injected LLM error")
+        return self.extract(prompt).model_dump_json()
+
+
+llm_backends: Dict[str, Type[LLMBackend]] = {
+    "gemini": GeminiBackend,
+    "mock": MockBackend,
+}
+
+
+def get_llm_backend(name: str, **options) -> LLMBackend:
+    """Creates a registered LLM backend.
+
+    Args:
+        name (str): name of the backend, one of `llm_backends`.
+        **options: keyword arguments of the backend (see `constants.llm_backend_options`).
+
+    Returns:
+        (LLMBackend): the backend.
+    """
+    if name not in llm_backends:
+        raise ValueError(
+            f"Unknown LLM backend : {name}, available backends: {list(llm_backends)}"
+        )
+    return llm_backends[name](**options)
@@ -1,13 +1,16 @@
 """This file contains utility functions for plotting."""
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+import altair as alt
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from utils import analyzer_utils
 from utils import data_models
+from utils import trend_cube
 
 
 #  Entity Frequency (Top Entities)
@@ -73,15 +76,8 @@ def plot_review_length_vs_entities_violin(
         None
     """
     review_lengths = [len(review.split()) for review in reviews]
-    entity_counts = []
-    zero_count = 0
-    for review_id in range(len(reviews)):
-        count = sum(review_id in sentiment_map["positive_review_ids"] or
-                    review_id in sentiment_map["negative_review_ids"]
-                    for sentiment_map in report.values())
-        entity_counts.append(count)
-        if count == 0:
-            zero_count += 1
+    entity_counts = analyzer_utils.count_entities_per_review(
+        report, len(reviews))
 
     # Determine dynamic bins using percentiles
     num_bins = 8
@@ -99,7 +95,9 @@ def plot_review_length_vs_entities_violin(
     df = pd.DataFrame({"Length Bin": bins, "Entity Count": entity_counts})
 
     plt.figure(figsize=(12, 8))
-    sns.violinplot(x="Length Bin", y="Entity Count", data=df, inner="stick")
+    # One stick per review is unreadable (and slow to draw) for large datasets
+    inner = "stick" if len(reviews) <= 1000 else "box"
+    sns.violinplot(x="Length Bin", y="Entity Count", data=df, inner=inner)
     plt.xlabel("Review Length (word bins)")
     plt.ylabel("Number of Entities Mentioned")
     plt.title("Review Length vs. Number of Entities (Violin Plot)")
@@ -108,43 +106,96 @@ def plot_review_length_vs_entities_violin(
 
 
 # Sentiment Intensity Heatmap
+def get_sentiment_scores(report: data_models.AggregatedResults,
+                         min_mentions: int = 1) -> pd.DataFrame:
+    """Computes the normalized sentiment score of every entity.
+
+    Args:
+        report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+           a dictionary containing sets of review IDS corresponnding to each sentiment.
+        min_mentions (int, optional): Entities mentioned in fewer reviews are left out. Defaults to 1.
+
+    Returns:
+        scores (pd.DataFrame): "Entity", "Positive", "Negative", "Mentions" and "Sentiment Score"
+            columns, sorted by decreasing score (and decreasing mentions for equal scores).
+    """
+    entities = report.existing_entities
+    pos_counts = np.array(
+        [len(report[entity]["positive_review_ids"]) for entity in entities],
+        dtype=np.int64)
+    neg_counts = np.array(
+        [len(report[entity]["negative_review_ids"]) for entity in entities],
+        dtype=np.int64)
+    mentions = pos_counts + neg_counts
+    scores = pd.DataFrame({
+        "Entity": entities,
+        "Positive": pos_counts,
+        "Negative": neg_counts,
+        "Mentions": mentions,
+        # Normalized score
+        "Sentiment Score": (pos_counts - neg_counts) / np.maximum(mentions, 1),
+    })
+    scores = scores[scores["Mentions"] >= min_mentions]
+    return scores.sort_values(by=["Sentiment Score", "Mentions"],
+                              ascending=[False, False],
+                              kind="stable").reset_index(drop=True)
+
+
+def select_extreme_entities(scores: pd.DataFrame, top_n: int,
+                            bottom_n: int) -> pd.DataFrame:
+    """Keeps the `top_n` highest and `bottom_n` lowest scored entities of `get_sentiment_scores`.
+
+    Args:
+        scores (pd.DataFrame): sentiment scores, sorted by decreasing score.
+        top_n (int): number of most positive entities.
+        bottom_n (int): number of most negative entities.
+
+    Returns:
+        scores (pd.DataFrame): selected rows, still sorted by decreasing score.
+    """
+    if top_n + bottom_n >= len(scores):
+        return scores
+    return pd.concat([scores.head(top_n), scores.tail(bottom_n)])
+
+
 def plot_sentiment_heatmap(report: data_models.AggregatedResults,
-                           save_path: str = "./sentiment_heatmap.png") -> None:
+                           save_path: str = "./sentiment_heatmap.png",
+                           top_n: int = 25,
+                           bottom_n: int = 25,
+                           min_mentions: int = 1) -> None:
     """Generates and saves a heatmap visualizing the distribution of positive and negative review counts for each extracted entity.
 
+    Only the `top_n` most positive and `bottom_n` most negative entities are drawn, so that the
+    render time and the figure size stay bounded regardless of the number of entities.
+
     Args:
         report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
            a dictionary containing sets of review IDS corresponnding to each sentiment.
             
         save_path (str, optional): File path where the heatmap image will be saved. Defaults to './sentiment_heatmap.png'.
+        top_n (int, optional): Number of most positive entities drawn. Defaults to 25.
+        bottom_n (int, optional): Number of most negative entities drawn. Defaults to 25.
+        min_mentions (int, optional): Entities mentioned in fewer reviews are left out. Defaults to 1.
 
     Returns:
         None
     """
-    entity_names = []
-    sentiment_scores = []
-
-    for entity, sentiment_map in report.items():
-        pos_count = len(sentiment_map["positive_review_ids"])
-        neg_count = len(sentiment_map["negative_review_ids"])
-        sentiment_intensity = (pos_count - neg_count) / max(
-            (pos_count + neg_count), 1)  # Normalized score
-        entity_names.append(entity)
-        sentiment_scores.append(sentiment_intensity)
-
-    df = pd.DataFrame({
-        "Entity": entity_names,
-        "Sentiment Score": sentiment_scores
-    })
-    df = df.pivot_table(index="Entity", values="Sentiment Score")
-    df = df.sort_values(by="Sentiment Score", ascending=False)
+    scores = get_sentiment_scores(report, min_mentions=min_mentions)
+    num_entities = len(scores)
+    scores = select_extreme_entities(scores, top_n=top_n, bottom_n=bottom_n)
+    df = scores.set_index("Entity")[["Sentiment Score"]]
 
     # Adjust figure size dynamically
     plt.figure(figsize=(12, max(8, len(df) * 0.4)))
 
     ax = sns.heatmap(df, annot=True, cmap="PiYG", linewidths=0.5, center=0)
 
-    plt.title("Sentiment Intensity Heatmap")
+    if len(df) < num_entities:
+        plt.title(
+            f"Sentiment Intensity Heatmap (top {top_n} and bottom {bottom_n} of {num_entities} entities)"
+        )
+    else:
+        plt.title("Sentiment Intensity Heatmap")
 
     # Ensure text alignment
     ax.set_yticklabels(ax.get_yticklabels(), rotation=0, fontsize=12)
@@ -174,6 +225,30 @@ def plot_sentiment_heatmap(report: data_models.AggregatedResults,
     plt.close()
 
 
+def sentiment_heatmap_chart(scores: pd.DataFrame) -> alt.Chart:
+    """Builds an interactive (Vega-Lite) heatmap of sentiment scores.
+
+    Only the aggregated scores are sent to the browser, which renders the chart, so pages of
+    entities can be browsed without rasterizing any image.
+
+    Args:
+        scores (pd.DataFrame): rows of `get_sentiment_scores` to be drawn.
+
+    Returns:
+        chart (alt.Chart): the heatmap, with the counts of each entity in the tooltip.
+    """
+    return alt.Chart(scores).mark_rect().encode(
+        y=alt.Y("Entity:N", sort=None, title=None),
+        color=alt.Color("Sentiment Score:Q",
+                        scale=alt.Scale(scheme="pinkyellowgreen",
+                                        domain=[-1, 1])),
+        tooltip=[
+            "Entity", "Positive", "Negative", "Mentions",
+            alt.Tooltip("Sentiment Score:Q", format=".2f")
+        ],
+    ).properties(height=max(200, 20 * len(scores)))
+
+
 def plot_sentiment_trend(entity_name: str,
                          data_df: pd.DataFrame,
                          report: data_models.AggregatedResults,
@@ -181,62 +256,118 @@ def plot_sentiment_trend(entity_name: str,
                          time_interval: str = "D") -> None:
     """Generates and saves a plots displaying the trend of sentiments over time for a given entity.
 
+    Builds the trend of this entity only, use `plot_entity_trend` with a precomputed
+    `trend_cube.TrendCube` to plot many entities.
+
     Args:
         entity_name (str): The entity to visualize (e.g., "Notifications").
         report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
             a dictionary containing sets of review IDS corresponnding to each sentiment.
-        data_df (pd.DataFrame): DataFrame containing "Time_submitted" and review IDs.
+        data_df (pd.DataFrame): DataFrame containing "Time_submitted" and review IDs. It is not modified.
         save_path (str, optional): File path where the heatmap image will be saved. Defaults to './trend.png'.
         time_interval(str, optional): Time aggregation interval ("D" for daily, "W" for weekly).
     
     Returns:
         None
     """
+    cube = trend_cube.TrendCube.build(data_df, report, entities=[entity_name])
+    plot_entity_trend(cube,
+                      entity_name=entity_name,
+                      save_path=save_path,
+                      time_interval=time_interval)
+
+
+def plot_entity_trend(cube: trend_cube.TrendCube,
+                      entity_name: Optional[str] = None,
+                      save_path: str = "./trend.png",
+                      time_interval: str = "D") -> None:
+    """Generates and saves a plots displaying the trend of sentiments over time, from a trend cube.
+
+    Args:
+        cube (TrendCube): precomputed entity x time-bucket x sentiment counts.
+        entity_name (str, optional): The entity to visualize, all entities if None.
+        save_path (str, optional): File path where the plot image will be saved. Defaults to './trend.png'.
+        time_interval(str, optional): Time aggregation interval ("D" for daily, "W" for weekly).
 
-    # Convert time column to datetime
-    data_df["Time_submitted"] = pd.to_datetime(data_df["Time_submitted"])
-
-    # Extract sentiment review IDs from JSON
-    sentiment_map = report[entity_name]
-    pos_review_ids = sentiment_map["positive_review_ids"]
-    neg_review_ids = sentiment_map["negative_review_ids"]
-
-    # Filter dataframe for matching review IDs
-    df_pos = data_df[data_df.index.isin(pos_review_ids)].copy(
-    ) if pos_review_ids else pd.DataFrame(columns=data_df.columns)
-    df_neg = data_df[data_df.index.isin(neg_review_ids)].copy(
-    ) if neg_review_ids else pd.DataFrame(columns=data_df.columns)
-
-    # Group by time and count occurrences
-    if not df_pos.empty:
-        df_pos["sentiment"] = "Positive"
-    if not df_neg.empty:
-        df_neg["sentiment"] = "Negative"
-    df_trend = pd.concat([df_pos, df_neg])
-    df_trend = df_trend.groupby(
-        [pd.Grouper(key="Time_submitted", freq=time_interval),
-         "sentiment"]).size().unstack(fill_value=0)
+    Returns:
+        None
+    """
+    df_trend = cube.get_trend(entity_name, time_interval=time_interval)
 
     # Plot sentiment trends
     plt.figure(figsize=(12, 15))
-    if not df_pos.empty:
+    if df_trend["Positive"].sum() > 0:
         plt.plot(df_trend.index,
-                 df_trend.get("Positive", 0),
+                 df_trend["Positive"],
                  label="Positive Sentiment",
                  color="green",
                  marker="o")
-    if not df_neg.empty:
+    if df_trend["Negative"].sum() > 0:
         plt.plot(df_trend.index,
-                 df_trend.get("Negative", 0),
+                 df_trend["Negative"],
                  label="Negative Sentiment",
                  color="red",
                  marker="o")
 
     plt.xlabel("Time")
     plt.ylabel("Review Count")
-    plt.title(f"Sentiment Trend for {entity_name}")
+    plt.title(f"Sentiment Trend for {entity_name or 'all entities'}")
     plt.legend()
     plt.grid(True)
     plt.xticks(rotation=45)
     plt.savefig(save_path)
     plt.close()
+
+
+def stage_time_chart(metrics: pd.DataFrame, stages: List[str]) -> alt.Chart:
+    """Builds a bar chart of the total time spent in each stage of the pipeline.
+
+    Args:
+        metrics (pd.DataFrame): batch metrics of a run (see `run_metrics.load_metrics`).
+        stages (List[str]): stages to be drawn, with a `<stage>_seconds` column in `metrics`.
+
+    Returns:
+        chart (alt.Chart): one bar per stage, in pipeline order.
+    """
+    totals = pd.DataFrame({
+        "Stage": stages,
+        "Seconds": [metrics[f"{stage}_seconds"].sum() for stage in stages],
+    })
+    totals["Share"] = totals["Seconds"] / max(totals["Seconds"].sum(), 1e-9)
+    return alt.Chart(totals).mark_bar().encode(
+        x=alt.X("Seconds:Q", title="Total seconds"),
+        y=alt.Y("Stage:N", sort=stages, title=None),
+        color=alt.Color("Stage:N", sort=stages, legend=None),
+        tooltip=[
+            "Stage",
+            alt.Tooltip("Seconds:Q", format=".3f"),
+            alt.Tooltip("Share:Q", format=".1%")
+        ],
+    )
+
+
+def batch_stage_chart(metrics: pd.DataFrame, stages: List[str]) -> alt.Chart:
+    """Builds a stacked area chart of the stage durations of every batch.
+
+    Args:
+        metrics (pd.DataFrame): batch metrics of a run (see `run_metrics.load_metrics`).
+        stages (List[str]): stages to be drawn, with a `<stage>_seconds` column in `metrics`.
+
+    Returns:
+        chart (alt.Chart): stage durations stacked per batch, zoomable along the batches.
+    """
+    durations = metrics.melt(
+        id_vars=["batch_num", "status", "retries"],
+        value_vars=[f"{stage}_seconds" for stage in stages],
+        var_name="Stage",
+        value_name="Seconds")
+    durations["Stage"] = durations["Stage"].str.removesuffix("_seconds")
+    return alt.Chart(durations).mark_area().encode(
+        x=alt.X("batch_num:Q", title="Batch"),
+        y=alt.Y("Seconds:Q", stack=True),
+        color=alt.Color("Stage:N", sort=stages),
+        tooltip=[
+            "batch_num", "Stage", "status", "retries",
+            alt.Tooltip("Seconds:Q", format=".4f")
+        ],
+    ).interactive(bind_y=False)
@@ -0,0 +1,275 @@
+"""This file contains an adaptive token-bucket rate limiter for LLM calls."""
+
+import random
+import threading
+import time
+from typing import Callable, Optional, Tuple, TypeVar
+
+from utils import analyzer_utils
+from utils import constants
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+RATE_LIMIT_MARKERS = ("429", "rate limit", "ratelimit", "quota",
+                      "resource exhausted", "resourceexhausted",
+                      "too many requests")
+
+T = TypeVar("T")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Checks whether an exception raised by the LLM client signals a rate limit or quota error.
+
+    Args:
+        error (BaseException): Exception raised while invoking the LLM.
+
+    Returns:
+        (bool): True if the error looks like a 429 / quota exhaustion error.
+    """
+    description = f"{type(error).__name__} {error}".lower()
+    return any(marker in description for marker in RATE_LIMIT_MARKERS)
+
+
+def retry_with_backoff(
+    call: Callable[[], T],
+    max_retries: int = constants.max_retries,
+    on_retry: Optional[Callable[[int, float, Exception], None]] = None
+) -> Tuple[T, int]:
+    """Makes a call, retried with jittered exponential backoff while it raises.
+
+    Args:
+        call (Callable[[], T]): call to be made, e.g. a rate-limited LLM call.
+        max_retries (int): number of retries before the last error is raised.
+        on_retry (Callable[[int, float, Exception], None], optional): called with the number of
+            the failed attempt, the delay before the retry (seconds) and the error.
+
+    Returns:
+        result (T): result of the successful call.
+        retries (int): number of failed attempts before it.
+
+    Raises:
+        Exception: the last error, if the call still fails after all retries.
+    """
+    attempt = 0
+    while True:
+        try:
+            return call(), attempt
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            # Full jitter: sleep a random duration up to the exponential backoff
+            delay = random.uniform(
+                0,
+                min(constants.retry_max_delay,
+                    constants.retry_base_delay * 2**attempt))
+            attempt += 1
+            if on_retry is not None:
+                on_retry(attempt, delay, e)
+            time.sleep(delay)
+
+
+class TokenBucket:
+    """A token bucket refilled continuously at a fixed rate per minute.
+
+    The bucket may go into debt when a single request costs more than its capacity,
+    later requests then wait until the debt is repaid.
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        self.rate_per_minute = rate_per_minute
+        self.burst_seconds = burst_seconds
+        self.level = self.capacity
+        self.last_refill = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return max(1.0, self.rate_per_minute / 60 * self.burst_seconds)
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.last_refill
+        self.level = min(self.capacity,
+                         self.level + elapsed * self.rate_per_minute / 60)
+        self.last_refill = now
+
+    def wait_time(self, cost: float) -> float:
+        """Returns seconds to wait before `cost` can be taken from the bucket (after refill)."""
+        required = min(cost, self.capacity)
+        if self.level >= required:
+            return 0.0
+        return (required - self.level) * 60 / self.rate_per_minute
+
+    def consume(self, cost: float) -> None:
+        self.level -= cost
+
+
+class RateLimiter:
+    """Thread-safe requests-per-minute and tokens-per-minute limiter with adaptive backoff.
+
+    The configured quotas are scaled by a rate factor in [min_rate_factor, 1]. The factor is
+    multiplied by `backoff_factor` on a rate limit / quota error and recovers by
+    `recovery_step` after every `recovery_after` consecutive successful calls. The errors of the
+    calls in flight when the quota is hit report the same throttling event, so the rate backs off
+    at most once per `backoff_cooldown` seconds.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float,
+                 tokens_per_minute: Optional[float] = None,
+                 backoff_factor: float = 0.5,
+                 recovery_step: float = 0.1,
+                 recovery_after: int = 10,
+                 min_rate_factor: float = 0.05,
+                 backoff_cooldown: float = 10.0,
+                 report_interval: float = 60.0):
+        """RateLimiter parameters initialization.
+
+        Args:
+            requests_per_minute (float): Maximum number of LLM calls per minute.
+            tokens_per_minute (float, optional): Maximum number of prompt tokens per minute. Not limited if None.
+            backoff_factor (float): Multiplier applied to the rate on a rate limit error.
+            recovery_step (float): Fraction of the configured rate restored after `recovery_after` successes.
+            recovery_after (int): Number of consecutive successes required before speeding up.
+            min_rate_factor (float): Lower bound of the rate factor.
+            backoff_cooldown (float): Seconds after a back off during which rate limit errors
+                do not slow down further.
+            report_interval (float): Seconds between two reports of the effective rate.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.recovery_after = recovery_after
+        self.min_rate_factor = min_rate_factor
+        self.backoff_cooldown = backoff_cooldown
+        self.report_interval = report_interval
+
+        self.rate_factor = 1.0
+        self.consecutive_successes = 0
+        self.last_backoff: Optional[float] = None
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(
+            tokens_per_minute) if tokens_per_minute else None
+
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.window_tokens = 0
+
+    @property
+    def effective_requests_per_minute(self) -> float:
+        return self.requests_per_minute * self.rate_factor
+
+    @property
+    def effective_tokens_per_minute(self) -> Optional[float]:
+        if self.tokens_per_minute is None:
+            return None
+        return self.tokens_per_minute * self.rate_factor
+
+    def acquire(self, num_tokens: int = 0) -> float:
+        """Blocks until a request with `num_tokens` prompt tokens can be sent.
+
+        Args:
+            num_tokens (int): Estimated number of tokens of the request.
+
+        Returns:
+            waited (float): Seconds spent waiting for capacity.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.request_bucket.refill(now)
+                wait = self.request_bucket.wait_time(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.refill(now)
+                    wait = max(wait, self.token_bucket.wait_time(num_tokens))
+                if wait <= 0:
+                    self.request_bucket.consume(1)
+                    if self.token_bucket is not None:
+                        self.token_bucket.consume(num_tokens)
+                    self.window_requests += 1
+                    self.window_tokens += num_tokens
+                    self._maybe_report(now)
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def invoke(self, call: Callable[[], T]) -> T:
+        """Makes a call acquired with `acquire`, registering its success or rate limit error.
+
+        Args:
+            call (Callable[[], T]): the LLM call.
+
+        Returns:
+            result (T): result of the call, its errors are raised.
+        """
+        try:
+            result = call()
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.record_rate_limit()
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self) -> None:
+        """Registers a successful call, speeding up again after enough consecutive successes."""
+        with self.lock:
+            self.consecutive_successes += 1
+            if self.rate_factor < 1.0 and self.consecutive_successes >= self.recovery_after:
+                self.consecutive_successes = 0
+                self._set_rate_factor(self.rate_factor + self.recovery_step,
+                                      reason="no rate limit errors")
+
+    def record_rate_limit(self) -> None:
+        """Registers a rate limit / quota error and backs off, unless it already did within the cooldown."""
+        with self.lock:
+            self.consecutive_successes = 0
+            now = time.monotonic()
+            if self.last_backoff is None or now - self.last_backoff >= self.backoff_cooldown:
+                self.last_backoff = now
+                self._set_rate_factor(self.rate_factor * self.backoff_factor,
+                                      reason="rate limit error")
+            # drain the buckets so that waiting calls back off immediately
+            self.request_bucket.level = min(self.request_bucket.level, 0)
+            if self.token_bucket is not None:
+                self.token_bucket.level = min(self.token_bucket.level, 0)
+
+    def _set_rate_factor(self, rate_factor: float, reason: str) -> None:
+        rate_factor = min(1.0, max(self.min_rate_factor, rate_factor))
+        if rate_factor == self.rate_factor:
+            return
+        now = time.monotonic()
+        self.request_bucket.refill(now)
+        self.request_bucket.rate_per_minute = self.requests_per_minute * rate_factor
+        if self.token_bucket is not None:
+            self.token_bucket.refill(now)
+            self.token_bucket.rate_per_minute = self.tokens_per_minute * rate_factor  # type: ignore[operator]
+        slowing_down = rate_factor < self.rate_factor
+        self.rate_factor = rate_factor
+        if slowing_down:
+            logger.warning(
+                f"[RATE LIMITER] Slowing down ({reason}): {self._describe_rate()}"
+            )
+        else:
+            logger.info(
+                f"[RATE LIMITER] Speeding up ({reason}): {self._describe_rate()}"
+            )
+
+    def _describe_rate(self) -> str:
+        description = f"{self.effective_requests_per_minute:.1f} requests/min"
+        if self.effective_tokens_per_minute is not None:
+            description += f", {self.effective_tokens_per_minute:.0f} tokens/min"
+        return description + f" ({self.rate_factor:.0%} of configured quota)"
+
+    def _maybe_report(self, now: float) -> None:
+        elapsed = now - self.window_start
+        if elapsed < self.report_interval:
+            return
+        logger.info(
+            f"[RATE LIMITER] effective limit: {self._describe_rate()}, "
+            f"observed: {self.window_requests * 60 / elapsed:.1f} requests/min, "
+            f"{self.window_tokens * 60 / elapsed:.0f} tokens/min")
+        self.window_start = now
+        self.window_requests = 0
+        self.window_tokens = 0
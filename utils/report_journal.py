@@ -0,0 +1,131 @@
+"""This file contains an append-only journal for checkpointing the aggregated results."""
+
+import os
+import threading
+from typing import Union
+
+from pydantic import ValidationError
+
+from utils import analyzer_utils
+from utils import data_models
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+
+def write_atomic(file_path: str, content: Union[str, bytes]) -> None:
+    """Writes a file atomically, using a temporary file and a rename.
+
+    The temporary file is private to the writing process and thread, concurrent writers of the
+    same file do not clobber each other's temporary file, the last rename wins.
+
+    Args:
+        file_path (str): path of the file to be written.
+        content (str | bytes): content of the file, written in binary mode if bytes.
+
+    Returns:
+        None
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb" if isinstance(content, bytes) else "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class ReportJournal:
+    """Checkpoints the aggregated results as a snapshot plus an append-only journal.
+
+    Every processed batch appends a small `JournalEntry` to the journal (JSONL). The full report
+    is only rewritten when compacting: the snapshot is written atomically and the journal is
+    truncated. On start-up the report is rebuilt from the snapshot and the journal.
+    """
+
+    def __init__(self, report_path: str, snapshot_interval: int = 50):
+        """ReportJournal parameters initialization.
+
+        Args:
+            report_path (str): path to the report snapshot (json, or npz for the binary format).
+            snapshot_interval (int): number of journal entries after which the report is compacted.
+        """
+        self.report_path = report_path
+        self.journal_path = f"{os.path.splitext(report_path)[0]}_journal.jsonl"
+        self.snapshot_interval = snapshot_interval
+        self.num_entries = 0
+
+    def load(self) -> data_models.AggregatedResults:
+        """Rebuilds the report from the last snapshot and the journal.
+
+        Returns:
+            report (AggregatedResults): the recovered report, empty if there is no previous state.
+        """
+        if os.path.exists(self.report_path):
+            report = analyzer_utils.load_report(self.report_path)
+        else:
+            logger.info(
+                f"Could not find previous state for aggregated results at provided path : {self.report_path}, creating new report."
+            )
+            report = data_models.AggregatedResults(entity_sentiment_map={})
+
+        if os.path.exists(self.journal_path):
+            incomplete = False
+            with open(self.journal_path, "r") as f:
+                for line_num, line in enumerate(f, start=1):
+                    try:
+                        entry = data_models.JournalEntry.model_validate_json(
+                            line)
+                    except ValidationError:
+                        # Only the last entry can be incomplete (crash while appending)
+                        incomplete = True
+                        logger.warning(
+                            f"Ignoring incomplete journal entry at {self.journal_path}:{line_num}"
+                        )
+                        continue
+                    entry.apply(report)
+                    self.num_entries += 1
+            logger.info(
+                f"Replayed {self.num_entries} journal entries from {self.journal_path}"
+            )
+            # Compact right away, so that new entries are not appended to an incomplete line
+            if incomplete:
+                self.snapshot(report)
+        return report
+
+    def append(self, entry: data_models.JournalEntry) -> None:
+        """Appends an entry to the journal and makes it durable.
+
+        Args:
+            entry (JournalEntry): change of the report caused by a processed batch.
+
+        Returns:
+            None
+        """
+        with open(self.journal_path, "a") as f:
+            f.write(entry.model_dump_json() + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.num_entries += 1
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return self.num_entries >= self.snapshot_interval
+
+    def snapshot(self, report: data_models.AggregatedResults) -> None:
+        """Writes the full report atomically and truncates the journal.
+
+        Args:
+            report (AggregatedResults): the current report.
+
+        Returns:
+            None
+        """
+        write_atomic(self.report_path,
+                     analyzer_utils.serialize_report(report, self.report_path))
+        # A crash before truncation replays entries already in the snapshot, which is harmless.
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.num_entries = 0
@@ -0,0 +1,136 @@
+"""This file contains an on-disk, content-addressed cache for LLM responses."""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from utils import analyzer_utils
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+
+class ResponseCache:
+    """SQLite backed LLM response cache with a size cap and LRU eviction.
+
+    Responses are keyed on a hash of the model name, the formatted prompt and the
+    output schema, so a cached response is only reused for an identical request.
+    The cache is thread-safe and can be shared by several analyzers.
+    """
+
+    def __init__(self, db_path: str, max_size_mb: float = 512):
+        """ResponseCache parameters initialization.
+
+        Args:
+            db_path (str): path to the SQLite database file.
+            max_size_mb (float): maximum total size of cached responses, least recently
+                used responses are evicted beyond it.
+        """
+        self.db_path = db_path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL)""")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS last_access_idx ON responses (last_access)"
+            )
+        self.total_size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, prompt: str, schema: str) -> str:
+        """Builds the cache key of an LLM request.
+
+        Args:
+            model (str): name of the LLM.
+            prompt (str): formatted prompt sent to the LLM.
+            schema (str): serialized schema of the parsed output.
+
+        Returns:
+            key (str): sha256 hex digest identifying the request.
+        """
+        digest = hashlib.sha256()
+        for part in (model, prompt, schema):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for a key (None if missing) and marks it as recently used."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?",
+                    (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Stores a response, evicting the least recently used responses beyond the size cap."""
+        size = len(response.encode("utf-8"))
+        if size > self.max_size_bytes:
+            return
+        with self.lock, self.connection:
+            previous = self.connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self.total_size -= previous[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()))
+            self.total_size += size
+            self._evict()
+
+    def _evict(self) -> None:
+        evicted = 0
+        while self.total_size > self.max_size_bytes:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            for key, size in rows:
+                if self.total_size <= self.max_size_bytes:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?",
+                                        (key,))
+                self.total_size -= size
+                evicted += 1
+        if evicted:
+            logger.info(
+                f"[RESPONSE CACHE] evicted {evicted} least recently used response(s)"
+            )
+
+    def purge(self) -> None:
+        """Removes all cached responses."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses")
+            self.total_size = 0
+        with self.lock:
+            self.connection.execute("VACUUM")
+        logger.info(f"[RESPONSE CACHE] purged {self.db_path}")
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
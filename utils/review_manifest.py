@@ -0,0 +1,362 @@
+"""This file contains the manifest of the reviews registered for a report, identified by content hash.
+
+Review IDs of a report are positions in the review stream, which break if the dataset is
+reordered, deduplicated or rows are dropped. The manifest maps the content hash of every review
+to a stable review ID, assigned in order of first appearance, so that a growing dataset can be
+analyzed incrementally: only reviews with unseen hashes are sent to the LLM. The n-th copy of an
+identical review is keyed by its own hash (see `hash_occurrence`), so that every row gets its own
+review ID, and IDs match row positions as long as rows are only appended.
+"""
+
+import hashlib
+import io
+import itertools
+import os
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple
+)
+
+import numpy as np
+
+from utils import analyzer_utils
+from utils import report_journal
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+
+def hash_review(review: str) -> int:
+    """Returns the 64-bit content hash of a review, ignoring surrounding whitespace."""
+    return int.from_bytes(
+        hashlib.blake2b(review.strip().encode("utf-8"), digest_size=8).digest(),
+        "little")
+
+
+def hash_occurrence(content_hash: int, occurrence: int) -> int:
+    """Returns the key of the n-th (0-based) row of a dataset with a given content hash.
+
+    The first row is keyed by its content hash, the copies of an identical review by a hash of
+    the content hash and their occurrence number.
+    """
+    if occurrence == 0:
+        return content_hash
+    return int.from_bytes(
+        hashlib.blake2b(content_hash.to_bytes(8, "little") +
+                        occurrence.to_bytes(8, "little"),
+                        digest_size=8).digest(), "little")
+
+
+def get_manifest_path(report_path: str) -> str:
+    """Returns the path of the manifest written next to a report."""
+    return f"{os.path.splitext(report_path)[0]}_manifest.npz"
+
+
+class ReviewManifest:
+    """Row key -> review ID of every row registered for a report.
+
+    Registered keys are kept as a sorted array (vectorized lookups), the keys registered
+    since the manifest was loaded in a dict, merged into the array when saving. The keys a pass
+    over a dataset has claimed (see `claim`) are tracked to tell identical reviews apart.
+    """
+
+    def __init__(self,
+                 hashes: Optional[np.ndarray] = None,
+                 review_ids: Optional[np.ndarray] = None,
+                 next_review_id: int = 0):
+        """ReviewManifest parameters initialization.
+
+        Args:
+            hashes (np.ndarray, optional): sorted uint64 row keys.
+            review_ids (np.ndarray, optional): review ID of each key.
+            next_review_id (int): ID assigned to the next unseen review.
+        """
+        self.hashes = hashes if hashes is not None else np.empty(0, np.uint64)
+        self.review_ids = review_ids if review_ids is not None else np.empty(
+            0, np.uint32)
+        self.new_review_ids: Dict[int, int] = {}
+        self.next_review_id = next_review_id
+        self.reset_claims()
+
+    def __len__(self) -> int:
+        return len(self.hashes) + len(self.new_review_ids)
+
+    def reset_claims(self) -> None:
+        """Starts a new pass over a dataset, no key is claimed."""
+        self.claimed = np.zeros(len(self.hashes), dtype=bool)
+        self.claimed_new: Set[int] = set()
+        # next occurrence of the content hashes of identical reviews
+        self.occurrences: Dict[int, int] = {}
+
+    @classmethod
+    def load(cls, file_path: str) -> "ReviewManifest":
+        """Loads a manifest saved by `save`, empty if the file does not exist."""
+        if not os.path.exists(file_path):
+            return cls()
+        with np.load(file_path) as arrays:
+            return cls(hashes=arrays["hashes"],
+                       review_ids=arrays["review_ids"],
+                       next_review_id=int(arrays["next_review_id"]))
+
+    def save_new_review_ids(self) -> None:
+        """Merges the keys registered since loading into the sorted array, and starts a new pass."""
+        if self.new_review_ids:
+            hashes = np.concatenate([
+                self.hashes,
+                np.fromiter(self.new_review_ids.keys(), dtype=np.uint64)
+            ])
+            review_ids = np.concatenate([
+                self.review_ids,
+                np.fromiter(self.new_review_ids.values(), dtype=np.uint32)
+            ])
+            order = np.argsort(hashes, kind="stable")
+            self.hashes, self.review_ids = hashes[order], review_ids[order]
+            self.new_review_ids = {}
+            self.reset_claims()
+
+    def save(self, file_path: str) -> None:
+        """Atomically saves the manifest (npz archive), and starts a new pass over a dataset."""
+        self.save_new_review_ids()
+        buffer = io.BytesIO()
+        np.savez(buffer,
+                 hashes=self.hashes,
+                 review_ids=self.review_ids,
+                 next_review_id=self.next_review_id)
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        report_journal.write_atomic(file_path, buffer.getvalue())
+
+    def truncate(self, next_review_id: int) -> None:
+        """Unregisters the reviews with an ID from `next_review_id` on, the next unseen reviews get IDs from it."""
+        self.save_new_review_ids()
+        kept = self.review_ids < next_review_id
+        self.hashes, self.review_ids = self.hashes[kept], self.review_ids[kept]
+        self.next_review_id = next_review_id
+        self.reset_claims()
+
+    def find(self, hashes: np.ndarray) -> np.ndarray:
+        """Returns the positions of keys in the sorted array, -1 for keys not in it."""
+        positions = np.full(len(hashes), -1, dtype=np.int64)
+        if len(self.hashes):
+            candidates = np.minimum(np.searchsorted(self.hashes, hashes),
+                                    len(self.hashes) - 1)
+            found = self.hashes[candidates] == hashes
+            positions[found] = candidates[found]
+        return positions
+
+    def lookup(self, hashes: np.ndarray) -> np.ndarray:
+        """Returns the review IDs of row keys, -1 for unregistered keys."""
+        positions = self.find(hashes)
+        review_ids = np.full(len(hashes), -1, dtype=np.int64)
+        found = positions >= 0
+        review_ids[found] = self.review_ids[positions[found]]
+        if self.new_review_ids:
+            for i in np.flatnonzero(review_ids < 0):
+                review_ids[i] = self.new_review_ids.get(int(hashes[i]), -1)
+        return review_ids
+
+    def claim_key(self, key: int) -> Optional[int]:
+        """Claims a registered key, returns its review ID, -1 if it is claimed, None if unregistered."""
+        position = int(np.searchsorted(self.hashes, np.uint64(key)))
+        if position < len(self.hashes) and self.hashes[position] == key:
+            if self.claimed[position]:
+                return -1
+            self.claimed[position] = True
+            return int(self.review_ids[position])
+        if key in self.new_review_ids:
+            if key in self.claimed_new:
+                return -1
+            self.claimed_new.add(key)
+            return self.new_review_ids[key]
+        return None
+
+    def claim(self,
+              hashes: np.ndarray,
+              review_ids: Optional[np.ndarray] = None,
+              register: bool = True) -> np.ndarray:
+        """Returns the review IDs of the next rows of a pass over a dataset.
+
+        The n-th row with a given content hash in the pass claims the key
+        `hash_occurrence(hash, n)`, so identical reviews get their own review IDs.
+
+        Args:
+            hashes (np.ndarray): uint64 content hashes of the rows, in dataset order.
+            review_ids (np.ndarray, optional): IDs of the unregistered rows, instead of the next
+                IDs (e.g. row positions of a report processed before the manifest existed).
+            register (bool): whether unregistered rows are registered, they get -1 otherwise.
+
+        Returns:
+            review_ids (np.ndarray): review ID of every row.
+        """
+        claimed_ids = np.full(len(hashes), -1, dtype=np.int64)
+        # Fast path: first copy in the chunk of a registered, unclaimed review
+        positions = self.find(hashes)
+        is_first = np.zeros(len(hashes), dtype=bool)
+        is_first[np.unique(hashes, return_index=True)[1]] = True
+        fast = np.flatnonzero(is_first & (positions >= 0))
+        fast = fast[~self.claimed[positions[fast]]]
+        self.claimed[positions[fast]] = True
+        claimed_ids[fast] = self.review_ids[positions[fast]]
+
+        is_slow = np.ones(len(hashes), dtype=bool)
+        is_slow[fast] = False
+        for i in np.flatnonzero(is_slow):
+            content_hash = int(hashes[i])
+            occurrence = self.occurrences.get(content_hash, 0)
+            while True:
+                key = hash_occurrence(content_hash, occurrence)
+                review_id = self.claim_key(key)
+                if review_id is None and register:
+                    review_id = self.next_review_id if review_ids is None else int(
+                        review_ids[i])
+                    self.new_review_ids[key] = review_id
+                    self.claimed_new.add(key)
+                    self.next_review_id = max(self.next_review_id,
+                                              review_id + 1)
+                if review_id != -1:
+                    break
+                occurrence += 1
+            if occurrence:
+                self.occurrences[content_hash] = occurrence + 1
+            claimed_ids[i] = -1 if review_id is None else review_id
+        return claimed_ids
+
+
+def iter_chunks(
+        reviews: Iterable[Tuple[int, str]],
+        chunk_size: int) -> Iterator[Tuple[List[Tuple[int, str]], np.ndarray]]:
+    """Yields chunks of (row position, review) pairs with the content hashes of their reviews."""
+    reviews = iter(reviews)
+    for chunk in iter(lambda: list(itertools.islice(reviews, chunk_size)), []):
+        yield chunk, np.fromiter((hash_review(review) for _, review in chunk),
+                                 dtype=np.uint64,
+                                 count=len(chunk))
+
+
+def register_reviews(reviews: Iterable[Tuple[int, str]],
+                     manifest: ReviewManifest,
+                     next_review_idx: int,
+                     bootstrap: bool = False,
+                     chunk_size: int = 10000) -> int:
+    """Registers the reviews of a dataset in its manifest.
+
+    Registered reviews the report has not processed yet (e.g. of an interrupted run) are
+    registered again with the new ones: their IDs are not referenced by the report, as batches
+    are checkpointed in order. IDs from `next_review_idx` on are thus assigned in dataset order,
+    the order in which `get_pending_reviews` yields them.
+
+    Args:
+        reviews (Iterable[Tuple[int, str]]): (row position, review) pairs of the whole dataset
+            (see `analyzer_utils.iter_reviews`).
+        manifest (ReviewManifest): manifest of the report, updated in place.
+        next_review_idx (int): review ID up to which the report is processed (see
+            `AggregatedResults.resume_position`).
+        bootstrap (bool): whether the manifest is created for a report processed without it.
+            The reviews the report holds are then assumed to be the first `next_review_idx`
+            rows of the dataset, and keep their row positions as IDs.
+        chunk_size (int): number of reviews hashed and looked up at once.
+
+    Returns:
+        num_pending_reviews (int): number of reviews with an ID from `next_review_idx` on.
+    """
+    manifest.truncate(next_review_idx)
+    num_pending_reviews = 0
+    for chunk, hashes in iter_chunks(reviews, chunk_size):
+        if bootstrap:
+            positions = np.fromiter((position for position, _ in chunk),
+                                    dtype=np.int64,
+                                    count=len(chunk))
+            processed = positions < next_review_idx
+            manifest.claim(hashes[processed], review_ids=positions[processed])
+            hashes = hashes[~processed]
+        num_pending_reviews += int(
+            np.count_nonzero(manifest.claim(hashes) >= next_review_idx))
+    return num_pending_reviews
+
+
+def get_pending_reviews(reviews: Iterable[Tuple[int, str]],
+                        manifest: ReviewManifest,
+                        next_review_idx: int,
+                        chunk_size: int = 10000) -> Iterator[Tuple[int, str]]:
+    """Streams the registered reviews of a dataset the report has not processed yet.
+
+    Args:
+        reviews (Iterable[Tuple[int, str]]): (row position, review) pairs of the whole dataset,
+            as registered by `register_reviews`.
+        manifest (ReviewManifest): manifest of the report.
+        next_review_idx (int): review ID up to which the report is processed.
+        chunk_size (int): number of reviews hashed and looked up at once.
+
+    Yields:
+        (int, str): review ID and review of the reviews with an ID from `next_review_idx` on,
+            in dataset order, which is their ID order after `register_reviews`.
+    """
+    for review_id, review in iter_registered_reviews(reviews, manifest,
+                                                     chunk_size):
+        if review_id >= next_review_idx:
+            yield review_id, review
+
+
+def iter_registered_reviews(
+        reviews: Iterable[Tuple[int, str]],
+        manifest: ReviewManifest,
+        chunk_size: int = 10000) -> Iterator[Tuple[int, str]]:
+    """Yields the (review ID, review) pairs of the registered reviews of a dataset.
+
+    Args:
+        reviews (Iterable[Tuple[int, str]]): (row position, review) pairs of the dataset.
+        manifest (ReviewManifest): manifest of the report.
+        chunk_size (int): number of reviews hashed and looked up at once.
+
+    Yields:
+        (int, str): review ID and review, in dataset order.
+    """
+    manifest.reset_claims()
+    for chunk, hashes in iter_chunks(reviews, chunk_size):
+        review_ids = manifest.claim(hashes, register=False)
+        for i in np.flatnonzero(review_ids >= 0):
+            yield int(review_ids[i]), chunk[i][1]
+
+
+def prepare_incremental_run(make_reviews: Callable[[], Iterable[Tuple[int,
+                                                                      str]]],
+                            report_path: str,
+                            next_review_idx: int) -> Iterator[Tuple[int, str]]:
+    """Registers the reviews of a dataset in the manifest of a report and streams the unprocessed ones.
+
+    The dataset is read twice, so that only a chunk of reviews is held in memory: a first pass
+    registers the reviews, and the manifest is saved before a second pass streams the reviews
+    to be analyzed. The resume position of the report tracks which registered reviews are
+    processed, so an interrupted run is resumed by the next one.
+
+    Args:
+        make_reviews (Callable[[], Iterable[Tuple[int, str]]]): returns a new stream of the
+            (row position, review) pairs of the whole dataset, e.g. a partial of
+            `analyzer_utils.iter_reviews`.
+        report_path (str): path to the report, the manifest is saved next to it.
+        next_review_idx (int): review ID up to which the report is processed.
+
+    Returns:
+        pending_reviews (Iterator[Tuple[int, str]]): (review ID, review) pairs to be analyzed,
+            see `get_pending_reviews`.
+    """
+    manifest_path = get_manifest_path(report_path)
+    bootstrap = not os.path.exists(manifest_path)
+    if bootstrap and next_review_idx:
+        logger.warning(
+            f"Creating the review manifest of an existing report, its {next_review_idx} reviews are assumed to be the first rows of the dataset."
+        )
+    manifest = ReviewManifest.load(manifest_path)
+    num_pending_reviews = register_reviews(make_reviews(),
+                                           manifest,
+                                           next_review_idx,
+                                           bootstrap=bootstrap)
+    logger.info(
+        f"[INCREMENTAL] {num_pending_reviews} review(s) to be analyzed ({len(manifest)} registered)."
+    )
+    manifest.save(manifest_path)
+    return get_pending_reviews(make_reviews(), manifest, next_review_idx)
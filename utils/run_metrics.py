@@ -0,0 +1,199 @@
+"""This file contains the per-batch metrics of analyzer runs and their exporters.
+
+Every committed batch appends a `BatchMetrics` record to a JSONL file next to the report. The
+cumulative metrics of the run can also be exported as a Prometheus textfile (e.g. for the
+node_exporter textfile collector).
+"""
+
+import collections
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+from pydantic import BaseModel
+from pydantic import ValidationError
+
+from utils import analyzer_utils
+from utils import report_journal
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+# durations recorded for every batch, in pipeline order
+STAGES = ("build_prompt", "rate_limit_wait", "invoke", "parse", "merge",
+          "journal", "checkpoint")
+
+
+def get_metrics_path(report_path: str) -> str:
+    """Returns the path of the metrics file written next to a report."""
+    return f"{os.path.splitext(report_path)[0]}_metrics.jsonl"
+
+
+class BatchMetrics(BaseModel):
+    """Metrics of one committed batch.
+
+    Durations are in seconds and summed over the attempts of the batch. Stages of concurrent
+    batches overlap (e.g. the invoke of a batch and the merge of the previous one), so their
+    sum exceeds the wall time of a run.
+
+    Attributes:
+        run_id (str): identifier of the analyzer run (a resumed run gets a new one).
+        batch_num (int): 1-based number of the batch.
+        timestamp (float): unix time at which the batch was committed.
+        status (str): "ok", or "failed" if the batch was moved to the dead-letter list.
+        num_reviews (int): number of reviews in the batch.
+        prompt_tokens (int): estimated tokens of the prompt.
+        output_tokens (int): estimated tokens of the LLM response, 0 if it was cached.
+        memory_entities (int): entities injected into the prompt (entity memory).
+        existing_entities (int): entities in the report after the batch was merged.
+        retries (int): failed attempts before the last one.
+        cached (bool): whether the response came from the response cache.
+        build_prompt_seconds ... checkpoint_seconds (float): duration of every stage.
+    """
+    run_id: str
+    batch_num: int
+    timestamp: float
+    status: str = "ok"
+    num_reviews: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    memory_entities: int = 0
+    existing_entities: int = 0
+    retries: int = 0
+    cached: bool = False
+    build_prompt_seconds: float = 0.0
+    rate_limit_wait_seconds: float = 0.0
+    invoke_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    merge_seconds: float = 0.0
+    journal_seconds: float = 0.0
+    checkpoint_seconds: float = 0.0
+
+
+class MetricsWriter:
+    """Appends batch metrics to a JSONL file, optionally exporting them as a Prometheus textfile."""
+
+    def __init__(self,
+                 metrics_path: str,
+                 textfile_dir: Optional[str] = None,
+                 run_label: str = ""):
+        """MetricsWriter parameters initialization.
+
+        Args:
+            metrics_path (str): path to the JSONL metrics file, appended to.
+            textfile_dir (str, optional): directory of the Prometheus textfile, not exported if None.
+            run_label (str): value of the `run` label of the exported metrics.
+        """
+        self.metrics_path = metrics_path
+        self.textfile_path: Optional[str] = None
+        if textfile_dir is not None:
+            file_name = re.sub(r"\W+", "_", run_label).strip("_")
+            self.textfile_path = os.path.join(
+                textfile_dir, f"review_analyzer_{file_name}.prom")
+        self.run_label = run_label
+        self.lock = threading.Lock()
+        self.totals: collections.Counter = collections.Counter()
+        self.batches: collections.Counter = collections.Counter()
+        self.last_metrics: Optional[BatchMetrics] = None
+
+    def write(self, metrics: BatchMetrics) -> None:
+        """Records the metrics of a batch."""
+        with self.lock:
+            os.makedirs(os.path.dirname(self.metrics_path) or ".",
+                        exist_ok=True)
+            with open(self.metrics_path, "a") as f:
+                f.write(metrics.model_dump_json() + "\n")
+            self.batches[metrics.status] += 1
+            self.totals.update({
+                "reviews": metrics.num_reviews,
+                "prompt_tokens": metrics.prompt_tokens,
+                "output_tokens": metrics.output_tokens,
+                "retries": metrics.retries,
+                "cached": int(metrics.cached),
+            })
+            for stage in STAGES:
+                self.totals[f"{stage}_seconds"] += getattr(
+                    metrics, f"{stage}_seconds")
+            self.last_metrics = metrics
+            if self.textfile_path is not None:
+                self.export_textfile(self.textfile_path)
+
+    def export_textfile(self, file_path: str) -> None:
+        """Writes the cumulative metrics of the run in the Prometheus text format (atomically).
+
+        Args:
+            file_path (str): path to the textfile, replaced on every call.
+        """
+        label = f'run="{self.run_label}"'
+        lines: List[str] = [
+            "# HELP review_analyzer_batches_total Committed batches by status.",
+            "# TYPE review_analyzer_batches_total counter",
+        ]
+        lines += [
+            f'review_analyzer_batches_total{{{label},status="{status}"}} {count}'
+            for status, count in sorted(self.batches.items())
+        ]
+        for name, help_text in (
+            ("reviews", "Reviews of the committed batches."),
+            ("prompt_tokens", "Estimated prompt tokens."),
+            ("output_tokens", "Estimated output tokens."),
+            ("retries", "Failed LLM attempts that were retried."),
+            ("cached", "Batches answered from the response cache."),
+        ):
+            lines += [
+                f"# HELP review_analyzer_{name}_total {help_text}",
+                f"# TYPE review_analyzer_{name}_total counter",
+                f"review_analyzer_{name}_total{{{label}}} {self.totals[name]}",
+            ]
+        lines += [
+            "# HELP review_analyzer_stage_seconds_total Time spent per pipeline stage.",
+            "# TYPE review_analyzer_stage_seconds_total counter",
+        ]
+        lines += [
+            f'review_analyzer_stage_seconds_total{{{label},stage="{stage}"}} {self.totals[f"{stage}_seconds"]:.6f}'
+            for stage in STAGES
+        ]
+        if self.last_metrics is not None:
+            lines += [
+                "# HELP review_analyzer_entities Entities in the report.",
+                "# TYPE review_analyzer_entities gauge",
+                f"review_analyzer_entities{{{label}}} {self.last_metrics.existing_entities}",
+                "# HELP review_analyzer_last_batch_timestamp_seconds Commit time of the last batch.",
+                "# TYPE review_analyzer_last_batch_timestamp_seconds gauge",
+                f"review_analyzer_last_batch_timestamp_seconds{{{label}}} {self.last_metrics.timestamp:.3f}",
+            ]
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        report_journal.write_atomic(file_path, "\n".join(lines) + "\n")
+
+
+def load_metrics(file_path: str) -> pd.DataFrame:
+    """Loads a JSONL metrics file.
+
+    Args:
+        file_path (str): path to the metrics file.
+
+    Returns:
+        metrics (pd.DataFrame): one row per batch, with the fields of `BatchMetrics`.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(
+            f"Could not load metrics, invalid path : {file_path}")
+    records: List[Dict] = []
+    with open(file_path, "r") as f:
+        for line_num, line in enumerate(f, start=1):
+            try:
+                records.append(
+                    BatchMetrics.model_validate_json(line).model_dump())
+            except ValidationError:
+                # Only the last line can be incomplete (run interrupted while appending)
+                logger.warning(
+                    f"Ignoring incomplete metrics record at {file_path}:{line_num}"
+                )
+    return pd.DataFrame(records, columns=list(BatchMetrics.model_fields))
+
+
+def make_run_id() -> str:
+    """Returns an identifier of a run, its start time."""
+    return time.strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,275 @@
+"""This file contains a precomputed entity x time-bucket x sentiment count cube for sentiment trends."""
+
+import argparse
+import io
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import analyzer_utils
+from utils import constants
+from utils import data_models
+from utils import report_journal
+
+logger = analyzer_utils.Logger("Review Analyzer").get_logger()
+
+# time aggregation intervals of the cube, as pandas period frequencies
+TIME_INTERVALS = ("D", "W")
+SENTIMENTS = ("Positive", "Negative")
+
+
+def get_cube_path(report_path: str) -> str:
+    """Returns the path of the trend cube persisted next to a report."""
+    return f"{os.path.splitext(report_path)[0]}_trend_cube.npz"
+
+
+def get_source_signature(file_paths: List[str]) -> List[List]:
+    """Returns (path, size, modification time) of the files a cube is computed from."""
+    return [[
+        os.path.abspath(file_path),
+        os.stat(file_path).st_size,
+        os.stat(file_path).st_mtime_ns
+    ] for file_path in file_paths]
+
+
+class TrendCube:
+    """Number of reviews per entity, time bucket and sentiment, at daily and weekly granularity.
+
+    For every time interval, the non-zero counts are stored sorted by entity (CSR-like): the
+    rows of an entity are `offsets[i]:offsets[i + 1]`, each row holds a bucket index and the
+    positive and negative counts. Bucket `b` covers the period `start_ordinal + b`, labelled
+    like `pd.Grouper(freq=...)` (the day, or the Sunday ending the week).
+    """
+
+    def __init__(self,
+                 entities: List[str],
+                 tables: Dict[str, Dict[str, np.ndarray]],
+                 sources: Optional[List[List]] = None):
+        """TrendCube parameters initialization.
+
+        Args:
+            entities (List[str]): entity names, in row order.
+            tables (Dict[str, Dict[str, np.ndarray]]): for every time interval, the arrays
+                "start_ordinal", "offsets", "buckets", "positive" and "negative".
+            sources (List[List], optional): signature of the files the cube was computed from.
+        """
+        self.entities = entities
+        self.entity_idx = {entity: i for i, entity in enumerate(entities)}
+        self.tables = tables
+        self.sources = sources or []
+
+    @classmethod
+    def build(cls,
+              data: pd.DataFrame,
+              report: data_models.AggregatedResults,
+              time_column: str = constants.time_column,
+              entities: Optional[List[str]] = None,
+              sources: Optional[List[List]] = None) -> "TrendCube":
+        """Computes the cube in one pass over the timestamps and the report.
+
+        Args:
+            data (pd.DataFrame): Dataframe containing all processed reviews, indexed by review id.
+            report (AggregatedResults): A Pydantic object where each key is an entity, and the value is
+                a dictionary containing sets of review IDS corresponnding to each sentiment.
+            time_column (str): name of the review timestamp column.
+            entities (List[str], optional): entities to be included, all entities if None.
+            sources (List[List], optional): signature of the files `data` and `report` were loaded from.
+
+        Returns:
+            cube (TrendCube): the cube.
+        """
+        if entities is None:
+            entities = report.existing_entities
+        # Timestamps are parsed once, review ids index the position in `data`
+        times = pd.to_datetime(data[time_column],
+                               format="mixed",
+                               errors="coerce")
+        times = pd.Series(times.to_numpy(), index=data.index).reindex(
+            range(int(data.index.max()) + 1 if len(data) else 0))
+
+        tables = {}
+        for time_interval in TIME_INTERVALS:
+            periods = pd.PeriodIndex(times, freq=time_interval)
+            valid = ~periods.isna()
+            ordinals = periods.asi8
+            start_ordinal = int(ordinals[valid].min()) if valid.any() else 0
+            num_buckets = int(
+                ordinals[valid].max()) - start_ordinal + 1 if valid.any() else 0
+            # bucket of every review id, -1 for missing / invalid timestamps
+            review_buckets = np.where(valid, ordinals - start_ordinal, -1)
+
+            # (entity, bucket) cell of every mention with a timestamp, per sentiment
+            cell_keys = []
+            for sentiment_key in data_models.SENTIMENT_KEYS:
+                review_ids = [
+                    report[entity].get(sentiment_key,
+                                       data_models.ReviewIdSet()).array
+                    for entity in entities
+                ]
+                entity_rows = np.repeat(np.arange(len(entities)),
+                                        [len(ids) for ids in review_ids])
+                review_ids_flat = np.concatenate(
+                    review_ids) if review_ids else np.empty(0, np.int64)
+                in_data = review_ids_flat < len(review_buckets)
+                buckets = review_buckets[review_ids_flat[in_data]]
+                has_time = buckets >= 0
+                cell_keys.append(entity_rows[in_data][has_time] * num_buckets +
+                                 buckets[has_time])
+            # Only non-empty cells are kept, sorted by entity then bucket
+            cells, cell_idx = np.unique(np.concatenate(cell_keys),
+                                        return_inverse=True)
+            num_positive = len(cell_keys[0])
+            tables[time_interval] = {
+                "start_ordinal":
+                    np.array(start_ordinal),
+                "offsets":
+                    np.searchsorted(cells // max(num_buckets, 1),
+                                    np.arange(len(entities) + 1)),
+                "buckets": (cells % max(num_buckets, 1)).astype(np.int32),
+                "positive":
+                    np.bincount(cell_idx[:num_positive],
+                                minlength=len(cells)).astype(np.int32),
+                "negative":
+                    np.bincount(cell_idx[num_positive:],
+                                minlength=len(cells)).astype(np.int32),
+            }
+        return cls(entities=entities, tables=tables, sources=sources)
+
+    def get_trend(self,
+                  entity_name: Optional[str] = None,
+                  time_interval: str = "D") -> pd.DataFrame:
+        """Returns the number of positive and negative reviews over time.
+
+        Args:
+            entity_name (str, optional): entity to be queried, all entities summed if None.
+            time_interval (str): time aggregation interval ("D" for daily, "W" for weekly).
+
+        Returns:
+            trend (pd.DataFrame): "Positive" and "Negative" counts indexed by bucket label, for
+                the buckets with at least one review of the entity, in chronological order.
+        """
+        if time_interval not in self.tables:
+            raise ValueError(
+                f"Unknown time interval : {time_interval}, available intervals: {list(self.tables)}"
+            )
+        table = self.tables[time_interval]
+        if entity_name is not None:
+            i = self.entity_idx[entity_name]
+            rows = slice(table["offsets"][i], table["offsets"][i + 1])
+            buckets = table["buckets"][rows]
+            counts = {
+                sentiment: table[sentiment.lower()][rows].astype(np.int64)
+                for sentiment in SENTIMENTS
+            }
+        else:
+            buckets, bucket_idx = np.unique(table["buckets"],
+                                            return_inverse=True)
+            counts = {
+                sentiment: np.bincount(bucket_idx,
+                                       weights=table[sentiment.lower()],
+                                       minlength=len(buckets)).astype(np.int64)
+                for sentiment in SENTIMENTS
+            }
+        start_ordinal = int(table["start_ordinal"])
+        labels = pd.PeriodIndex.from_ordinals(
+            start_ordinal + buckets.astype(np.int64),
+            freq=time_interval).end_time.normalize()
+        return pd.DataFrame(counts, index=labels)
+
+    def to_binary(self) -> bytes:
+        """Serializes the cube to a compressed numpy archive (`.npz`)."""
+        arrays: Dict[str, Any] = {
+            f"{time_interval}_{name}": array
+            for time_interval, table in self.tables.items()
+            for name, array in table.items()
+        }
+        arrays["header"] = np.array(
+            json.dumps({
+                "entities": self.entities,
+                "time_intervals": list(self.tables),
+                "sources": self.sources,
+            }))
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_binary(cls, content: bytes) -> "TrendCube":
+        """Loads a cube serialized with `to_binary`."""
+        with np.load(io.BytesIO(content)) as archive:
+            header = json.loads(archive["header"].item())
+            tables = {
+                time_interval: {
+                    name.split("_", 1)[1]: archive[name]
+                    for name in archive.files
+                    if name.startswith(f"{time_interval}_")
+                } for time_interval in header["time_intervals"]
+            }
+        return cls(entities=header["entities"],
+                   tables=tables,
+                   sources=header["sources"])
+
+
+def load_or_build(report_path: str,
+                  data_path: str,
+                  data: pd.DataFrame,
+                  report: data_models.AggregatedResults,
+                  time_column: str = constants.time_column) -> TrendCube:
+    """Loads the cube persisted next to the report, (re)building it if missing or outdated.
+
+    Args:
+        report_path (str): path to the analysis report.
+        data_path (str): path to the csv file of the reviews.
+        data (pd.DataFrame): reviews loaded from `data_path`, with the `time_column` column.
+        report (AggregatedResults): report loaded from `report_path`.
+        time_column (str): name of the review timestamp column.
+
+    Returns:
+        cube (TrendCube): the cube.
+    """
+    cube_path = get_cube_path(report_path)
+    sources = get_source_signature([report_path, data_path
+                                   ]) + [[time_column, len(data)]]
+    if os.path.exists(cube_path):
+        with open(cube_path, "rb") as f:
+            cube = TrendCube.from_binary(f.read())
+        if cube.sources == sources:
+            return cube
+        logger.info(f"Trend cube {cube_path} is outdated, rebuilding it.")
+
+    cube = TrendCube.build(data,
+                           report,
+                           time_column=time_column,
+                           sources=sources)
+    # Publish atomically, the app may read it concurrently
+    report_journal.write_atomic(cube_path, cube.to_binary())
+    logger.info(f"Trend cube saved at {cube_path}")
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precomputes the sentiment trend cube of an analysis report."
+    )
+    parser.add_argument("--report_path",
+                        type=str,
+                        default=constants.analysis_report_path)
+    parser.add_argument("--data_path",
+                        type=str,
+                        default=constants.data_csv_path)
+    args = parser.parse_args()
+
+    # Loaded like in the app, so that review ids match the report
+    data = analyzer_utils.load_csv(
+        file_path=args.data_path,
+        columns=constants.features_to_use,
+        reviews_processed=constants.reviews_processed)
+    report = analyzer_utils.load_report(args.report_path)
+    load_or_build(args.report_path, args.data_path, data, report)
+
+
+if __name__ == "__main__":
+    main()